@@ -1,9 +1,10 @@
 """AnswerAgent: Takes research results and creates structured, cited answers using free LLMs."""
-from typing import Dict, List, Optional
-from langchain.prompts import PromptTemplate
+from typing import Callable, Dict, List, Optional
 from langchain.pydantic_v1 import BaseModel, Field
 
+from utils.deadline import deadline_expired, record_skip
 from utils.llm import create_prompt_template, create_completion_chain
+from utils.tracing import trace_span
 from agents.research_agent import ResearchResult
 
 
@@ -59,11 +60,38 @@ class AnswerAgent:
             for i, source in enumerate(sources)
         ])
     
-    def create_answer(self, research_result: ResearchResult) -> FormattedAnswer:
+    def _answer_inputs(self, research_result: ResearchResult) -> Dict[str, str]:
+        """Build the answer prompt variables."""
+        # Ensure sources exists
+        sources = research_result.sources if hasattr(research_result, 'sources') else []
+        
+        return {
+            "query": research_result.query,
+            "summary": research_result.summary,
+            "sources": self._format_sources_for_prompt(sources)
+        }
+    
+    def _summary_answer(self, research_result: ResearchResult, on_chunk: Optional[Callable[[str], None]]) -> FormattedAnswer:
+        """Answer with the research summary, used when the query's deadline has passed."""
+        record_skip("answer")
+        answer = f"Time ran out before a full answer could be written. Summary of findings:\n\n{research_result.summary}"
+        if on_chunk is not None:
+            on_chunk(answer)
+        return FormattedAnswer(answer=answer, sources=research_result.sources)
+    
+    def _missing_research(self) -> FormattedAnswer:
+        """Answer returned when there is no research result to work from."""
+        return FormattedAnswer(
+            answer="Unable to generate an answer due to missing research results.",
+            sources=[]
+        )
+    
+    def create_answer(self, research_result: ResearchResult, on_chunk: Optional[Callable[[str], None]] = None) -> FormattedAnswer:
         """Create a comprehensive answer based on research results.
         
         Args:
             research_result: The ResearchResult from the ResearchAgent
+            on_chunk: If given, the answer is streamed and this is called with each piece of text
             
         Returns:
             A FormattedAnswer containing the answer and sources used
@@ -73,15 +101,9 @@ class AnswerAgent:
         # Check for valid research result
         if research_result is None:
             # Handle missing research result gracefully
-            return FormattedAnswer(
-                answer="Unable to generate an answer due to missing research results.",
-                sources=[]
-            )
-            
-        # Ensure sources exists
-        sources = research_result.sources if hasattr(research_result, 'sources') else []
-        
-        sources_formatted = self._format_sources_for_prompt(sources)
+            return self._missing_research()
+        if deadline_expired():
+            return self._summary_answer(research_result, on_chunk)
         
         # Create and run the chain
         chain_function = create_completion_chain(
@@ -92,16 +114,68 @@ class AnswerAgent:
         
         # Generate the answer
         try:
-            result = chain_function({
-                "query": research_result.query,
-                "summary": research_result.summary,
-                "sources": sources_formatted
-            })
+            with trace_span("answer"):
+                if on_chunk is None:
+                    result = chain_function(self._answer_inputs(research_result))
+                else:
+                    chunks = []
+                    for chunk in chain_function.stream(self._answer_inputs(research_result)):
+                        chunks.append(chunk)
+                        on_chunk(chunk)
+                    result = "".join(chunks)
+        except TimeoutError:
+            # The deadline passed while the model call was queued
+            return self._summary_answer(research_result, on_chunk)
+        except Exception as e:
+            print(f"Error generating answer: {str(e)}")
+            result = f"Error generating a proper answer. Summary of findings: {research_result.summary}"
+        
+        return FormattedAnswer(
+            answer=result,
+            sources=research_result.sources
+        )
+    
+    async def acreate_answer(self, research_result: ResearchResult, on_chunk: Optional[Callable[[str], None]] = None) -> FormattedAnswer:
+        """Asynchronously create a comprehensive answer based on research results.
+        
+        Args:
+            research_result: The ResearchResult from the ResearchAgent
+            on_chunk: If given, the answer is streamed and this is called with each piece of text
+            
+        Returns:
+            A FormattedAnswer containing the answer and sources used
+        """
+        print("Creating answer from research results...")
+        
+        if research_result is None:
+            return self._missing_research()
+        if deadline_expired():
+            return self._summary_answer(research_result, on_chunk)
+        
+        chain = create_completion_chain(
+            self.answer_prompt,
+            model_name=self.model_name,
+            temperature=0.2
+        )
+        
+        try:
+            with trace_span("answer"):
+                if on_chunk is None:
+                    result = await chain.ainvoke(self._answer_inputs(research_result))
+                else:
+                    chunks = []
+                    async for chunk in chain.astream(self._answer_inputs(research_result)):
+                        chunks.append(chunk)
+                        on_chunk(chunk)
+                    result = "".join(chunks)
+        except TimeoutError:
+            # The deadline passed while the model call was queued
+            return self._summary_answer(research_result, on_chunk)
         except Exception as e:
             print(f"Error generating answer: {str(e)}")
             result = f"Error generating a proper answer. Summary of findings: {research_result.summary}"
         
         return FormattedAnswer(
             answer=result,
-            sources=sources
-        ) 
\ No newline at end of file
+            sources=research_result.sources
+        )
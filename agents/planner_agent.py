@@ -0,0 +1,140 @@
+"""PlannerAgent: Splits a research query into sub-queries that are searched in parallel."""
+from typing import List, Optional, Tuple
+import re
+
+from utils.config import PLAN_MAX_SUBQUERIES, PLAN_MAX_FACETS
+from utils.context import tokenize
+from utils.search import normalize_query
+
+
+# Queries with at most this many content words are broad enough to gain from facet searches
+BROAD_QUERY_WORDS = 4
+
+# Angles added to a broad query so its searches reach beyond the same top few pages
+FACETS = ("overview", "latest developments", "challenges and limitations")
+
+_QUESTION_BREAK = re.compile(r"[?;]+")
+_COMPARISON_PATTERNS = [
+    re.compile(r"^(?:what (?:is|are) )?(?:the )?differences? between (?P<a>.+?) and (?P<b>.+)$", re.IGNORECASE),
+    re.compile(r"^compare (?P<a>.+?) (?:and|with|to) (?P<b>.+)$", re.IGNORECASE),
+    re.compile(r"^(?P<a>.+?) (?:vs\.?|versus|compared (?:to|with)) (?P<b>.+)$", re.IGNORECASE),
+]
+# Trailing context of a comparison ("... for web servers") that applies to both sides
+_QUALIFIER = re.compile(r"\s(?:for|in|on|when|with)\s.+$", re.IGNORECASE)
+_ARTICLES = {"a", "an", "the"}
+# Pronouns that make a follow-up question depend on an earlier one, with what follows the subject they stand for
+_PRONOUNS = {"it": "", "they": "", "them": "", "its": "'s", "their": "'s"}
+# A question naming what it asks about ("what is rust", "who are the Beatles")
+_SUBJECT = re.compile(r"^(?:what|who) (?:is|are|was|were) (?:an? |the )?(?P<subject>.+)$", re.IGNORECASE)
+
+
+class PlannerAgent:
+    """Agent that plans the searches for a query.
+
+    Planning is rule based: a query holding several questions is split into
+    them (a follow-up that refers back by pronoun gets the earlier subject),
+    a comparison is split into one search per side, and a short, broad query
+    can get a few facet searches. The original query is always searched
+    first.
+    """
+
+    def __init__(self, max_subqueries: Optional[int] = None, max_facets: Optional[int] = None):
+        """Initialize the PlannerAgent.
+
+        Args:
+            max_subqueries: Most searches planned per query, including the
+                original query; defaults to PLAN_MAX_SUBQUERIES
+            max_facets: Facet searches added to a short, broad query; defaults
+                to PLAN_MAX_FACETS
+        """
+        self.max_subqueries = PLAN_MAX_SUBQUERIES if max_subqueries is None else max_subqueries
+        self.max_facets = PLAN_MAX_FACETS if max_facets is None else max_facets
+
+    def _split_questions(self, query: str) -> List[str]:
+        """Separate questions asked in one query."""
+        return [part.strip() for part in _QUESTION_BREAK.split(query) if part.strip()]
+
+    def _split_comparison(self, question: str) -> List[str]:
+        """Split "A vs B" style questions into one search per side."""
+        for pattern in _COMPARISON_PATTERNS:
+            match = pattern.match(question.rstrip(" ."))
+            if match:
+                a, b = match.group("a").strip(), match.group("b").strip()
+                qualifier = _QUALIFIER.search(b)
+                suffix = ""
+                if qualifier and not _QUALIFIER.search(a):
+                    b, suffix = b[:qualifier.start()], qualifier.group(0)
+                a, b = self._share_head(a, b)
+                return [a + suffix, b + suffix]
+        return []
+
+    def _share_head(self, a: str, b: str) -> Tuple[str, str]:
+        """Give a lone modifier on one side of a comparison the other side's noun.
+
+        Only one shape is handled: one side is a single lowercase word and the
+        other is three or more lowercase words, as in "quantum error
+        correction vs classical", where the second search becomes "classical
+        error correction". Names and two-word terms ("Messi vs Cristiano
+        Ronaldo", "machine learning vs statistics") are left as written.
+        """
+        for short, long, short_first in ((b, a, False), (a, b, True)):
+            short_words, long_words = short.split(), long.split()
+            if long_words and long_words[0].lower() in _ARTICLES:
+                long_words = long_words[1:]
+            if len(short_words) == 1 and len(long_words) >= 3 and short.islower() and all(word.islower() for word in long_words):
+                shared = " ".join(short_words + long_words[1:])
+                return (shared, b) if short_first else (a, shared)
+        return a, b
+
+    def _resolve_references(self, questions: List[str]) -> List[str]:
+        """Replace pronouns in follow-up questions with the subject asked about earlier.
+
+        In "what is rust? who made it?" the second search becomes "who made
+        rust". A question whose pronoun has no earlier subject is dropped,
+        since searching it alone would find pages about something else.
+        """
+        resolved: List[str] = []
+        subject: Optional[str] = None
+        for question in questions:
+            words = question.split()
+            if not any(word.lower().strip(",.!") in _PRONOUNS for word in words):
+                match = _SUBJECT.match(question)
+                if match:
+                    subject = match.group("subject")
+                resolved.append(question)
+            elif subject is not None:
+                resolved.append(" ".join(
+                    subject + _PRONOUNS[word.lower().strip(",.!")] if word.lower().strip(",.!") in _PRONOUNS else word
+                    for word in words
+                ))
+        return resolved
+
+    def plan(self, query: str) -> List[str]:
+        """Plan the searches for a query.
+
+        Args:
+            query: The user's research query
+
+        Returns:
+            Distinct search queries, the original query first
+        """
+        candidates = [query]
+        questions = self._split_questions(query)
+        if len(questions) > 1:
+            questions = self._resolve_references(questions)
+            candidates.extend(questions)
+        for question in questions:
+            candidates.extend(self._split_comparison(question))
+
+        if len(candidates) == 1 and len(tokenize(query)) <= BROAD_QUERY_WORDS:
+            topic = query.strip().rstrip("?.! ")
+            candidates.extend(f"{topic} {facet}" for facet in FACETS[:max(0, self.max_facets)])
+
+        subqueries: List[str] = []
+        seen = set()
+        for candidate in candidates:
+            key = normalize_query(candidate)
+            if key and key not in seen:
+                seen.add(key)
+                subqueries.append(candidate.strip())
+        return subqueries[:max(1, self.max_subqueries)]
@@ -1,19 +1,56 @@
 """ResearchAgent: Retrieves and processes information from the web using free alternatives."""
-from typing import List, Dict, Any, Optional
-from langchain.schema import Document
-from langchain.prompts import PromptTemplate
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from langchain.pydantic_v1 import BaseModel, Field
+import asyncio
+import contextvars
 
-from utils.config import MAX_SEARCH_RESULTS
-from utils.search import search_web
+from utils.config import (
+    MAX_SEARCH_RESULTS,
+    INDEX_TOP_K,
+    INDEX_MIN_SCORE,
+    INDEX_MIN_SOURCES,
+    PLAN_MAX_SOURCES,
+    SUMMARY_SOURCE_NOTES,
+    SUMMARY_NOTE_TOKENS,
+    SUMMARY_NOTE_MAX_TOKENS,
+    SUMMARY_NOTE_WORKERS,
+    EARLY_STOP_SOURCES,
+    GOOD_SOURCE_MIN_CHARS,
+    GOOD_SOURCE_MIN_COVERAGE,
+    QUERY_DEADLINE_RESERVE,
+)
+from utils.blobstore import load_text, store_text
+from utils.context import pack_context, query_coverage, truncate_tokens
+from utils.deadline import deadline_expired, record_skip, remaining_time, reserve_time
+from utils.dedup import deduplicate_results
+from utils.index import index_results, search_local
+from utils.search import iter_search_web, aiter_search_web
 from utils.llm import create_prompt_template, create_completion_chain
+from utils.registry import get_or_create
+from utils.tracing import trace_span
+
+
+def _get_note_executor() -> ThreadPoolExecutor:
+    """Shared worker pool that writes source notes while other pages are still being fetched."""
+    return get_or_create(
+        ("executor", "notes"),
+        lambda: ThreadPoolExecutor(max_workers=SUMMARY_NOTE_WORKERS, thread_name_prefix="notes"),
+    )
+
+
+def source_content(source: Dict[str, str]) -> str:
+    """Return a source's text, loading it from the blob store if the source holds a reference."""
+    if source.get("content_ref"):
+        return load_text(source["content_ref"])
+    return source.get("content", "")
 
 
 class ResearchResult(BaseModel):
     """Output schema for research results."""
     query: str = Field(description="The original search query")
     sources: List[Dict[str, str]] = Field(
-        description="List of source documents with URL and content"
+        description="List of source documents with URL and content (or a content_ref to the blob store)"
     )
     summary: str = Field(description="A summary of the key findings")
 
@@ -48,30 +85,81 @@ class ResearchAgent:
             """
         )
         
+        # Create the per-source note prompt, used while the other pages are still arriving
+        self.note_prompt = create_prompt_template(
+            """You are a research assistant taking notes on one web page.
+            
+            Query: {query}
+            
+            Page: {title}
+            URL: {url}
+            Content:
+            {content}
+            
+            Write brief notes on what this page says that is relevant to the query:
+            """
+        )
+        
     def _format_source(self, result: Dict[str, Any]) -> Dict[str, str]:
-        """Format a search result into a standardized source format."""
-        return {
+        """Format a search result into a standardized source format.
+        
+        Fetched page text stays in the blob store; the source only holds its
+        ``content_ref``. Read the text with source_content.
+        """
+        source = {
             "title": result.get("title", "Untitled"),
             "url": result.get("url", ""),
-            "content": result.get("raw_content", result.get("content", "")),
             "score": "1.0",  # For compatibility with previous data structure
         }
+        if result.get("content_ref"):
+            source["content_ref"] = result["content_ref"]
+        else:
+            source["content"] = result.get("raw_content", result.get("content", ""))
+        return source
     
     def _clean_sources(self, sources: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         """Clean and standardize source data."""
         return [self._format_source(source) for source in sources]
     
-    def _create_summary(self, query: str, sources: List[Dict[str, str]]) -> str:
-        """Create a summary of the search results."""
-        # If no sources, return a message about no results
-        if not sources:
-            return "No relevant information found for this query."
-            
+    def _summary_inputs(self, query: str, sources: List[Dict[str, str]], notes: List[Optional[str]]) -> Dict[str, str]:
+        """Build the summarization prompt variables.
+        
+        Sources with a note are represented by it; the others by their page
+        text. Notes and page text are packed under the same token budget, so
+        only their passages most relevant to the query are kept.
+        """
+        with trace_span("pack_context", sources=len(sources)):
+            passages = pack_context(
+                query, [note or source_content(source) for source, note in zip(sources, notes)]
+            )
+        
         # Convert sources to a string representation for the prompt
         sources_text = "\n\n".join([
-            f"SOURCE {i+1}:\nTitle: {source['title']}\nURL: {source['url']}\nContent: {source['content'][:1000]}..."
+            f"SOURCE {i+1}:\nTitle: {source['title']}\nURL: {source['url']}\n"
+            + ("Notes: " if notes[i] else "Content: ") + " ... ".join(passages[i])
             for i, source in enumerate(sources)
         ])
+        return {"query": query, "search_results": sources_text}
+    
+    def _extractive_summary(self, query: str, sources: List[Dict[str, str]], notes: List[Optional[str]]) -> str:
+        """Summary made without the LLM, from each source's note or best passage.
+        
+        Used when the query's deadline has passed before summarization.
+        """
+        record_skip("summarize", sources=len(sources))
+        passages = pack_context(
+            query, ["" if note else source_content(source) for source, note in zip(sources, notes)]
+        )
+        parts = [note or " ... ".join(best[:1]) for note, best in zip(notes, passages)]
+        return "\n\n".join(f"[Source {i+1}] {part}" for i, part in enumerate(parts) if part)
+    
+    def _create_summary(self, query: str, sources: List[Dict[str, str]], notes: List[Optional[str]]) -> str:
+        """Create a summary of the search results (the reduce step over the source notes)."""
+        # If no sources, return a message about no results
+        if not sources:
+            return "No relevant information found for this query."
+        if deadline_expired():
+            return self._extractive_summary(query, sources, notes)
         
         # Generate summary using LLM
         chain_function = create_completion_chain(
@@ -80,48 +168,419 @@ class ResearchAgent:
             temperature=0.1
         )
         
-        result = chain_function({"query": query, "search_results": sources_text})
-        return result
+        try:
+            with trace_span("summarize", sources=len(sources)):
+                return chain_function(self._summary_inputs(query, sources, notes))
+        except TimeoutError:
+            # The deadline passed while the model call was queued
+            return self._extractive_summary(query, sources, notes)
     
-    def research(self, query: str) -> ResearchResult:
-        """Perform research on a given query.
+    async def _acreate_summary(self, query: str, sources: List[Dict[str, str]], notes: List[Optional[str]]) -> str:
+        """Asynchronously create a summary of the search results.
+        
+        Loading page text from the blob store and packing it run on a worker
+        thread, so they don't hold up the event loop.
+        """
+        if not sources:
+            return "No relevant information found for this query."
+        loop = asyncio.get_running_loop()
+        if deadline_expired():
+            return await loop.run_in_executor(
+                None, contextvars.copy_context().run, self._extractive_summary, query, sources, notes
+            )
+        
+        chain = create_completion_chain(
+            self.summarization_prompt,
+            model_name=self.model_name,
+            temperature=0.1
+        )
+        try:
+            with trace_span("summarize", sources=len(sources)):
+                inputs = await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._summary_inputs, query, sources, notes
+                )
+                return await chain.ainvoke(inputs)
+        except TimeoutError:
+            return await loop.run_in_executor(
+                None, contextvars.copy_context().run, self._extractive_summary, query, sources, notes
+            )
+    
+    def _no_results(self, query: str) -> ResearchResult:
+        """Create a minimal result with a placeholder for queries without search results."""
+        return ResearchResult(
+            query=query,
+            sources=[{
+                "title": "No results found",
+                "url": "",
+                "content": "No search results were found for this query.",
+                "score": "0.0"
+            }],
+            summary="No relevant information was found for the query."
+        )
+    
+    def _local_results(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Look the query up in the local page index.
+
+        Returns:
+            Search results built from indexed pages, or None when fewer than
+            INDEX_MIN_SOURCES pages match well enough to skip the web
+        """
+        with trace_span("local_search") as span:
+            results = search_local(query, k=INDEX_TOP_K, min_score=INDEX_MIN_SCORE)
+            span["pages"] = len(results)
+        if len(results) < INDEX_MIN_SOURCES:
+            return None
+        return results[:MAX_SEARCH_RESULTS]
+    
+    def _index_results(self, results: List[Dict[str, Any]]) -> None:
+        """Add freshly fetched pages to the local index for later local-first queries."""
+        with trace_span("index", pages=len(results)) as span:
+            span["chunks"] = index_results(results)
+    
+    def _is_good_source(self, query: str, result: Dict[str, Any]) -> bool:
+        """Whether a fetched page is long enough and on topic enough to count towards an early stop."""
+        text = result.get("raw_content", "")
+        return len(text) >= GOOD_SOURCE_MIN_CHARS and query_coverage(query, text) >= GOOD_SOURCE_MIN_COVERAGE
+    
+    def _note_inputs(self, query: str, result: Dict[str, Any]) -> Dict[str, str]:
+        """Build the note prompt variables from a page's most relevant passages."""
+        passages = pack_context(query, [result["raw_content"]], token_budget=SUMMARY_NOTE_TOKENS)[0]
+        return {
+            "query": query,
+            "title": result.get("title", "Untitled"),
+            "url": result.get("url", ""),
+            "content": " ... ".join(passages),
+        }
+    
+    def _take_note(self, query: str, result: Dict[str, Any]) -> str:
+        """Write the note on one source (the map step of the summary)."""
+        chain = create_completion_chain(self.note_prompt, model_name=self.model_name, temperature=0.1)
+        with trace_span("note", url=result.get("url", "")):
+            return truncate_tokens(chain(self._note_inputs(query, result)), SUMMARY_NOTE_MAX_TOKENS)
+    
+    async def _atake_note(self, query: str, result: Dict[str, Any]) -> str:
+        """Asynchronously write the note on one source, packing the page on a worker thread."""
+        chain = create_completion_chain(self.note_prompt, model_name=self.model_name, temperature=0.1)
+        with trace_span("note", url=result.get("url", "")):
+            inputs = await asyncio.get_running_loop().run_in_executor(
+                None, self._note_inputs, query, result
+            )
+            note = await chain.ainvoke(inputs)
+        return truncate_tokens(note, SUMMARY_NOTE_MAX_TOKENS)
+    
+    def _store_contents(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Move fetched page text into the blob store, leaving a ``content_ref`` on each result.
+        
+        Results then stay small as they travel through the graph state; the
+        text is loaded again only where it is read.
+        """
+        with trace_span("store_contents", results=len(results)):
+            for result in results:
+                text = result.get("raw_content")
+                ref = store_text(text) if text else None
+                if ref is not None:
+                    result["content_ref"] = ref
+                    del result["raw_content"]
+        return results
+    
+    def _gather_web(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]],
+        stop_after: int,
+    ) -> List[Dict[str, Any]]:
+        """Search the web, taking notes on each page while the rest are still being fetched."""
+        results: List[Dict[str, Any]] = []
+        notes: List[Tuple[Dict[str, Any], Future]] = []
+        good = 0
+        sources = iter_search_web(query, max_results=MAX_SEARCH_RESULTS)
+        try:
+            for result in sources:
+                results.append(result)
+                if on_source is not None:
+                    on_source(result)
+                if SUMMARY_SOURCE_NOTES and result.get("raw_content"):
+                    future = _get_note_executor().submit(
+                        contextvars.copy_context().run, self._take_note, query, result
+                    )
+                    notes.append((result, future))
+                if stop_after:
+                    good += self._is_good_source(query, result)
+                    if good >= stop_after:
+                        print(f"Stopping early with {good} good sources for: {query}")
+                        break
+        finally:
+            sources.close()
+        
+        # Notes still being written when the deadline passes are dropped; their
+        # sources are summarized from their passages instead
+        if notes:
+            wait([future for _, future in notes], timeout=remaining_time())
+        for result, future in notes:
+            if not future.done():
+                future.cancel()
+                record_skip("note", url=result.get("url", ""))
+                continue
+            try:
+                result["note"] = future.result()
+            except TimeoutError:
+                # The model call was still queued when the deadline passed
+                record_skip("note", url=result.get("url", ""))
+            except Exception as e:
+                print(f"Error taking notes on {result.get('url', '')}: {str(e)}")
+        # Pages arrive in completion order; report them in search rank order
+        results.sort(key=lambda result: result.get("rank", 0))
+        return results
+    
+    async def _agather_web(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]],
+        stop_after: int,
+    ) -> List[Dict[str, Any]]:
+        """Asynchronously search the web, taking notes on each page as it arrives."""
+        loop = asyncio.get_running_loop()
+        results: List[Dict[str, Any]] = []
+        notes: List[Tuple[Dict[str, Any], asyncio.Task]] = []
+        good = 0
+        sources = aiter_search_web(query, max_results=MAX_SEARCH_RESULTS)
+        try:
+            async for result in sources:
+                results.append(result)
+                if on_source is not None:
+                    on_source(result)
+                if SUMMARY_SOURCE_NOTES and result.get("raw_content"):
+                    notes.append((result, asyncio.ensure_future(self._atake_note(query, result))))
+                if stop_after:
+                    good += await loop.run_in_executor(None, self._is_good_source, query, result)
+                    if good >= stop_after:
+                        print(f"Stopping early with {good} good sources for: {query}")
+                        break
+        finally:
+            await sources.aclose()
+        
+        if notes:
+            await asyncio.wait([task for _, task in notes], timeout=remaining_time())
+        for result, task in notes:
+            if not task.done():
+                task.cancel()
+                record_skip("note", url=result.get("url", ""))
+                continue
+            try:
+                result["note"] = task.result()
+            except TimeoutError:
+                # The model call was still queued when the deadline passed
+                record_skip("note", url=result.get("url", ""))
+            except Exception as e:
+                print(f"Error taking notes on {result.get('url', '')}: {str(e)}")
+        results.sort(key=lambda result: result.get("rank", 0))
+        return results
+    
+    def gather(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+        local_first: bool = False,
+        stop_after: int = EARLY_STOP_SOURCES,
+    ) -> List[Dict[str, Any]]:
+        """Collect search results, with fetched page text, for a query.
+        
+        Web pages are processed as they arrive: each one gets a short note
+        (SUMMARY_SOURCE_NOTES) while the slower pages are still being fetched.
+        Under a deadline, gathering stops QUERY_DEADLINE_RESERVE seconds early
+        so summarizing and answering keep their share of the budget.
         
         Args:
             query: The search query
+            on_source: Called with each search result as soon as its page has been fetched
+            local_first: Use the local page index when it has enough matching
+                pages, and search the web only otherwise
+            stop_after: Stop waiting for pages once this many good sources have
+                arrived (0 waits for all of them)
             
         Returns:
-            A ResearchResult containing sources and summary
+            Search results in rank order, with their notes under ``note`` and
+            their page text moved to the blob store (``content_ref``)
         """
-        print(f"Starting research for query: {query}")
+        with reserve_time(QUERY_DEADLINE_RESERVE):
+            return self._gather(query, on_source, local_first, stop_after)
+    
+    def _gather(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]],
+        local_first: bool,
+        stop_after: int,
+    ) -> List[Dict[str, Any]]:
+        """Collect search results for gather, under its share of the deadline."""
+        search_results = self._local_results(query) if local_first else None
+        if search_results is not None:
+            print(f"Found {len(search_results)} indexed pages for: {query}")
+            if on_source is not None:
+                for result in search_results:
+                    on_source(result)
+            return self._store_contents(search_results)
         
         # Perform web search using our free search utility
-        search_results = search_web(query, max_results=MAX_SEARCH_RESULTS)
+        search_results = self._gather_web(query, on_source, stop_after)
+        
+        print(f"Found {len(search_results)} search results for: {query}")
+        self._index_results(search_results)
+        return self._store_contents(search_results)
+    
+    async def agather(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+        local_first: bool = False,
+        stop_after: int = EARLY_STOP_SOURCES,
+    ) -> List[Dict[str, Any]]:
+        """Asynchronously collect search results, with fetched page text, for a query."""
+        with reserve_time(QUERY_DEADLINE_RESERVE):
+            return await self._agather(query, on_source, local_first, stop_after)
+    
+    async def _agather(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]],
+        local_first: bool,
+        stop_after: int,
+    ) -> List[Dict[str, Any]]:
+        """Asynchronously collect search results for agather, under its share of the deadline."""
+        # Index lookups and writes touch SQLite and embed text, so keep them off the event loop
+        loop = asyncio.get_running_loop()
+        if local_first:
+            search_results = await loop.run_in_executor(
+                None, contextvars.copy_context().run, self._local_results, query
+            )
+            if search_results is not None:
+                print(f"Found {len(search_results)} indexed pages for: {query}")
+                if on_source is not None:
+                    for result in search_results:
+                        on_source(result)
+                return await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._store_contents, search_results
+                )
         
-        print(f"Found {len(search_results)} search results")
+        search_results = await self._agather_web(query, on_source, stop_after)
         
+        print(f"Found {len(search_results)} search results for: {query}")
+        await loop.run_in_executor(
+            None, contextvars.copy_context().run, self._index_results, search_results
+        )
+        return await loop.run_in_executor(
+            None, contextvars.copy_context().run, self._store_contents, search_results
+        )
+    
+    def merge_results(
+        self,
+        result_lists: List[List[Dict[str, Any]]],
+        max_sources: int = PLAN_MAX_SOURCES,
+    ) -> List[Dict[str, Any]]:
+        """Merge the search results of several sub-queries into one ranked list.
+        
+        Results are interleaved by rank, so every sub-query's best results come
+        before any sub-query's weaker ones, and pages found by several
+        sub-queries (or near-copies of each other) are kept once.
+        
+        Args:
+            result_lists: Each sub-query's results in rank order, the original query's first
+            max_sources: Most results kept
+            
+        Returns:
+            The merged results
+        """
+        interleaved = [
+            results[rank]
+            for rank in range(max((len(results) for results in result_lists), default=0))
+            for results in result_lists
+            if rank < len(results)
+        ]
+        with trace_span("merge", results=len(interleaved)) as span:
+            merged = deduplicate_results(interleaved)[:max_sources]
+            span["kept"] = len(merged)
+        return merged
+    
+    def synthesize(self, query: str, search_results: List[Dict[str, Any]]) -> ResearchResult:
+        """Summarize collected search results into a ResearchResult.
+        
+        Args:
+            query: The original query the summary should answer
+            search_results: Search results with fetched page text
+            
+        Returns:
+            A ResearchResult containing sources and summary
+        """
         # Handle case with no search results
         if not search_results:
-            # Create a minimal result with a placeholder
-            return ResearchResult(
-                query=query,
-                sources=[{
-                    "title": "No results found",
-                    "url": "",
-                    "content": "No search results were found for this query.",
-                    "score": "0.0"
-                }],
-                summary="No relevant information was found for the query."
-            )
+            return self._no_results(query)
         
         # Clean and format sources
         cleaned_sources = self._clean_sources(search_results)
         
         # Create summary
-        summary = self._create_summary(query, cleaned_sources)
+        notes = [result.get("note") for result in search_results]
+        summary = self._create_summary(query, cleaned_sources, notes)
         
         # Return structured result
         return ResearchResult(
             query=query,
             sources=cleaned_sources,
             summary=summary
-        ) 
\ No newline at end of file
+        )
+    
+    async def asynthesize(self, query: str, search_results: List[Dict[str, Any]]) -> ResearchResult:
+        """Asynchronously summarize collected search results into a ResearchResult."""
+        if not search_results:
+            return self._no_results(query)
+        
+        cleaned_sources = self._clean_sources(search_results)
+        notes = [result.get("note") for result in search_results]
+        summary = await self._acreate_summary(query, cleaned_sources, notes)
+        
+        return ResearchResult(
+            query=query,
+            sources=cleaned_sources,
+            summary=summary
+        )
+    
+    def research(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+        local_first: bool = False,
+    ) -> ResearchResult:
+        """Perform research on a given query.
+        
+        Args:
+            query: The search query
+            on_source: Called with each search result as soon as its page has been fetched
+            local_first: Answer from the local page index when it has enough
+                matching pages, and search the web only otherwise
+            
+        Returns:
+            A ResearchResult containing sources and summary
+        """
+        print(f"Starting research for query: {query}")
+        return self.synthesize(query, self.gather(query, on_source=on_source, local_first=local_first))
+    
+    async def aresearch(
+        self,
+        query: str,
+        on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+        local_first: bool = False,
+    ) -> ResearchResult:
+        """Asynchronously perform research on a given query.
+        
+        Args:
+            query: The search query
+            on_source: Called with each search result as soon as its page has been fetched
+            local_first: Answer from the local page index when it has enough
+                matching pages, and search the web only otherwise
+            
+        Returns:
+            A ResearchResult containing sources and summary
+        """
+        print(f"Starting research for query: {query}")
+        search_results = await self.agather(query, on_source=on_source, local_first=local_first)
+        return await self.asynthesize(query, search_results)
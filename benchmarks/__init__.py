@@ -0,0 +1 @@
+"""Benchmarks for the dual-agent AI research system."""
\ No newline at end of file
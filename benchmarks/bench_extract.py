@@ -0,0 +1,124 @@
+"""Micro-benchmark: streaming HTML text extraction vs. the original BeautifulSoup path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extract [CORPUS_DIR] [--repeat N]
+
+CORPUS_DIR should contain saved ``.html`` pages. Without it, a reproducible
+synthetic corpus of large pages is generated.
+"""
+from typing import Callable, Dict, List, Tuple
+import argparse
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from utils.config import FETCH_MAX_BYTES, PAGE_MAX_CHARS
+from utils.extract import extract_text
+
+
+def legacy_extract(html: bytes) -> str:
+    """The original fetch_webpage_content extraction: full download, full soup, then truncate."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html.decode("utf-8", errors="replace"), "html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text(separator=" ", strip=True)
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = " ".join(chunk for chunk in chunks if chunk)
+    return text[:10000]
+
+
+def streaming_extract(html: bytes) -> str:
+    """The current path: bounded read with early-exit extraction."""
+    return extract_text(html[:FETCH_MAX_BYTES], max_chars=PAGE_MAX_CHARS)
+
+
+def synthetic_corpus(count: int = 20, seed: int = 0) -> List[Tuple[str, bytes]]:
+    """Generate large pages with scripts, styles and deeply nested markup."""
+    rng = random.Random(seed)
+    words = ["quantum", "research", "system", "agent", "graph", "network", "result",
+             "analysis", "error", "qubit", "model", "latency", "source", "summary"]
+    pages = []
+    for i in range(count):
+        parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Page %d</title>" % i]
+        parts.append("<style>%s</style>" % ("body{margin:0} " * 2000))
+        parts.append("<script>%s</script>" % ("var x = 1; " * 5000))
+        parts.append("</head><body>")
+        for _ in range(rng.randint(3000, 6000)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 20)))
+            parts.append("<div class='c'><p>%s <a href='#'>link</a></p></div>" % sentence)
+        parts.append("</body></html>")
+        pages.append(("synthetic-%02d.html" % i, "".join(parts).encode("utf-8")))
+    return pages
+
+
+def load_corpus(directory: str) -> List[Tuple[str, bytes]]:
+    """Load every .html file in a directory."""
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def measure(func: Callable[[bytes], str], pages: List[Tuple[str, bytes]], repeat: int) -> Dict[str, float]:
+    """Time an extraction function over the corpus and record its peak allocation."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html in pages:
+            func(html)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for _, html in pages:
+        func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "best_s": best,
+        "median_s": statistics.median(timings),
+        "per_page_ms": best / len(pages) * 1000,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="Directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the corpus")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        raise SystemExit("No .html files found in corpus directory")
+    total_mb = sum(len(html) for _, html in pages) / (1024 * 1024)
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB")
+
+    # Both paths should agree on the text they return
+    matches = sum(legacy_extract(html) == streaming_extract(html) for _, html in pages)
+    print(f"Identical output: {matches}/{len(pages)} pages")
+
+    results = {
+        "legacy (bs4, full page)": measure(legacy_extract, pages, args.repeat),
+        "streaming (early exit)": measure(streaming_extract, pages, args.repeat),
+    }
+    print(f"{'implementation':<26}{'best s':>10}{'median s':>10}{'ms/page':>10}{'peak MB':>10}")
+    for name, result in results.items():
+        print(f"{name:<26}{result['best_s']:>10.3f}{result['median_s']:>10.3f}"
+              f"{result['per_page_ms']:>10.2f}{result['peak_mb']:>10.1f}")
+
+    legacy, streaming = results.values()
+    print(f"Speedup: {legacy['best_s'] / streaming['best_s']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Cold-start benchmark for the CLI; exits non-zero when start-up regresses.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import [--runs N] [--max-import-ms MS] [--max-help-ms MS]
+
+Each measurement starts a fresh interpreter, so nothing is shared between runs.
+Three checks are made:
+
+- importing ``cli`` must not load the research pipeline's heavy dependencies
+- the median time to import ``cli`` must stay under ``--max-import-ms``
+- the median wall time of ``python main.py --help`` must stay under ``--max-help-ms``
+"""
+from typing import List
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Modules that only the research commands need; none of them may load on import of cli
+HEAVY_MODULES = (
+    "graph.agent_graph",
+    "agents.research_agent",
+    "utils.search",
+    "utils.llm",
+    "langgraph",
+    "langchain",
+    "langchain_core",
+    "duckduckgo_search",
+    "requests",
+    "bs4",
+    "transformers",
+    "sentence_transformers",
+)
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import cli
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"import_s": elapsed, "heavy": heavy}}))
+"""
+
+
+def probe_import() -> dict:
+    """Import cli in a fresh interpreter and report the time taken and heavy modules loaded."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE.format(heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_help() -> float:
+    """Wall time of ``python main.py --help`` in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, default=250.0, help="Threshold for importing cli")
+    parser.add_argument("--max-help-ms", type=float, default=800.0, help="Threshold for main.py --help")
+    args = parser.parse_args()
+
+    probes = [probe_import() for _ in range(args.runs)]
+    import_ms: List[float] = [probe["import_s"] * 1000 for probe in probes]
+    help_ms: List[float] = [time_help() * 1000 for _ in range(args.runs)]
+    heavy = sorted({name for probe in probes for name in probe["heavy"]})
+
+    import_median = statistics.median(import_ms)
+    help_median = statistics.median(help_ms)
+    print(f"import cli:        median {import_median:7.1f} ms  (min {min(import_ms):.1f}, limit {args.max_import_ms:.0f})")
+    print(f"main.py --help:    median {help_median:7.1f} ms  (min {min(help_ms):.1f}, limit {args.max_help_ms:.0f})")
+
+    failures = []
+    if heavy:
+        failures.append(f"importing cli loaded heavy modules: {', '.join(heavy)}")
+    if import_median > args.max_import_ms:
+        failures.append(f"import cli took {import_median:.1f} ms (limit {args.max_import_ms:.0f} ms)")
+    if help_median > args.max_help_ms:
+        failures.append(f"main.py --help took {help_median:.1f} ms (limit {args.max_help_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""End-to-end benchmark of the ResearchSystem query paths against local fixtures.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline [--queries N] [--concurrency 1,4,8] [--modes sync,stream,async] [--output results.json]
+
+Each mode drives a different entry point: ``sync`` calls process_query from a
+thread pool, ``stream`` drains stream_query (the CLI's path) from a thread pool
+and ``async`` runs aprocess_query (the HTTP server's path) on one event loop.
+
+DuckDuckGo is replaced by a FixtureServer search backend and every result URL
+points at pages served locally with fixed latency, size and failure settings,
+so no network access is needed and runs with the same options are comparable
+across commits. Page and search caches are disabled for the run. Results
+(latency percentiles, throughput per mode and concurrency level and peak RSS)
+are printed as JSON. Each level also reports ``metrics_ratio``, the stage
+timings added to the process-wide metrics divided by the spans the queries
+traced; anything other than 1.0 means queries are counted more than once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import FixtureServer, load_recorded_pages
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(round(pct / 100 * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_revision() -> Optional[str]:
+    """The current commit, so saved results can be matched to the code they measured."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+MODES = ("sync", "stream", "async")
+
+
+def observed_spans() -> int:
+    """Stage timings recorded in the process-wide metrics so far."""
+    from utils.tracing import METRICS
+    return sum(int(stage["count"]) for stage in METRICS._stages.values())
+
+
+def run_query(system: Any, query: str, mode: str) -> Dict[str, Any]:
+    """Run one query through the sync or stream path and time it."""
+    start = time.perf_counter()
+    if mode == "stream":
+        state = {}
+        for event in system.stream_query(query):
+            if event["type"] == "result":
+                state = event["state"]
+    else:
+        state = system.process_query(query)
+    return {"latency": time.perf_counter() - start, "ok": not state.get("error"), "spans": len(state.get("spans", []))}
+
+
+async def arun_queries(system: Any, queries: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    """Run queries through aprocess_query on this event loop, at most ``concurrency`` at once."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def timed(query: str) -> Dict[str, Any]:
+        async with limit:
+            start = time.perf_counter()
+            state = await system.aprocess_query(query)
+            return {"latency": time.perf_counter() - start, "ok": not state.get("error"), "spans": len(state.get("spans", []))}
+
+    return await asyncio.gather(*(timed(query) for query in queries))
+
+
+def run_level(system: Any, queries: List[str], concurrency: int, mode: str = "sync") -> Dict[str, Any]:
+    """Run every query at one concurrency level through one entry point and summarize the latencies."""
+    observed = observed_spans()
+    start = time.perf_counter()
+    if mode == "async":
+        runs = asyncio.run(arun_queries(system, queries, concurrency))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            runs = list(executor.map(lambda query: run_query(system, query, mode), queries))
+    elapsed = time.perf_counter() - start
+    observed = observed_spans() - observed
+    traced = sum(run["spans"] for run in runs)
+
+    latencies = [run["latency"] for run in runs]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "queries": len(runs),
+        "errors": sum(not run["ok"] for run in runs),
+        "wall_s": round(elapsed, 4),
+        "throughput_qps": round(len(runs) / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "metrics_ratio": round(observed / traced, 3) if traced else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=40, help="Queries per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated entry points: sync, stream, async")
+    parser.add_argument("--results", type=int, default=5, help="Search results per query")
+    parser.add_argument("--pages", type=int, default=50, help="Number of synthetic fixture pages")
+    parser.add_argument("--page-kb", type=int, default=64, help="Synthetic page size in KB")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean page response latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Per-page latency deviation")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Fraction of pages answering 500")
+    parser.add_argument("--hosts", type=int, default=4, help="Local ports pages are spread across")
+    parser.add_argument("--recorded", help="Directory of saved .html pages to serve instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for fixture content and behaviour")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    # Caches would turn every run after the first into a no-op; the settings
+    # are read at import time, so set them before loading the pipeline
+    os.environ["PAGE_CACHE_ENABLED"] = "0"
+    os.environ["SEARCH_CACHE_ENABLED"] = "0"
+    os.environ["SEARCH_CACHE_PERSIST"] = "0"
+    os.environ["COMPLETION_CACHE_ENABLED"] = "0"
+    os.environ["INDEX_ENABLED"] = "0"
+    # Host health from earlier runs would reorder the fixture fetches
+    os.environ["HEALTH_ENABLED"] = "0"
+    from graph.agent_graph import ResearchSystem
+    from utils.search import set_search_backend
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    pages = load_recorded_pages(args.recorded) if args.recorded else None
+
+    with FixtureServer(
+        pages=pages,
+        page_count=args.pages,
+        page_size=args.page_kb * 1024,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        hosts=args.hosts,
+        seed=args.seed,
+    ) as server:
+        set_search_backend(lambda query, max_results: server.search(query, min(max_results, args.results)))
+        # Fetch errors for the failing pages are expected; keep them out of the JSON on stdout
+        try:
+            with redirect_stdout(sys.stderr):
+                system = ResearchSystem()
+                # Warm up imports, thread pools and connection pools outside the measurements
+                system.process_query("warm-up query")
+                results = []
+                for mode in modes:
+                    for level in levels:
+                        queries = [f"benchmark {mode} query {i} at concurrency {level}" for i in range(args.queries)]
+                        results.append(run_level(system, queries, level, mode))
+        finally:
+            set_search_backend(None)
+        fixture_requests = server.requests
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "fixture_requests": fixture_requests,
+        "levels": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
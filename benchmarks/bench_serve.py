@@ -0,0 +1,129 @@
+"""Burst benchmark of the HTTP service mode against local fixtures.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serve [--burst 32] [--distinct 4] [--rounds 3] [--workers 4]
+
+A ResearchServer is started in-process on a free port with searches answered
+by a FixtureServer. Each round fires ``burst`` concurrent HTTP requests spread
+over ``distinct`` trending queries (with varied capitalization and
+punctuation), the way a spike on a popular topic arrives. The report shows how
+many graph executions the requests cost, how many were coalesced or refused,
+and the request latency percentiles, as JSON.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+from benchmarks.bench_pipeline import git_revision, peak_rss_mb, percentile
+from benchmarks.fixtures import FixtureServer
+
+
+def _variants(topic: str) -> List[str]:
+    """Spellings of one query that normalize to the same text."""
+    return [topic, topic.upper(), f"{topic}?", f"  {topic.title()}  "]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=32, help="Concurrent requests per round")
+    parser.add_argument("--distinct", type=int, default=4, help="Distinct queries per round")
+    parser.add_argument("--rounds", type=int, default=3, help="Bursts to send")
+    parser.add_argument("--workers", type=int, default=4, help="Server worker slots")
+    parser.add_argument("--max-queue", type=int, default=16, help="Server queue slots")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean page response latency")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    # Caches would let later rounds skip the work being measured
+    os.environ["PAGE_CACHE_ENABLED"] = "0"
+    os.environ["SEARCH_CACHE_ENABLED"] = "0"
+    os.environ["SEARCH_CACHE_PERSIST"] = "0"
+    os.environ["COMPLETION_CACHE_ENABLED"] = "0"
+    os.environ["INDEX_ENABLED"] = "0"
+    # Host health from earlier runs would reorder the fixture fetches
+    os.environ["HEALTH_ENABLED"] = "0"
+    import requests
+    from server import ResearchServer, ResearchService
+    from utils.search import set_search_backend
+
+    with FixtureServer(latency_ms=args.latency_ms) as fixtures:
+        set_search_backend(fixtures.search)
+        service = ResearchService(workers=args.workers, max_queue=args.max_queue)
+        server = ResearchServer(service, "127.0.0.1", 0)
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(server.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, name="bench-server", daemon=True).start()
+        started.wait()
+        url = f"http://127.0.0.1:{server.port}/research"
+        session = requests.Session()
+
+        def send(query: str) -> Dict[str, Any]:
+            start = time.perf_counter()
+            response = session.post(url, json={"query": query}, timeout=120)
+            body = response.json()
+            return {
+                "latency": time.perf_counter() - start,
+                "status": response.status_code,
+                "coalesced": bool(body.get("coalesced")),
+            }
+
+        runs: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(sys.stderr):
+                for round_index in range(args.rounds):
+                    topics = [f"trending topic {round_index}-{i}" for i in range(args.distinct)]
+                    queries = [
+                        _variants(topics[i % len(topics)])[(i // len(topics)) % 4] for i in range(args.burst)
+                    ]
+                    with ThreadPoolExecutor(max_workers=args.burst) as executor:
+                        runs.extend(executor.map(send, queries))
+        finally:
+            elapsed = time.perf_counter() - start
+            loop.call_soon_threadsafe(loop.stop)
+            set_search_backend(None)
+        fixture_requests = fixtures.requests
+
+    answered = [run["latency"] for run in runs if run["status"] == 200]
+    stats = service.stats()
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "requests": len(runs),
+        "executions": stats["executions"],
+        "coalesced": stats["coalesced"],
+        "rejected": sum(run["status"] == 503 for run in runs),
+        "errors": sum(run["status"] not in (200, 503) for run in runs),
+        "fixture_requests": fixture_requests,
+        "wall_s": round(elapsed, 4),
+        "p50_ms": round(percentile(answered, 50) * 1000, 2) if answered else None,
+        "p95_ms": round(percentile(answered, 95) * 1000, 2) if answered else None,
+        "max_ms": round(max(answered) * 1000, 2) if answered else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Local stand-ins for DuckDuckGo and the web, used by the offline benchmarks.
+
+A FixtureServer serves HTML pages from one or more local ports (each port is a
+separate "host" as far as the per-host fetch limits are concerned) with
+configurable latency, page size and failure rate. Its ``search`` method has the
+same signature as the DuckDuckGo backend in utils.search and returns hits that
+point at the served pages.
+
+Everything is derived from the seed and the request path rather than from a
+shared random stream, so a page's latency, size and failure are the same on
+every run no matter how many requests are in flight or in what order they land.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+
+
+_WORDS = ["quantum", "research", "system", "agent", "graph", "network", "result",
+          "analysis", "error", "qubit", "model", "latency", "source", "summary",
+          "algorithm", "hardware", "benchmark", "experiment", "theory", "data"]
+
+
+def _rng(seed: int, *parts: object) -> random.Random:
+    """Return an RNG seeded from the benchmark seed and a stable key."""
+    key = ":".join(str(part) for part in (seed,) + parts)
+    return random.Random(int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def synthetic_page(index: int, size: int, seed: int = 0) -> bytes:
+    """Generate an HTML page of roughly ``size`` bytes with scripts, styles and paragraphs."""
+    rng = _rng(seed, "page", index)
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Fixture page %d</title>" % index,
+        "<style>%s</style>" % ("p{margin:0} " * 50),
+        "<script>%s</script>" % ("var x = 1; " * 100),
+        "</head><body><h1>Fixture page %d</h1>" % index,
+    ]
+    length = sum(len(part) for part in parts)
+    while length < size:
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 24)))
+        paragraph = "<div class='c'><p>%s. <a href='#'>more</a></p></div>" % sentence.capitalize()
+        parts.append(paragraph)
+        length += len(paragraph)
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def load_recorded_pages(directory: str) -> List[bytes]:
+    """Load every saved .html page in a directory, in name order."""
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append(f.read())
+    return pages
+
+
+class _FixtureHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Fetchers drop pooled keep-alive connections whenever they like
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """Serves fixture pages on local ports and answers searches with links to them."""
+
+    def __init__(
+        self,
+        pages: Optional[List[bytes]] = None,
+        page_count: int = 50,
+        page_size: int = 64 * 1024,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 20.0,
+        failure_rate: float = 0.0,
+        hosts: int = 4,
+        seed: int = 0,
+    ):
+        """Initialize the server (call ``start`` or use it as a context manager).
+
+        Args:
+            pages: Recorded HTML pages to serve; synthetic pages are generated if not given
+            page_count: Number of synthetic pages
+            page_size: Approximate size of each synthetic page in bytes
+            latency_ms: Mean time before a response starts
+            jitter_ms: Maximum deviation from ``latency_ms``, fixed per page
+            failure_rate: Fraction of pages that answer with HTTP 500
+            hosts: Number of ports to serve from, each acting as a separate host
+            seed: Seed for page content, latency and failures
+        """
+        self.pages = pages if pages else [synthetic_page(i, page_size, seed) for i in range(page_count)]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.hosts = max(1, hosts)
+        self.seed = seed
+        self._servers: List[ThreadingHTTPServer] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def page_behaviour(self, index: int) -> Tuple[float, bool]:
+        """Return the (delay seconds, fails) pair for a page."""
+        rng = _rng(self.seed, "behaviour", index)
+        delay = max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        return delay, rng.random() < self.failure_rate
+
+    def url_for(self, index: int) -> str:
+        """Return the URL of a page; pages are spread across the hosts."""
+        host, port = self._servers[index % len(self._servers)].server_address[:2]
+        return f"http://{host}:{port}/page/{index}"
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Search backend: a stable, query-dependent selection of pages."""
+        rng = _rng(self.seed, "search", query)
+        indexes = rng.sample(range(len(self.pages)), min(max_results, len(self.pages)))
+        return [
+            {
+                "title": f"Fixture page {index}",
+                "url": self.url_for(index),
+                "content": f"Snippet for fixture page {index} about {query}.",
+            }
+            for index in indexes
+        ]
+
+    def _handler(self) -> type:
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                try:
+                    index = int(self.path.rsplit("/", 1)[-1])
+                    body = fixture.pages[index]
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                delay, fails = fixture.page_behaviour(index)
+                with fixture._lock:
+                    fixture.requests += 1
+                    fixture.failures += fails
+                time.sleep(delay)
+                if fails:
+                    body = b"fixture failure"
+                    self.send_response(500)
+                    self.send_header("Content-Type", "text/plain")
+                else:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The fetcher stops reading once it has enough text
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        """Bind the ports and start serving in background threads."""
+        handler = self._handler()
+        for _ in range(self.hosts):
+            server = _FixtureHTTPServer(("127.0.0.1", 0), handler)
+            thread = threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True)
+            thread.start()
+            self._servers.append(server)
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the ports."""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._servers = []
+        self._threads = []
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
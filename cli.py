@@ -1,48 +1,177 @@
 """Command Line Interface for the Research System."""
 import typer
-from typing import Optional
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
-from rich.progress import Progress
 
-from graph.agent_graph import ResearchSystem
+from utils.tracing import Tracer
+
+# The research pipeline (langgraph, langchain, duckduckgo_search, requests) is
+# imported inside the commands that run it, so --help, argument errors and the
+# light commands start without loading it
+if TYPE_CHECKING:
+    from graph.agent_graph import ResearchSystem
 
 # Initialize Typer app
 app = typer.Typer(help="Dual-Agent AI Research System")
 console = Console()
 
 
+# Labels shown when a graph node starts
+NODE_LABELS = {
+    "plan": "🧭 Planning searches...",
+    "research": "🔎 Searching the web and reading sources...",
+    "merge": "🧩 Merging sources and summarizing...",
+    "answer_generation": "✍️  Writing the answer...",
+}
+
+
+def _render_stream(
+    system: "ResearchSystem", query: str, thread_id: Optional[str] = None, deadline: Optional[float] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """Run a query with live progress output.
+
+    Returns:
+        The final state, and whether the answer text was shown as it streamed in
+    """
+    state: Dict[str, Any] = {}
+    answer_started = False
+    for event in system.stream_query(query, thread_id=thread_id, deadline=deadline):
+        kind = event["type"]
+        if kind == "resumed":
+            console.print("[bold cyan]↩️  Resuming from the last completed step...[/bold cyan]")
+        elif kind == "node_start":
+            label = NODE_LABELS.get(event["node"], event["node"])
+            if event.get("query"):
+                label = f"{label} [dim]({event['query']})[/dim]"
+            console.print(f"[bold cyan]{label}[/bold cyan]")
+        elif kind == "source":
+            mark = "[green]✓[/green]" if event["fetched"] else "[yellow]–[/yellow]"
+            console.print(f"  {mark} {event['title']} [dim]{event['url']}[/dim]")
+        elif kind == "answer_chunk":
+            if not answer_started:
+                console.print(Panel.fit("📝 Research Answer", title="Result"))
+                answer_started = True
+            console.print(event["text"], end="", markup=False, highlight=False)
+        elif kind == "node_end" and event["node"] == "answer_generation" and answer_started:
+            console.print()
+            console.print()
+        elif kind == "result":
+            state = event["state"]
+    return state, answer_started
+
+
+def _print_skipped(skipped: List[Dict[str, Any]]) -> None:
+    """Summarize the work dropped to meet the deadline."""
+    if not skipped:
+        return
+    counts: Dict[str, int] = {}
+    for entry in skipped:
+        stage = entry["stage"] + (" (partial)" if entry.get("partial") else "")
+        counts[stage] = counts.get(stage, 0) + 1
+    summary = ", ".join(f"{stage} ×{count}" for stage, count in counts.items())
+    console.print(f"[yellow]⏱️  Deadline reached; answered with the sources in hand. Skipped: {summary}[/yellow]")
+
+
+def _print_profile(spans: List[Dict[str, Any]]) -> None:
+    """Print a per-stage latency table."""
+    from rich.table import Table
+
+    stages = Tracer.from_spans(spans).stage_summary()
+    table = Table(title="⏱️  Stage Latency")
+    table.add_column("Stage")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("Mean ms", justify="right")
+    table.add_column("Max ms", justify="right")
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["total"]):
+        table.add_row(
+            name,
+            str(stage["count"]),
+            f"{stage['total'] * 1000:.1f}",
+            f"{stage['mean'] * 1000:.1f}",
+            f"{stage['max'] * 1000:.1f}",
+        )
+    console.print(table)
+
+
+def _write_trace(spans: List[Dict[str, Any]], path: str) -> None:
+    """Export spans as Prometheus text or JSON, chosen by file extension."""
+    tracer = Tracer.from_spans(spans)
+    with open(path, "w") as f:
+        f.write(tracer.to_prometheus() if path.endswith(".prom") else tracer.to_json())
+    console.print(f"Trace saved to [bold]{path}[/bold]")
+
+
 @app.command()
 def research(
     query: str = typer.Argument(..., help="The research query to process"),
     save_to_file: Optional[str] = typer.Option(
         None, "--save", "-s", help="Save the answer to the specified file"
     ),
+    stream: bool = typer.Option(
+        True, "--stream/--no-stream", help="Show progress, sources and answer text as they arrive"
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Print a per-stage latency breakdown"
+    ),
+    trace_file: Optional[str] = typer.Option(
+        None, "--trace-file", help="Write stage timings to a file (.prom for Prometheus text, otherwise JSON)"
+    ),
+    local_first: Optional[bool] = typer.Option(
+        None, "--local-first/--web-first", help="Answer from the local page index when it has enough matching pages (default: INDEX_LOCAL_FIRST)"
+    ),
+    thread_id: Optional[str] = typer.Option(
+        None, "--thread-id", help="Checkpoint the run under this id; rerunning with the same id resumes from the last completed step"
+    ),
+    deadline: Optional[float] = typer.Option(
+        None, "--deadline", help="Seconds the query may take; slow fetches are dropped to meet it (default: QUERY_DEADLINE, 0 for none)"
+    ),
 ):
     """Process a research query and display the answer."""
+    from rich.markdown import Markdown
+    from rich.progress import Progress
+    from graph.agent_graph import get_research_system
+
     console.print(Panel.fit("🔍 Research Query", title="Input"))
     console.print(query)
     console.print()
     
-    system = ResearchSystem()
+    system = get_research_system(local_first)
+    
+    answer_shown = False
+    if stream:
+        result, answer_shown = _render_stream(system, query, thread_id, deadline)
+    else:
+        with Progress() as progress:
+            task1 = progress.add_task("[green]Researching...", total=1)
+            
+            # Process the query
+            result = system.process_query(query, thread_id=thread_id, deadline=deadline)
+            progress.update(task1, advance=1)
     
-    with Progress() as progress:
-        task1 = progress.add_task("[green]Researching...", total=1)
-        
-        # Process the query
-        result = system.process_query(query)
-        progress.update(task1, advance=1)
+    if trace_file:
+        _write_trace(result.get("spans", []), trace_file)
     
     # Check for errors
     if result.get("error"):
         console.print(Panel.fit(f"❌ Error: {result['error']}", title="Error"))
+        if profile:
+            _print_profile(result.get("spans", []))
         raise typer.Exit(code=1)
     
-    # Display the answer
+    _print_skipped(result.get("skipped", []))
+    
+    # Display the answer unless it was already shown as it streamed in
     answer = result["answer"]
-    console.print(Panel.fit("📝 Research Answer", title="Result"))
-    console.print(Markdown(answer.answer))
+    if not answer_shown:
+        console.print(Panel.fit("📝 Research Answer", title="Result"))
+        console.print(Markdown(answer.answer))
     
     # Display sources
     console.print(Panel.fit("📚 Sources", title="References"))
@@ -61,6 +190,291 @@ def research(
                 f.write(f"[{i+1}] {source['title']}\n")
                 f.write(f"    URL: {source['url']}\n\n")
         console.print(f"Results saved to [bold]{save_to_file}[/bold]")
+    
+    if profile:
+        _print_profile(result.get("spans", []))
+
+
+def _load_batch_queries(path: str, query_field: str, id_field: str) -> List[Tuple[str, str]]:
+    """Read (id, query) pairs from a JSONL file.
+
+    Lines may be JSON objects or bare JSON strings; objects without an id
+    field are identified by their line number.
+    """
+    queries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                queries.append((str(line_number), item))
+            else:
+                queries.append((str(item.get(id_field, line_number)), item[query_field]))
+    return queries
+
+
+def _load_completed_ids(path: str) -> Set[str]:
+    """Return ids that already have a successful result in an output JSONL file."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that query is simply run again
+                continue
+            if not record.get("error"):
+                completed.add(str(record["id"]))
+    return completed
+
+
+def _batch_thread_id(query_id: str, query: str) -> str:
+    """Checkpoint thread id of a batch query; it includes the query text so an edited query starts over."""
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+    return f"batch:{query_id}:{digest}"
+
+
+def _result_to_record(query_id: str, query: str, result: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """Convert a final graph state into a JSON-serializable output record."""
+    answer = result.get("answer")
+    return {
+        "id": query_id,
+        "query": query,
+        "answer": answer.answer if answer else None,
+        "sources": [
+            {"title": source["title"], "url": source["url"]}
+            for source in (answer.sources if answer else [])
+        ],
+        "error": result.get("error") or "",
+        "skipped": result.get("skipped", []),
+        "elapsed": round(elapsed, 3),
+    }
+
+
+@app.command("research-batch")
+def research_batch(
+    input_file: str = typer.Argument(..., help="JSONL file with one query per line"),
+    output_file: str = typer.Argument(..., help="JSONL file results are appended to"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", help="Queries processed at once"),
+    query_field: str = typer.Option("query", "--query-field", help="JSON field holding the query text"),
+    id_field: str = typer.Option("id", "--id-field", help="JSON field holding the query id"),
+    resume: bool = typer.Option(
+        True, "--resume/--no-resume", help="Skip queries that already succeeded in the output file"
+    ),
+    checkpoints: bool = typer.Option(
+        True, "--checkpoints/--no-checkpoints",
+        help="Checkpoint each query's progress so a rerun after a crash or failure resumes it mid-way",
+    ),
+    extract_workers: Optional[int] = typer.Option(
+        None, "--extract-workers", help="Processes for HTML extraction (default: EXTRACT_WORKERS)"
+    ),
+    deadline: Optional[float] = typer.Option(
+        None, "--deadline", help="Seconds each query may take (default: QUERY_DEADLINE, 0 for none)"
+    ),
+):
+    """Process every query in a JSONL file through one shared research system."""
+    from rich.progress import Progress
+    from graph.agent_graph import get_research_system
+    from utils.extract import set_extract_workers
+
+    queries = _load_batch_queries(input_file, query_field, id_field)
+
+    if resume:
+        completed = _load_completed_ids(output_file)
+        pending = [(query_id, query) for query_id, query in queries if query_id not in completed]
+    else:
+        open(output_file, "w").close()
+        pending = queries
+    console.print(f"{len(queries)} queries, {len(queries) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return
+
+    if extract_workers is not None:
+        set_extract_workers(extract_workers)
+
+    system = get_research_system()
+    failures = 0
+
+    def run(query_id: str, query: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        thread_id = _batch_thread_id(query_id, query) if checkpoints else None
+        try:
+            if thread_id is not None and not resume:
+                system.forget(thread_id)
+            result = system.process_query(query, thread_id=thread_id, deadline=deadline)
+        except Exception as e:
+            result = {"error": f"Unhandled error: {str(e)}"}
+        return _result_to_record(query_id, query, result, time.perf_counter() - start)
+
+    with open(output_file, "a") as out, Progress(console=console) as progress:
+        task = progress.add_task("[green]Researching...", total=len(pending))
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(run, query_id, query) for query_id, query in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                if record["error"]:
+                    failures += 1
+                # Write each result as soon as it finishes so a crash loses at most in-flight queries
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                progress.update(task, advance=1)
+
+    console.print(f"Finished: {len(pending) - failures} succeeded, {failures} failed. Results in [bold]{output_file}[/bold]")
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def serve(
+    host: Optional[str] = typer.Option(None, "--host", help="Interface to listen on (default: SERVE_HOST)"),
+    port: Optional[int] = typer.Option(None, "--port", "-p", help="Port to listen on (default: SERVE_PORT)"),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", help="Queries researched at once (default: SERVE_WORKERS)"
+    ),
+    max_queue: Optional[int] = typer.Option(
+        None, "--max-queue", help="Queries waiting for a worker before requests get 503 (default: SERVE_MAX_QUEUE)"
+    ),
+    deadline: Optional[float] = typer.Option(
+        None, "--deadline", help="Seconds each query may take (default: QUERY_DEADLINE, 0 for none)"
+    ),
+    fixtures: bool = typer.Option(
+        False, "--fixtures", help="Search local fixture pages instead of the web, for offline testing"
+    ),
+):
+    """Serve research over HTTP (POST /research, GET /healthz, GET /metrics)."""
+    from server import run_server
+    from utils.config import SERVE_HOST, SERVE_PORT, SERVE_WORKERS, SERVE_MAX_QUEUE
+
+    fixture_server = None
+    if fixtures:
+        from benchmarks.fixtures import FixtureServer
+        from utils.search import set_search_backend
+
+        fixture_server = FixtureServer().start()
+        set_search_backend(fixture_server.search)
+        console.print("Searching local fixture pages instead of the web")
+    try:
+        run_server(
+            host or SERVE_HOST,
+            SERVE_PORT if port is None else port,
+            workers=SERVE_WORKERS if workers is None else workers,
+            max_queue=SERVE_MAX_QUEUE if max_queue is None else max_queue,
+            deadline=deadline,
+        )
+    finally:
+        if fixture_server is not None:
+            fixture_server.stop()
+
+
+def _print_cache_stats(title: str, cache) -> None:
+    """Print the counters of a SQLiteCache."""
+    stats = cache.stats()
+
+    console.print(Panel.fit(f"🗄️  {title}", title="Cache"))
+    console.print(f"Location:    {cache.path}")
+    console.print(f"Entries:     {stats['entries']}")
+    console.print(f"Size:        {stats['bytes']} / {stats['max_bytes']} bytes")
+    console.print(f"Hits:        {stats['hits']}")
+    console.print(f"Misses:      {stats['misses']}")
+    console.print(f"Hit ratio:   {stats['hit_ratio']:.1%}")
+    console.print(f"Evictions:   {stats['evictions']}")
+    console.print(f"Expirations: {stats['expirations']}")
+    console.print()
+
+
+@app.command("cache-stats")
+def cache_stats():
+    """Show hit/miss/eviction counters for the on-disk caches."""
+    from utils.llm import get_completion_store
+    from utils.search import get_page_cache, get_search_store
+
+    page_cache = get_page_cache()
+    if page_cache is None:
+        console.print("Page cache is disabled (PAGE_CACHE_ENABLED=0).")
+    else:
+        _print_cache_stats("Page Cache", page_cache)
+
+    search_store = get_search_store()
+    if search_store is None:
+        console.print("Persistent search cache is disabled (SEARCH_CACHE_PERSIST=0).")
+    else:
+        _print_cache_stats("Search Cache", search_store)
+
+    completion_store = get_completion_store()
+    if completion_store is None:
+        console.print("Persistent completion cache is disabled (COMPLETION_CACHE_ENABLED=0 or COMPLETION_CACHE_PERSIST=0).")
+    else:
+        _print_cache_stats("Completion Cache", completion_store)
+
+
+@app.command("host-stats")
+def host_stats(
+    limit: int = typer.Option(20, "--limit", "-n", help="Number of hosts to show (0 for all)"),
+    sort: str = typer.Option(
+        "score", "--sort", help="Order by score (worst first), requests, errors or latency"
+    ),
+    reset: Optional[str] = typer.Option(
+        None, "--reset", help="Forget a host's figures and close its circuit ('all' for every host)"
+    ),
+):
+    """Show per-host latency, error rate and circuit state from earlier fetches."""
+    from rich.table import Table
+    from utils.health import get_health_tracker
+
+    tracker = get_health_tracker()
+    if tracker is None:
+        console.print("Host health tracking is disabled (HEALTH_ENABLED=0).")
+        return
+    if reset is not None:
+        tracker.reset(None if reset == "all" else reset.lower())
+        console.print(f"Reset host health for [bold]{reset}[/bold]")
+        return
+
+    sort_keys = {
+        "score": lambda host: -host["score"],
+        "requests": lambda host: -host["requests"],
+        "errors": lambda host: -host["error_rate"],
+        "latency": lambda host: -host["latency_ewma"],
+    }
+    if sort not in sort_keys:
+        console.print(f"[bold red]Error:[/bold red] --sort must be one of {', '.join(sort_keys)}")
+        raise typer.Exit(code=1)
+    hosts = sorted(tracker.hosts(), key=sort_keys[sort])
+    if not hosts:
+        console.print("No hosts tracked yet.")
+        return
+
+    table = Table(title=f"🌐 Host Health ({tracker.path})")
+    table.add_column("Host", overflow="fold")
+    table.add_column("Reqs", justify="right")
+    table.add_column("Fails", justify="right")
+    table.add_column("Err %", justify="right")
+    table.add_column("Latency ms", justify="right")
+    table.add_column("Circuit")
+    table.add_column("Last failure")
+    table.add_column("Last error", overflow="fold")
+    state_styles = {"closed": "green", "half-open": "yellow", "open": "red"}
+    for host in hosts[:limit or None]:
+        last_failure = (
+            time.strftime("%m-%d %H:%M", time.localtime(host["last_failure"])) if host["last_failure"] else ""
+        )
+        table.add_row(
+            host["host"],
+            str(host["requests"]),
+            str(host["failures"]),
+            f"{host['error_rate']:.0%}",
+            f"{host['latency_ewma'] * 1000:.0f}",
+            f"[{state_styles[host['state']]}]{host['state']}[/]",
+            last_failure,
+            host["last_error"],
+        )
+    console.print(table)
+    if limit and len(hosts) > limit:
+        console.print(f"... and {len(hosts) - limit} more hosts")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,24 @@
 """LangGraph flow for the dual-agent research system."""
-from typing import Dict, List, Any, TypedDict, Annotated
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple, TypedDict, Annotated
+import asyncio
+import contextvars
+import operator
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
-from langchain.schema import Document
+from langgraph.types import Send
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain.pydantic_v1 import BaseModel, Field
 
 from agents.research_agent import ResearchAgent, ResearchResult
 from agents.answer_agent import AnswerAgent, FormattedAnswer
+from agents.planner_agent import PlannerAgent
+from utils.blobstore import missing_blobs
+from utils.checkpoint import get_checkpointer
+from utils.config import INDEX_LOCAL_FIRST, PLAN_MAX_CONCURRENCY, QUERY_DEADLINE
+from utils.deadline import Deadline, use_deadline
+from utils.registry import get_or_create
+from utils.tracing import METRICS, Tracer, trace_span, use_tracer
 
 
 class GraphState(TypedDict):
@@ -14,6 +27,44 @@ class GraphState(TypedDict):
     research_result: ResearchResult
     answer: FormattedAnswer
     error: str
+    spans: List[Dict[str, Any]]  # per-stage timings, filled in when the run finishes
+    local_first: bool  # answer from the local page index before searching the web
+    subqueries: List[str]  # searches planned for the query, the query itself first
+    branches: Annotated[List[Dict[str, Any]], operator.add]  # one entry per finished research branch
+    skipped: List[Dict[str, Any]]  # work dropped to meet the deadline, filled in when the run finishes
+
+
+class BranchState(TypedDict):
+    """Input of one research branch, sent by the planner for each sub-query."""
+    index: int
+    subquery: str
+    local_first: bool
+
+
+def _get_event_writer(config: RunnableConfig) -> Optional[Callable[[Dict[str, Any]], None]]:
+    """Return the graph's custom stream writer if the run is streaming progress events."""
+    if not config.get("configurable", {}).get("stream_events"):
+        return None
+    return get_stream_writer()
+
+
+def _source_event(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the progress event emitted when a source page has been fetched."""
+    return {
+        "type": "source",
+        "title": result.get("title", ""),
+        "url": result.get("url", ""),
+        "fetched": bool(result.get("raw_content") or result.get("content_ref")),
+    }
+
+
+def _apply_update(state: Dict[str, Any], update: Optional[Dict[str, Any]]) -> None:
+    """Apply a node's update to a streamed copy of the state, accumulating branch entries."""
+    for key, value in (update or {}).items():
+        if key == "branches":
+            state[key] = state.get(key, []) + value
+        else:
+            state[key] = value
 
 
 def create_agent_graph() -> StateGraph:
@@ -26,35 +77,149 @@ def create_agent_graph() -> StateGraph:
     workflow = StateGraph(GraphState)
     
     # Initialize agents
+    planner_agent = PlannerAgent()
     research_agent = ResearchAgent()
     answer_agent = AnswerAgent()
     
-    # Define node functions
-    def research_node(state: GraphState) -> GraphState:
-        """Research agent node that searches and processes information."""
+    # Define node functions. When the run is streamed, nodes report their
+    # progress (start, fetched sources, answer text) through the custom stream.
+    def plan_node(state: GraphState, config: RunnableConfig) -> GraphState:
+        """Planner node that splits the query into sub-queries."""
+        try:
+            writer = _get_event_writer(config)
+            if writer is not None:
+                writer({"type": "node_start", "node": "plan"})
+            with trace_span("node.plan") as span:
+                subqueries = planner_agent.plan(state["query"])
+                span["subqueries"] = len(subqueries)
+            return {"subqueries": subqueries}
+        except Exception as e:
+            return {"error": f"Planning error: {str(e)}"}
+    
+    def fan_out(state: GraphState) -> Any:
+        """Start one research branch per sub-query; LangGraph runs them in parallel."""
+        if state.get("error"):
+            return END
+        return [
+            Send("research", {"index": index, "subquery": subquery, "local_first": state.get("local_first", False)})
+            for index, subquery in enumerate(state["subqueries"])
+        ]
+    
+    def _branch_callbacks(state: BranchState, config: RunnableConfig) -> Optional[Callable[[Dict[str, Any]], None]]:
+        """Announce a branch on the progress stream and return its on_source callback."""
+        writer = _get_event_writer(config)
+        if writer is None:
+            return None
+        writer({"type": "node_start", "node": "research", "query": state["subquery"]})
+        return lambda result: writer(_source_event(result))
+    
+    # Branches record failures instead of raising, so one failed search does
+    # not discard the results of the others
+    def research_node(state: BranchState, config: RunnableConfig) -> GraphState:
+        """Research branch node that searches and fetches sources for one sub-query."""
+        entry = {"index": state["index"], "query": state["subquery"], "results": [], "error": ""}
+        try:
+            on_source = _branch_callbacks(state, config)
+            with trace_span("node.research", subquery=state["subquery"]):
+                entry["results"] = research_agent.gather(
+                    state["subquery"], on_source=on_source, local_first=state.get("local_first", False)
+                )
+        except Exception as e:
+            entry["error"] = str(e)
+        return {"branches": [entry]}
+    
+    async def aresearch_node(state: BranchState, config: RunnableConfig) -> GraphState:
+        """Async research branch node, used when the graph runs with ainvoke."""
+        entry = {"index": state["index"], "query": state["subquery"], "results": [], "error": ""}
+        try:
+            on_source = _branch_callbacks(state, config)
+            with trace_span("node.research", subquery=state["subquery"]):
+                entry["results"] = await research_agent.agather(
+                    state["subquery"], on_source=on_source, local_first=state.get("local_first", False)
+                )
+        except Exception as e:
+            entry["error"] = str(e)
+        return {"branches": [entry]}
+    
+    def _merged_results(state: GraphState) -> List[Dict[str, Any]]:
+        """Merge the branches' results, failing only if every branch failed."""
+        branches = sorted(state["branches"], key=lambda entry: entry["index"])
+        failed = [entry for entry in branches if entry["error"]]
+        for entry in failed:
+            print(f"Research branch failed for '{entry['query']}': {entry['error']}")
+        if branches and len(failed) == len(branches):
+            raise RuntimeError(failed[0]["error"])
+        return research_agent.merge_results([entry["results"] for entry in branches])
+    
+    def merge_node(state: GraphState, config: RunnableConfig) -> GraphState:
+        """Merge node that combines the branches' sources and summarizes them."""
+        try:
+            writer = _get_event_writer(config)
+            if writer is not None:
+                writer({"type": "node_start", "node": "merge"})
+            with trace_span("node.merge"):
+                research_result = research_agent.synthesize(state["query"], _merged_results(state))
+            return {"research_result": research_result}
+        except Exception as e:
+            return {"error": f"Research error: {str(e)}"}
+    
+    async def amerge_node(state: GraphState, config: RunnableConfig) -> GraphState:
+        """Async merge node, used when the graph runs with ainvoke."""
         try:
-            query = state["query"]
-            research_result = research_agent.research(query)
+            writer = _get_event_writer(config)
+            if writer is not None:
+                writer({"type": "node_start", "node": "merge"})
+            with trace_span("node.merge"):
+                # Deduplication fingerprints every page; keep it off the event loop
+                merged = await asyncio.get_running_loop().run_in_executor(
+                    None, contextvars.copy_context().run, _merged_results, state
+                )
+                research_result = await research_agent.asynthesize(state["query"], merged)
             return {"research_result": research_result}
         except Exception as e:
             return {"error": f"Research error: {str(e)}"}
     
-    def answer_generation_node(state: GraphState) -> GraphState:
+    def answer_generation_node(state: GraphState, config: RunnableConfig) -> GraphState:
         """Answer agent node that creates a formatted answer."""
         try:
             research_result = state["research_result"]
-            answer = answer_agent.create_answer(research_result)
+            writer = _get_event_writer(config)
+            on_chunk = None
+            if writer is not None:
+                writer({"type": "node_start", "node": "answer_generation"})
+                on_chunk = lambda text: writer({"type": "answer_chunk", "text": text})
+            with trace_span("node.answer_generation"):
+                answer = answer_agent.create_answer(research_result, on_chunk=on_chunk)
+            return {"answer": answer}
+        except Exception as e:
+            return {"error": f"Answer generation error: {str(e)}"}
+    
+    async def aanswer_generation_node(state: GraphState, config: RunnableConfig) -> GraphState:
+        """Async answer node, used when the graph runs with ainvoke."""
+        try:
+            writer = _get_event_writer(config)
+            on_chunk = None
+            if writer is not None:
+                writer({"type": "node_start", "node": "answer_generation"})
+                on_chunk = lambda text: writer({"type": "answer_chunk", "text": text})
+            with trace_span("node.answer_generation"):
+                answer = await answer_agent.acreate_answer(state["research_result"], on_chunk=on_chunk)
             return {"answer": answer}
         except Exception as e:
             return {"error": f"Answer generation error: {str(e)}"}
     
-    # Add nodes to the graph
-    workflow.add_node("research", research_node)
-    workflow.add_node("answer_generation", answer_generation_node)
+    # Add nodes to the graph; each has a sync and an async implementation so
+    # the compiled graph supports both invoke and ainvoke
+    workflow.add_node("plan", RunnableLambda(plan_node))
+    workflow.add_node("research", RunnableLambda(research_node, afunc=aresearch_node))
+    workflow.add_node("merge", RunnableLambda(merge_node, afunc=amerge_node))
+    workflow.add_node("answer_generation", RunnableLambda(answer_generation_node, afunc=aanswer_generation_node))
     
-    # Define edges
-    workflow.set_entry_point("research")
-    workflow.add_edge("research", "answer_generation")
+    # Define edges: the planner fans out to parallel research branches, and
+    # the merge step waits for all of them
+    workflow.set_entry_point("plan")
+    workflow.add_conditional_edges("plan", fan_out, ["research", END])
+    workflow.add_edge("research", "merge")
     workflow.add_edge("answer_generation", END)
     
     # Define conditional edges for error handling
@@ -65,7 +230,7 @@ def create_agent_graph() -> StateGraph:
         return "continue"
     
     workflow.add_conditional_edges(
-        "research",
+        "merge",
         check_for_errors,
         {
             "error": END,
@@ -85,32 +250,354 @@ def create_agent_graph() -> StateGraph:
     return workflow
 
 
+def get_compiled_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Return the compiled agent graph, compiling it once per process and checkpointer.
+
+    The compiled graph holds no per-run state, so one instance serves every
+    concurrent query.
+
+    Args:
+        checkpointer: Saves the state after every step of runs given a thread id
+    """
+    return get_or_create(
+        ("graph", "research", checkpointer),
+        lambda: create_agent_graph().compile(checkpointer=checkpointer),
+    )
+
+
 class ResearchSystem:
     """Main system class that orchestrates the research workflow."""
     
-    def __init__(self):
-        """Initialize the research system."""
-        self.graph = create_agent_graph().compile()
+    def __init__(self, local_first: Optional[bool] = None, checkpointer: Optional[BaseCheckpointSaver] = None):
+        """Initialize the research system.
+        
+        Args:
+            local_first: Answer from the local page index when it has enough
+                matching pages; defaults to INDEX_LOCAL_FIRST
+            checkpointer: Where runs given a thread id are checkpointed; any
+                LangGraph checkpoint saver works. Defaults to the one chosen by
+                CHECKPOINT_BACKEND, opened on first use.
+        """
+        self.graph = get_compiled_graph()
+        self.local_first = INDEX_LOCAL_FIRST if local_first is None else local_first
+        self._checkpointer = checkpointer
+    
+    def _initial_state(self, query: str) -> GraphState:
+        """Build the graph input for a query."""
+        return {
+            "query": query,
+            "research_result": None,
+            "answer": None,
+            "error": "",
+            "spans": [],
+            "local_first": self.local_first,
+            "subqueries": [],
+            "branches": [],
+            "skipped": []
+        }
+    
+    def _config(self, stream_events: bool = False, thread_id: Optional[str] = None) -> RunnableConfig:
+        """Build the run config; max_concurrency caps how many research branches run at once."""
+        configurable: Dict[str, Any] = {"stream_events": stream_events}
+        if thread_id is not None:
+            configurable["thread_id"] = thread_id
+        return {"max_concurrency": PLAN_MAX_CONCURRENCY, "configurable": configurable}
+    
+    @property
+    def checkpointer(self) -> Optional[BaseCheckpointSaver]:
+        """The checkpointer used for runs given a thread id, or None if checkpointing is off."""
+        if self._checkpointer is None:
+            self._checkpointer = get_checkpointer()
+        return self._checkpointer
+    
+    def _graph(self, thread_id: Optional[str]):
+        """Return the graph to run: the checkpointed one when the run has a thread id."""
+        if thread_id is None:
+            return self.graph
+        if self.checkpointer is None:
+            print(f"Checkpointing is disabled (CHECKPOINT_BACKEND=none); run '{thread_id}' will not be resumable")
+            return self.graph
+        return get_compiled_graph(self.checkpointer)
     
-    def process_query(self, query: str) -> Dict[str, Any]:
+    def _plan_run(self, query: str, latest: Any) -> Tuple[str, Any]:
+        """Decide how to continue a checkpointed thread from its latest state snapshot.
+        
+        Returns:
+            ("start", None) to run from the beginning, ("restart", None) to
+            discard the thread and run from the beginning, ("done", state) if
+            the run already finished, ("resume", config) to continue from the
+            checkpoint named by the config (None for the latest one), or
+            ("rewind", None) if the run ended with an error and must continue
+            from an earlier checkpoint
+        """
+        if not latest.values:
+            return "start", None
+        if latest.values.get("query") != query:
+            print(f"Run '{latest.config['configurable']['thread_id']}' was for another query; starting over")
+            return "restart", None
+        if (latest.next or latest.values.get("error")) and self._lost_page_text(latest):
+            return "restart", None
+        if latest.next:
+            # Interrupted mid-run. Resuming the latest checkpoint without naming
+            # it keeps the writes of branches that had finished; only the rest run again.
+            return "resume", None
+        if not latest.values.get("error"):
+            return "done", latest.values
+        return "rewind", None
+    
+    def _lost_page_text(self, latest: Any) -> bool:
+        """Whether pages a checkpointed run fetched are no longer in the blob store.
+
+        Continuing such a run would summarize without them, so it starts over.
+        """
+        refs = [
+            result["content_ref"]
+            for entry in latest.values.get("branches", [])
+            for result in entry["results"]
+            if result.get("content_ref")
+        ]
+        missing = missing_blobs(refs)
+        if missing:
+            print(f"Run '{latest.config['configurable']['thread_id']}' lost {len(missing)} fetched pages; starting over")
+        return bool(missing)
+    
+    def _rewind(self, history: Iterable[Any]) -> Tuple[str, Any]:
+        """Find the last checkpoint before a run's failure, from its snapshots (newest first)."""
+        for snapshot in history:
+            values = snapshot.values
+            failed = values.get("error") or any(entry["error"] for entry in values.get("branches", []))
+            if snapshot.next and not failed:
+                return "resume", snapshot.config
+        return "restart", None
+    
+    def _run_input(self, graph, query: str, thread_id: Optional[str], stream_events: bool = False) -> Tuple[Any, RunnableConfig, Optional[Dict[str, Any]]]:
+        """Work out the input and config of a run, resuming a checkpointed thread if it can.
+        
+        Returns:
+            The graph input (None when resuming), the run config, and the final
+            state if the thread's run had already finished
+        """
+        config = self._config(stream_events, thread_id)
+        if graph is self.graph:
+            return self._initial_state(query), config, None
+        action, value = self._plan_run(query, graph.get_state(config))
+        if action == "rewind":
+            action, value = self._rewind(graph.get_state_history(config))
+        if action == "restart":
+            self.forget(thread_id)
+        return self._apply_plan(query, config, action, value)
+    
+    async def _arun_input(self, graph, query: str, thread_id: Optional[str], stream_events: bool = False) -> Tuple[Any, RunnableConfig, Optional[Dict[str, Any]]]:
+        """Async version of _run_input."""
+        config = self._config(stream_events, thread_id)
+        if graph is self.graph:
+            return self._initial_state(query), config, None
+        action, value = self._plan_run(query, await graph.aget_state(config))
+        if action == "rewind":
+            action, value = self._rewind([snapshot async for snapshot in graph.aget_state_history(config)])
+        if action == "restart":
+            await self.checkpointer.adelete_thread(thread_id)
+        return self._apply_plan(query, config, action, value)
+    
+    def _apply_plan(self, query: str, config: RunnableConfig, action: str, value: Any) -> Tuple[Any, RunnableConfig, Optional[Dict[str, Any]]]:
+        """Turn the decision about a checkpointed thread into the run's input and config."""
+        if action == "done":
+            return None, config, dict(value)
+        if action == "resume":
+            if value is None:
+                return None, config, None
+            return None, {**config, "configurable": {**config["configurable"], **value["configurable"]}}, None
+        return self._initial_state(query), config, None
+    
+    def _final_state(self, graph, thread_id: str) -> Dict[str, Any]:
+        """Read the final state of a checkpointed run."""
+        return dict(graph.get_state(self._config(thread_id=thread_id)).values)
+    
+    def _deadline(self, seconds: Optional[float]) -> Optional[Deadline]:
+        """Start the deadline of a run (None without one)."""
+        seconds = QUERY_DEADLINE if seconds is None else seconds
+        return Deadline(seconds) if seconds > 0 else None
+    
+    def forget(self, thread_id: str) -> None:
+        """Delete a run's checkpoints, so the next run with its thread id starts from scratch."""
+        if self.checkpointer is not None:
+            self.checkpointer.delete_thread(thread_id)
+    
+    def _degraded(self, graph, thread_id: Optional[str], budget: Optional[Deadline]) -> bool:
+        """Whether a checkpointed run dropped work to meet its deadline.
+        
+        Such a run's final checkpoint holds a partial answer. It is deleted
+        rather than kept as a finished run, so the thread's next run starts fresh.
+        """
+        if graph is self.graph or budget is None or not budget.skipped:
+            return False
+        print(f"Run '{thread_id}' was cut short by its deadline; its checkpoints are discarded")
+        return True
+    
+    def process_query(self, query: str, thread_id: Optional[str] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
         """Process a user query through the agent workflow.
         
         Args:
             query: The user's research query
+            thread_id: Checkpoint the run under this id. Running the same query
+                with the same id again resumes from the last completed step
+                (a finished run returns its stored result).
+            deadline: Seconds the run may take (0 for no limit); defaults to
+                QUERY_DEADLINE. Slow searches, fetches and notes are dropped to
+                meet it, and are listed under ``skipped`` in the final state.
             
         Returns:
             The final state dictionary containing research results and answer
         """
-        # Initialize the state
-        initial_state = {
-            "query": query,
-            "research_result": None,
-            "answer": None,
-            "error": ""
-        }
+        budget = self._deadline(deadline)
+        graph = self._graph(thread_id)
         
-        # Execute the graph
-        result = self.graph.invoke(initial_state)
+        # Initialize the state, or pick up a checkpointed run
+        run_input, config, finished = self._run_input(graph, query, thread_id)
+        if finished is not None:
+            return finished
+        
+        # Execute the graph, timing each stage
+        tracer = Tracer()
+        with use_tracer(tracer), use_deadline(budget):
+            result = graph.invoke(run_input, config=config)
+        if self._degraded(graph, thread_id, budget):
+            self.forget(thread_id)
+        result["spans"] = tracer.spans
+        result["skipped"] = budget.skipped if budget is not None else []
         
         # Return the final state
-        return result 
\ No newline at end of file
+        return result
+    
+    async def aprocess_query(self, query: str, thread_id: Optional[str] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Asynchronously process a user query through the agent workflow.
+        
+        Many queries can be in flight on one event loop; their searches, page
+        fetches and LLM calls overlap.
+        
+        Args:
+            query: The user's research query
+            thread_id: Checkpoint the run under this id (see process_query)
+            deadline: Seconds the run may take (see process_query)
+            
+        Returns:
+            The final state dictionary containing research results and answer
+        """
+        budget = self._deadline(deadline)
+        graph = self._graph(thread_id)
+        run_input, config, finished = await self._arun_input(graph, query, thread_id)
+        if finished is not None:
+            return finished
+        tracer = Tracer()
+        with use_tracer(tracer), use_deadline(budget):
+            result = await graph.ainvoke(run_input, config=config)
+        if self._degraded(graph, thread_id, budget):
+            await self.checkpointer.adelete_thread(thread_id)
+        result["spans"] = tracer.spans
+        result["skipped"] = budget.skipped if budget is not None else []
+        return result
+    
+    def stream_query(self, query: str, thread_id: Optional[str] = None, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Process a query, yielding progress events as the workflow runs.
+        
+        Events are dicts with a ``type`` key:
+        
+        - ``node_start`` / ``node_end``: a graph node began / finished (``node``)
+        - ``source``: a search result's page was fetched (``title``, ``url``, ``fetched``)
+        - ``answer_chunk``: a piece of the answer text as it is generated (``text``)
+        - ``resumed``: the run continues from a checkpoint of an earlier attempt
+        - ``result``: the final state dictionary (``state``), always last
+        
+        Args:
+            query: The user's research query
+            thread_id: Checkpoint the run under this id (see process_query)
+            deadline: Seconds the run may take (see process_query)
+            
+        Yields:
+            Progress event dictionaries
+        """
+        budget = self._deadline(deadline)
+        graph = self._graph(thread_id)
+        run_input, config, finished = self._run_input(graph, query, thread_id, stream_events=True)
+        if finished is not None:
+            yield {"type": "result", "state": finished}
+            return
+        if run_input is None:
+            yield {"type": "resumed"}
+        state = run_input or {}
+        tracer = Tracer()
+        # The tracer and deadline are set around each step rather than across
+        # yields, so the consumer may resume or close this generator from any
+        # context. The spans are added to METRICS once, when the run ends.
+        steps = graph.stream(run_input, config=config, stream_mode=["updates", "custom"])
+        try:
+            while True:
+                with use_tracer(tracer, observe=False), use_deadline(budget):
+                    step = next(steps, None)
+                if step is None:
+                    break
+                mode, chunk = step
+                if mode == "custom":
+                    yield chunk
+                    continue
+                for node, update in chunk.items():
+                    _apply_update(state, update)
+                    yield {"type": "node_end", "node": node}
+        finally:
+            with use_tracer(tracer, observe=False), use_deadline(budget):
+                steps.close()
+            METRICS.observe(tracer)
+        if graph is not self.graph:
+            # A resumed run's updates cover only the steps run this time
+            state = self._final_state(graph, thread_id)
+            if self._degraded(graph, thread_id, budget):
+                self.forget(thread_id)
+        state["spans"] = tracer.spans
+        state["skipped"] = budget.skipped if budget is not None else []
+        yield {"type": "result", "state": state}
+    
+    async def astream_query(self, query: str, thread_id: Optional[str] = None, deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Asynchronously process a query, yielding the same events as stream_query."""
+        budget = self._deadline(deadline)
+        graph = self._graph(thread_id)
+        run_input, config, finished = await self._arun_input(graph, query, thread_id, stream_events=True)
+        if finished is not None:
+            yield {"type": "result", "state": finished}
+            return
+        if run_input is None:
+            yield {"type": "resumed"}
+        state = run_input or {}
+        tracer = Tracer()
+        # Set per step, as in stream_query
+        steps = graph.astream(run_input, config=config, stream_mode=["updates", "custom"])
+        try:
+            while True:
+                with use_tracer(tracer, observe=False), use_deadline(budget):
+                    try:
+                        mode, chunk = await steps.__anext__()
+                    except StopAsyncIteration:
+                        break
+                if mode == "custom":
+                    yield chunk
+                    continue
+                for node, update in chunk.items():
+                    _apply_update(state, update)
+                    yield {"type": "node_end", "node": node}
+        finally:
+            with use_tracer(tracer, observe=False), use_deadline(budget):
+                await steps.aclose()
+            METRICS.observe(tracer)
+        if graph is not self.graph:
+            state = dict((await graph.aget_state(self._config(thread_id=thread_id))).values)
+            if self._degraded(graph, thread_id, budget):
+                await self.checkpointer.adelete_thread(thread_id)
+        state["spans"] = tracer.spans
+        state["skipped"] = budget.skipped if budget is not None else []
+        yield {"type": "result", "state": state}
+
+
+def get_research_system(local_first: Optional[bool] = None) -> ResearchSystem:
+    """Return the process-wide ResearchSystem for a local-first setting (default INDEX_LOCAL_FIRST)."""
+    if local_first is None:
+        local_first = INDEX_LOCAL_FIRST
+    return get_or_create(("system", "research", local_first), lambda: ResearchSystem(local_first=local_first))
@@ -0,0 +1,415 @@
+"""HTTP service mode: a long-running asyncio server around the shared ResearchSystem.
+
+Endpoints:
+
+- ``POST /research`` with a JSON body ``{"query": "...", "local_first": false}``,
+  or ``GET /research?q=...``: run a query and return the answer and sources
+- ``GET /healthz``: liveness and load counters
+- ``GET /metrics``: Prometheus text format metrics
+
+Concurrent requests for the same normalized query share one graph execution
+(single flight). At most ``workers`` executions run at once, up to
+``max_queue`` more wait for a slot, and anything beyond that is refused with
+503 so a burst cannot pile up unbounded work. Connections are capped too, and
+each part of a request must arrive within a read timeout, so idle or slowly
+trickling clients cannot hold the server's connections.
+"""
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import json
+import time
+
+from graph.agent_graph import get_research_system
+from utils.config import (
+    INDEX_LOCAL_FIRST,
+    SERVE_WORKERS,
+    SERVE_MAX_QUEUE,
+    SERVE_MAX_BODY_BYTES,
+    SERVE_READ_TIMEOUT,
+    SERVE_MAX_CONNECTIONS,
+)
+from utils.search import normalize_query
+from utils.tracing import METRICS
+
+
+class Overloaded(Exception):
+    """Raised when a query is refused because every worker and queue slot is taken."""
+
+
+# Most header lines read for one request
+_MAX_HEADERS = 100
+
+
+class ResearchService:
+    """Runs research queries with bounded concurrency and single-flight coalescing."""
+
+    def __init__(
+        self,
+        workers: int = SERVE_WORKERS,
+        max_queue: int = SERVE_MAX_QUEUE,
+        get_system: Callable[[bool], Any] = get_research_system,
+        deadline: Optional[float] = None,
+    ):
+        """Initialize the service.
+
+        Args:
+            workers: Graph executions run at once
+            max_queue: Executions that may wait for a worker before new ones are refused
+            get_system: Returns the ResearchSystem for a local-first setting
+            deadline: Seconds each execution may take; defaults to QUERY_DEADLINE
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._get_system = get_system
+        self.deadline = deadline
+        self._slots: Optional[asyncio.Semaphore] = None
+        # In-flight executions keyed by (normalized query, local_first)
+        self._flights: Dict[Tuple[str, bool], asyncio.Future] = {}
+        self.admitted = 0  # executions running or waiting for a worker
+        self.running = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.executions = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return the load and coalescing counters."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.admitted - self.running,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "executions": self.executions,
+            "failures": self.failures,
+        }
+
+    async def research(self, query: str, local_first: Optional[bool] = None) -> Tuple[Dict[str, Any], bool]:
+        """Answer a query, joining an identical execution that is already in flight.
+
+        Args:
+            query: The research query
+            local_first: Answer from the local page index first; defaults to INDEX_LOCAL_FIRST
+
+        Returns:
+            The final graph state, and whether it came from another request's execution
+
+        Raises:
+            Overloaded: If the query is new and the service is at capacity
+        """
+        local_first = INDEX_LOCAL_FIRST if local_first is None else bool(local_first)
+        key = (normalize_query(query), local_first)
+        self.requests += 1
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            # Shielded so a caller that disconnects does not cancel the others' result
+            return await asyncio.shield(flight), True
+
+        if self.admitted >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.admitted} queries in progress")
+
+        self.admitted += 1
+        flight = asyncio.ensure_future(self._execute(query, local_first))
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._flights.pop(key, None) if self._flights.get(key) is done else None)
+        return await asyncio.shield(flight), False
+
+    async def _execute(self, query: str, local_first: bool) -> Dict[str, Any]:
+        """Run one graph execution once a worker slot is free."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            async with self._slots:
+                self.running += 1
+                self.executions += 1
+                try:
+                    return await self._get_system(local_first).aprocess_query(query, deadline=self.deadline)
+                except Exception:
+                    self.failures += 1
+                    raise
+                finally:
+                    self.running -= 1
+        finally:
+            self.admitted -= 1
+
+
+def _response_record(query: str, result: Dict[str, Any], coalesced: bool, elapsed: float) -> Dict[str, Any]:
+    """Convert a final graph state into the JSON response body."""
+    answer = result.get("answer")
+    return {
+        "query": query,
+        "answer": answer.answer if answer else None,
+        "sources": [
+            {"title": source["title"], "url": source["url"]}
+            for source in (answer.sources if answer else [])
+        ],
+        "error": result.get("error") or "",
+        "skipped": result.get("skipped", []),
+        "coalesced": coalesced,
+        "elapsed": round(elapsed, 3),
+    }
+
+
+class ResearchServer:
+    """Minimal HTTP/1.1 front end for a ResearchService, built on asyncio streams."""
+
+    def __init__(
+        self,
+        service: ResearchService,
+        host: str,
+        port: int,
+        read_timeout: float = SERVE_READ_TIMEOUT,
+        max_connections: int = SERVE_MAX_CONNECTIONS,
+    ):
+        """Initialize the server.
+
+        Args:
+            service: The service that runs queries
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            read_timeout: Seconds a client has to send each request line,
+                header block and body, and that an idle connection is kept
+            max_connections: Open connections before new ones are refused with 503
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self.max_connections = max(1, max_connections)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.connections = 0
+        self.refused_connections = 0
+        self.timed_out = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return the connection counters."""
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "refused": self.refused_connections,
+            "timed_out": self.timed_out,
+        }
+
+    async def start(self) -> None:
+        """Start listening; ``port`` is updated to the bound port."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start listening (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one (possibly kept-alive) connection."""
+        if self.connections >= self.max_connections:
+            self.refused_connections += 1
+            try:
+                await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many connections"}, False, {"Retry-After": "1"})
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+            return
+        self.connections += 1
+        try:
+            await self._serve_requests(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read(self, read: Awaitable[bytes]) -> bytes:
+        """Wait for a read from the client, for at most the read timeout."""
+        return await asyncio.wait_for(read, self.read_timeout)
+
+    async def _serve_requests(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Read and answer requests until the connection ends or must be closed."""
+        while True:
+            try:
+                request_line = await self._read(reader.readline())
+            except asyncio.TimeoutError:
+                # Idle between requests: close quietly
+                return
+            except ValueError:
+                # StreamReader's line limit was exceeded
+                await self._respond(writer, HTTPStatus.REQUEST_URI_TOO_LONG, {"error": "Request line too long"}, False)
+                return
+            if not request_line.strip():
+                return
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, False)
+                return
+
+            try:
+                headers = await self._read(self._read_headers(reader))
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                await self._respond(writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Timed out reading headers"}, False)
+                return
+            except ValueError:
+                await self._respond(
+                    writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {"error": "Request headers too large"}, False
+                )
+                return
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+            length_header = headers.get("content-length") or "0"
+            # The body can't be found without a valid length, so the connection ends either way
+            if not (length_header.isascii() and length_header.isdigit()):
+                await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, False)
+                return
+            length = int(length_header)
+            if length > SERVE_MAX_BODY_BYTES:
+                await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large"}, False)
+                return
+            try:
+                body = await self._read(reader.readexactly(length)) if length else b""
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                await self._respond(writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Timed out reading body"}, False)
+                return
+
+            status, payload, extra_headers = await self._dispatch(method, target, body)
+            await self._respond(writer, status, payload, keep_alive, extra_headers)
+            if not keep_alive:
+                return
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Dict[str, str]:
+        """Read a request's header block.
+
+        Raises:
+            ValueError: If a header line is longer than the reader's limit, or
+                there are more than _MAX_HEADERS of them
+        """
+        headers: Dict[str, str] = {}
+        for _ in range(_MAX_HEADERS + 1):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise ValueError(f"More than {_MAX_HEADERS} header lines")
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, Any, Dict[str, str]]:
+        """Route a request to its handler.
+
+        Returns:
+            The status, the payload (a dict sent as JSON or a str sent as text) and extra headers
+        """
+        url = urlsplit(target)
+        if url.path == "/healthz" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", **self.service.stats(), **self.stats()}, {}
+        if url.path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, METRICS.to_prometheus(), {}
+        if url.path == "/research":
+            if method == "GET":
+                params = parse_qs(url.query)
+                query = params.get("q", [""])[0]
+                local_first = None
+                if "local_first" in params:
+                    if params["local_first"][0] not in ("1", "true", "0", "false"):
+                        return HTTPStatus.BAD_REQUEST, {"error": "local_first must be true or false"}, {}
+                    local_first = params["local_first"][0] in ("1", "true")
+            elif method == "POST":
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    return HTTPStatus.BAD_REQUEST, {"error": "Body is not valid JSON"}, {}
+                if not isinstance(request, dict):
+                    return HTTPStatus.BAD_REQUEST, {"error": "Body must be a JSON object"}, {}
+                query = request.get("query") or ""
+                local_first = request.get("local_first")
+                if local_first is not None and not isinstance(local_first, bool):
+                    return HTTPStatus.BAD_REQUEST, {"error": "local_first must be true or false"}, {}
+            else:
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} not allowed"}, {"Allow": "GET, POST"}
+            return await self._research(str(query).strip(), local_first)
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {url.path}"}, {}
+
+    async def _research(self, query: str, local_first: Optional[bool]) -> Tuple[HTTPStatus, Any, Dict[str, str]]:
+        """Handle a research request."""
+        if not query:
+            return HTTPStatus.BAD_REQUEST, {"error": "Missing query"}, {}
+        start = time.perf_counter()
+        try:
+            result, coalesced = await self.service.research(query, local_first)
+        except Overloaded as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": f"Server busy: {str(e)}"}, {"Retry-After": "1"}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Unhandled error: {str(e)}"}, {}
+        record = _response_record(query, result, coalesced, time.perf_counter() - start)
+        status = HTTPStatus.INTERNAL_SERVER_ERROR if record["error"] else HTTPStatus.OK
+        return status, record, {}
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: Any,
+        keep_alive: bool,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Write one response."""
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {}),
+        }
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+def run_server(
+    host: str,
+    port: int,
+    workers: int = SERVE_WORKERS,
+    max_queue: int = SERVE_MAX_QUEUE,
+    deadline: Optional[float] = None,
+) -> None:
+    """Serve research over HTTP until interrupted."""
+    service = ResearchService(workers=workers, max_queue=max_queue, deadline=deadline)
+    METRICS.register_source("server", service.stats)
+    server = ResearchServer(service, host, port)
+    METRICS.register_source("server_connections", server.stats)
+
+    async def main() -> None:
+        await server.start()
+        print(f"Serving research on http://{server.host}:{server.port} ({service.workers} workers, queue {service.max_queue})")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
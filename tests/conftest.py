@@ -0,0 +1,28 @@
+"""Shared test setup: import the repo's packages and keep every cache in a temporary directory."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when utils.config is imported, so they have to be in place first
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="researchbot-tests-")
+# Queries must run the full pipeline every time, and host health from one
+# test must not reorder the fetches of the next
+for name in ("SEARCH_CACHE_ENABLED", "COMPLETION_CACHE_ENABLED", "INDEX_ENABLED", "HEALTH_ENABLED"):
+    os.environ[name] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import FixtureServer  # noqa: E402
+from utils.search import set_search_backend  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fixture_server():
+    """Local pages standing in for the web, with searches answered from them."""
+    with FixtureServer(page_count=20, page_size=8 * 1024, latency_ms=0, jitter_ms=0, hosts=2) as server:
+        set_search_backend(lambda query, max_results: server.search(query, min(max_results, 5)))
+        try:
+            yield server
+        finally:
+            set_search_backend(None)
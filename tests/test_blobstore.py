@@ -0,0 +1,55 @@
+"""Tests for the blob store and the blobs that saved checkpoints pin."""
+from types import SimpleNamespace
+
+import pytest
+
+from graph.agent_graph import ResearchSystem
+from utils.blobstore import BlobNotFoundError, get_blob_store, load_text, store_text
+from utils.checkpoint import SQLiteCheckpointSaver, checkpoint_path
+
+
+def _save_reference(ref):
+    """Save a checkpoint value holding a blob reference, as another process would."""
+    saver = SQLiteCheckpointSaver(checkpoint_path())
+    value = saver.serde.dumps_typed({"content_ref": ref})[1]
+    with saver._transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, '', 'branches', '1', 'msgpack', ?)", (ref, value)
+        )
+
+
+@pytest.fixture
+def small_store():
+    store = get_blob_store()
+    max_bytes = store.max_bytes
+    store.max_bytes = 3000
+    try:
+        yield store
+    finally:
+        store.max_bytes = max_bytes
+
+
+def test_prune_keeps_blobs_saved_checkpoints_reference(small_store):
+    pinned = store_text("pinned " * 150)
+    _save_reference(pinned)
+    unpinned = [store_text(f"page {i} " * 150) for i in range(4)]
+    assert small_store.has(pinned)
+    assert not all(small_store.has(ref) for ref in unpinned)
+    assert load_text(pinned).startswith("pinned")
+
+
+def test_missing_blob_is_an_error():
+    with pytest.raises(BlobNotFoundError):
+        load_text("sha256:" + "0" * 64)
+
+
+def test_resume_with_lost_pages_starts_over():
+    kept = store_text("kept page")
+    latest = SimpleNamespace(
+        values={"query": "q", "branches": [{"results": [{"content_ref": kept}, {"content_ref": "sha256:" + "1" * 64}]}]},
+        next=("merge",),
+        config={"configurable": {"thread_id": "lost"}},
+    )
+    assert ResearchSystem()._plan_run("q", latest) == ("restart", None)
+    latest.values["branches"][0]["results"].pop()
+    assert ResearchSystem()._plan_run("q", latest) == ("resume", None)
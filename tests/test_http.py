@@ -0,0 +1,83 @@
+"""Tests for host health reporting by the shared HTTP client."""
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+import requests
+import urllib3
+
+from utils.health import HostHealthTracker, host_of
+from utils.http import HttpClient
+
+
+class _BrokenBodyServer:
+    """Answers every request with headers and part of a body, then stalls or drops the connection."""
+
+    def __init__(self, stall: float):
+        self.stall = stall
+        self._socket = socket.socket()
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen()
+        self.url = "http://127.0.0.1:%d/page" % self._socket.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            conn.recv(65536)
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 100000\r\n\r\n<p>partial")
+            time.sleep(self.stall)
+            conn.close()
+
+    def close(self):
+        self._socket.close()
+
+
+@pytest.fixture
+def client():
+    tracker = HostHealthTracker(os.path.join(tempfile.mkdtemp(), "hosts.sqlite3"), failure_threshold=2)
+    client = HttpClient(health=tracker)
+    yield client
+    client.close()
+
+
+def _figures(client, url):
+    return next(entry for entry in client.health.hosts() if entry["host"] == host_of(url))
+
+
+@pytest.mark.parametrize("stall", [0.0, 2.0])
+def test_body_failure_counts_against_host(client, stall):
+    server = _BrokenBodyServer(stall)
+    try:
+        for _ in range(2):
+            with pytest.raises((requests.RequestException, urllib3.exceptions.HTTPError)):
+                with client.open(server.url, timeout=0.3) as response:
+                    response.read()
+        figures = _figures(client, server.url)
+        assert figures["failures"] == 2
+        assert figures["state"] == "open"
+    finally:
+        server.close()
+
+
+def test_success_is_timed_to_the_end_of_the_body(client, fixture_server):
+    url = fixture_server.url_for(0)
+    with client.open(url) as response:
+        time.sleep(0.2)
+        response.read()
+    figures = _figures(client, url)
+    assert figures["requests"] == 1 and figures["failures"] == 0
+    assert figures["latency_ewma"] >= 0.2
+
+
+def test_early_stop_counts_as_success(client, fixture_server):
+    url = fixture_server.url_for(1)
+    with client.open(url) as response:
+        next(response.iter_bytes(chunk_size=1024))
+    assert _figures(client, url)["failures"] == 0
@@ -0,0 +1,76 @@
+"""Tests for the local page index under compaction by another writer."""
+import threading
+
+import pytest
+
+from utils.index import HashingEmbedder, VectorIndex
+
+_WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def _page(word):
+    return " ".join(f"{word} topic sentence number {i} about {word}." for i in range(20))
+
+
+class _CompactAfterScoring:
+    """Wraps the reader's matrix to run a compaction right after the query is scored."""
+
+    def __init__(self, matrix, compact):
+        self.matrix = matrix
+        self.compact = compact
+
+    def __getitem__(self, key):
+        return _CompactAfterScoring(self.matrix[key], self.compact)
+
+    def __matmul__(self, vector):
+        scores = self.matrix @ vector
+        self.compact()
+        return scores
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path)
+
+
+def _open(directory, max_bytes=10 ** 9):
+    return VectorIndex(directory, HashingEmbedder(dim=64), chunk_chars=200, max_bytes=max_bytes)
+
+
+def test_search_during_compaction_returns_matching_chunks(directory):
+    reader = _open(directory)
+    writer = _open(directory)
+    for word in _WORDS[:6]:
+        writer.add_page(f"https://example.com/{word}", word, _page(word))
+    # Each later page pushes the oldest ones out and compacts the rows
+    writer.max_bytes = writer.stats()["bytes"]
+
+    def compact():
+        # Another writer compacts between the reader's scoring and its row lookups
+        thread = threading.Thread(target=lambda: [
+            writer.add_page(f"https://example.com/{word}", word, _page(word)) for word in _WORDS[6:]
+        ])
+        thread.start()
+        thread.join()
+
+    original_map = reader._map
+    reader._map = lambda *args: _CompactAfterScoring(original_map(*args), compact)
+    hits = reader.search("foxtrot topic", k=3)
+    assert writer.pruned > 0
+    assert hits and all(hit["url"].endswith("/foxtrot") for hit in hits)
+
+
+def test_search_after_repeated_compaction(directory):
+    reader = _open(directory)
+    writer = _open(directory)
+    writer.add_page("https://example.com/alpha", "alpha", _page("alpha"))
+    assert reader.search("alpha topic")[0]["url"].endswith("/alpha")
+    writer.max_bytes = writer.stats()["bytes"] * 2
+    for word in _WORDS[1:]:
+        writer.add_page(f"https://example.com/{word}", word, _page(word))
+    assert writer.stats()["generation"] >= 2
+    remaining = [url for (url,) in writer._connection().execute("SELECT url FROM pages")]
+    assert "https://example.com/juliet" in remaining
+    for url in remaining:
+        word = url.rsplit("/", 1)[1]
+        assert reader.search(f"{word} topic")[0]["url"] == url
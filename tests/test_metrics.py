@@ -0,0 +1,51 @@
+"""Tests that each query's stage timings reach METRICS exactly once."""
+import asyncio
+
+import pytest
+
+from graph.agent_graph import ResearchSystem
+from utils.tracing import METRICS
+
+
+def _stage_counts():
+    return {name: stage["count"] for name, stage in METRICS._stages.items()}
+
+
+def _added(before, after):
+    return {name: count - before.get(name, 0) for name, count in after.items() if count != before.get(name, 0)}
+
+
+def _span_counts(state):
+    counts = {}
+    for span in state["spans"]:
+        counts[span["name"]] = counts.get(span["name"], 0) + 1
+    return counts
+
+
+@pytest.fixture(scope="module")
+def system(fixture_server):
+    return ResearchSystem()
+
+
+def test_stream_query_observes_once(system):
+    before = _stage_counts()
+    events = list(system.stream_query("metrics streamed query"))
+    state = events[-1]["state"]
+    assert events[-1]["type"] == "result"
+    assert state["spans"]
+    assert _added(before, _stage_counts()) == _span_counts(state)
+
+
+def test_astream_query_observes_once(system):
+    async def run():
+        return [event async for event in system.astream_query("metrics async streamed query")]
+
+    before = _stage_counts()
+    state = asyncio.run(run())[-1]["state"]
+    assert _added(before, _stage_counts()) == _span_counts(state)
+
+
+def test_process_query_observes_once(system):
+    before = _stage_counts()
+    state = system.process_query("metrics plain query")
+    assert _added(before, _stage_counts()) == _span_counts(state)
@@ -0,0 +1,46 @@
+"""Tests for the rule-based query planner."""
+import pytest
+
+from agents.planner_agent import PlannerAgent
+
+
+@pytest.fixture
+def planner():
+    return PlannerAgent(max_subqueries=5, max_facets=0)
+
+
+@pytest.mark.parametrize("query, sides", [
+    ("quantum error correction vs classical", ["quantum error correction", "classical error correction"]),
+    ("Messi vs Cristiano Ronaldo", ["Messi", "Cristiano Ronaldo"]),
+    ("iPhone 15 vs Samsung Galaxy S24", ["iPhone 15", "Samsung Galaxy S24"]),
+    ("machine learning vs statistics", ["machine learning", "statistics"]),
+    ("nginx vs apache for web servers", ["nginx for web servers", "apache for web servers"]),
+    ("differences between TCP and UDP", ["TCP", "UDP"]),
+])
+def test_comparison_sides(planner, query, sides):
+    assert planner.plan(query) == [query] + sides
+
+
+def test_follow_up_pronoun_gets_earlier_subject(planner):
+    assert planner.plan("what is rust? who made it?") == ["what is rust? who made it?", "what is rust", "who made rust"]
+
+
+def test_follow_up_possessive(planner):
+    assert planner.plan("What is RAG? What are its limits?")[1:] == ["What is RAG", "What are RAG's limits"]
+
+
+def test_pronoun_without_subject_is_dropped(planner):
+    assert planner.plan("who made it? what is rust?") == ["who made it? what is rust?", "what is rust"]
+
+
+def test_facets_are_off_by_default():
+    assert PlannerAgent(max_subqueries=5).plan("transformers") == ["transformers"]
+
+
+def test_facets_when_enabled():
+    plan = PlannerAgent(max_subqueries=5, max_facets=2).plan("transformers")
+    assert plan == ["transformers", "transformers overview", "transformers latest developments"]
+
+
+def test_max_subqueries_keeps_original_first():
+    assert PlannerAgent(max_subqueries=1).plan("cats vs dogs") == ["cats vs dogs"]
@@ -0,0 +1,28 @@
+"""Tests for the research agent's web gathering and the notes it takes on each page."""
+from agents.research_agent import ResearchAgent
+from utils.llm import SimpleLLM
+
+
+def test_mock_llm_answers_note_prompts_with_notes():
+    agent = ResearchAgent()
+    prompt = agent.note_prompt.format(
+        query="qubit error rates",
+        title="Fixture page",
+        url="http://127.0.0.1/page",
+        content="Qubit error rates fell again this year. Cats sleep a lot. Their search results were mixed.",
+    )
+    note = SimpleLLM().invoke(prompt)
+    assert note == "- Qubit error rates fell again this year."
+
+
+def test_gather_web_skips_source_checks_without_early_stopping(fixture_server, monkeypatch):
+    agent = ResearchAgent()
+    checked = []
+    monkeypatch.setattr(agent, "_is_good_source", lambda query, result: checked.append(result) or True)
+    results = agent._gather_web("quantum qubit", None, 0)
+    assert results
+    assert checked == []
+
+    results = agent._gather_web("quantum qubit", None, 1)
+    assert len(results) == 1
+    assert len(checked) == 1
@@ -0,0 +1,67 @@
+"""Tests for searching and page fetching against the local fixture server."""
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.fixtures import FixtureServer, synthetic_page
+import utils.search as search
+
+
+@pytest.fixture
+def broken_page_cache(monkeypatch):
+    """Point the page cache at a CACHE_DIR that is a file, so it can't be opened."""
+    blocker = tempfile.NamedTemporaryFile(delete=False)
+    blocker.close()
+    monkeypatch.setattr(search, "CACHE_DIR", blocker.name)
+    monkeypatch.setattr(search, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(search, "_page_cache", None)
+    monkeypatch.setattr(search, "_page_cache_failed", False)
+    yield
+    os.remove(blocker.name)
+
+
+def test_unusable_page_cache_fetches_uncached(fixture_server, broken_page_cache, capsys):
+    assert search.fetch_webpage_content(fixture_server.url_for(2))
+    assert search.fetch_webpage_content(fixture_server.url_for(3))
+    assert search.get_page_cache() is None
+    assert capsys.readouterr().out.count("Page cache unavailable") == 1
+
+
+@pytest.fixture(scope="module")
+def duplicate_pages():
+    """Five pages where the second is a copy of the first."""
+    pages = [synthetic_page(0, 8 * 1024), synthetic_page(0, 8 * 1024)]
+    pages += [synthetic_page(index, 8 * 1024) for index in range(1, 4)]
+    with FixtureServer(pages=pages, latency_ms=0, jitter_ms=0, hosts=2) as server:
+        yield server
+
+
+@pytest.fixture
+def ranked_backend(duplicate_pages, monkeypatch):
+    """Answer every search with the duplicate pages in page order."""
+    def backend(query, max_results):
+        return [
+            {"title": f"Page {index}", "url": duplicate_pages.url_for(index), "content": f"Snippet {index}"}
+            for index in range(min(max_results, len(duplicate_pages.pages)))
+        ]
+    monkeypatch.setattr(search, "_search_backend", backend)
+    return duplicate_pages
+
+
+def test_search_web_backfills_dropped_duplicates(ranked_backend):
+    results = search.search_web("dedup query", max_results=3, dedupe=True, backfill=2)
+    assert [result["url"] for result in results] == [ranked_backend.url_for(index) for index in (0, 2, 3)]
+    assert results[0]["duplicates"] == [ranked_backend.url_for(1)]
+
+
+def test_iter_search_web_backfills_dropped_duplicates(ranked_backend):
+    results = list(search.iter_search_web("dedup query", max_results=3, dedupe=True, backfill=2))
+    # Results arrive in completion order, so either copy may be the one kept
+    ranks = sorted(result["rank"] for result in results)
+    assert ranks[1:] == [2, 3] and ranks[0] in (0, 1)
+
+
+def test_search_web_keeps_duplicates_without_dedupe(ranked_backend):
+    results = search.search_web("dedup query", max_results=3, dedupe=False, backfill=2)
+    assert [result["url"] for result in results] == [ranked_backend.url_for(index) for index in range(3)]
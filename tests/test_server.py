@@ -0,0 +1,128 @@
+"""Tests for the HTTP front end's request handling limits."""
+import asyncio
+import json
+
+import pytest
+
+from server import ResearchServer, ResearchService
+
+
+class _System:
+    """Stands in for a ResearchSystem, answering instantly."""
+
+    def __init__(self):
+        self.local_first = []
+
+    def for_setting(self, local_first):
+        self.local_first.append(local_first)
+        return self
+
+    async def aprocess_query(self, query, deadline=None):
+        return {"query": query, "answer": None, "error": ""}
+
+
+async def _serving(system, **options):
+    server = ResearchServer(ResearchService(get_system=system.for_setting), "127.0.0.1", 0, **options)
+    await server.start()
+    return server
+
+
+async def _exchange(server, data, pause=None):
+    """Send raw bytes (with an optional pause before the rest) and return the status and body."""
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    if pause is not None:
+        writer.write(data[:pause[0]])
+        await asyncio.sleep(pause[1])
+        data = data[pause[0]:]
+    try:
+        writer.write(data)
+        response = await asyncio.wait_for(reader.read(), 5)
+    except ConnectionError:
+        response = b""
+    writer.close()
+    if not response:
+        return None, None
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body) if body else None
+
+
+def _post(body):
+    data = json.dumps(body).encode()
+    return b"POST /research HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(data), data)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_local_first_must_be_a_boolean():
+    async def scenario():
+        system = _System()
+        server = await _serving(system)
+        try:
+            rejected = await _exchange(server, _post({"query": "q", "local_first": "false"}))
+            accepted = await _exchange(server, _post({"query": "q", "local_first": False}))
+        finally:
+            await server.close()
+        return rejected[0], accepted[0], system.local_first
+
+    assert run(scenario()) == (400, 200, [False])
+
+
+def test_idle_connection_is_closed():
+    async def scenario():
+        server = await _serving(_System(), read_timeout=0.2)
+        try:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            data = await asyncio.wait_for(reader.read(), 2)
+            writer.close()
+        finally:
+            await server.close()
+        return data
+
+    assert run(scenario()) == b""
+
+
+def test_slow_headers_time_out():
+    async def scenario():
+        server = await _serving(_System(), read_timeout=0.2)
+        try:
+            return await _exchange(server, b"GET /healthz HTTP/1.1\r\nHost: x\r\n\r\n", pause=(30, 0.5))
+        finally:
+            await server.close()
+
+    assert run(scenario())[0] == 408
+
+
+@pytest.mark.parametrize("data, status", [
+    (b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", 414),
+    (b"GET /healthz HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n", 431),
+    (b"GET /healthz HTTP/1.1\r\n" + b"X-Header: 1\r\n" * 101 + b"\r\n", 431),
+])
+def test_oversized_requests_are_refused(data, status):
+    async def scenario():
+        server = await _serving(_System())
+        try:
+            return await _exchange(server, data)
+        finally:
+            await server.close()
+
+    assert run(scenario())[0] == status
+
+
+def test_connections_are_capped():
+    async def scenario():
+        server = await _serving(_System(), max_connections=1)
+        try:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            await asyncio.sleep(0.1)
+            # The refusal is sent straight away, without reading a request
+            second_reader, second_writer = await asyncio.open_connection(server.host, server.port)
+            refused = await asyncio.wait_for(second_reader.read(), 2)
+            second_writer.close()
+            writer.close()
+        finally:
+            await server.close()
+        return refused.split()[1], server.refused_connections
+
+    assert run(scenario()) == (b"503", 1)
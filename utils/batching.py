@@ -0,0 +1,129 @@
+"""Micro-batching: group concurrent single-item calls into batched calls."""
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextvars import Context
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+import asyncio
+import contextvars
+import threading
+import time
+
+from utils.deadline import remaining_time
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects items submitted from many threads or tasks and processes them in batches.
+
+    A batch is dispatched as soon as ``max_batch_size`` items are waiting, or
+    once the oldest waiting item has waited ``max_wait`` seconds. Batches run
+    one at a time on a background thread, which suits a single model that is
+    faster on one batched forward pass than on several small ones.
+
+    Callers wait no longer than their query's deadline allows. Each batch runs
+    in a copy of its oldest item's context, so its spans go to that query's
+    tracer.
+    """
+
+    def __init__(self, process: Callable[[List[T]], List[R]], max_batch_size: int = 8, max_wait: float = 0.005):
+        """Initialize the batcher.
+
+        Args:
+            process: Handles a list of items and returns one result per item, in order
+            max_batch_size: Largest batch passed to ``process``
+            max_wait: Seconds the oldest item may wait for the batch to fill
+        """
+        self.process = process
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: List[Tuple[float, T, Future, Context]] = []
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+        self.items = 0
+
+    def submit_future(self, item: T) -> "Future[R]":
+        """Queue an item and return a future for its result."""
+        future: Future = Future()
+        context = contextvars.copy_context()
+        with self._condition:
+            self._pending.append((time.monotonic(), item, future, context))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+            self._condition.notify()
+        return future
+
+    def submit(self, item: T) -> R:
+        """Queue an item and wait for its result.
+
+        Raises:
+            TimeoutError: If the active deadline passes first; the item is
+                dropped unless its batch has already started
+        """
+        future = self.submit_future(item)
+        try:
+            return future.result(timeout=remaining_time())
+        except FuturesTimeoutError:
+            future.cancel()
+            raise TimeoutError("Deadline reached while waiting for a batched call") from None
+
+    async def asubmit(self, item: T) -> R:
+        """Queue an item and await its result without blocking the event loop.
+
+        Raises:
+            TimeoutError: If the active deadline passes first
+        """
+        try:
+            # Cancelling the wrapper on timeout also cancels the queued item
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit_future(item)), timeout=remaining_time())
+        except asyncio.TimeoutError:
+            raise TimeoutError("Deadline reached while waiting for a batched call") from None
+
+    def stats(self) -> dict:
+        """Return the number of batches run and the mean batch size."""
+        with self._condition:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            }
+
+    def _next_batch(self) -> List[Tuple[float, T, Future, Context]]:
+        """Wait until a batch is due and take it off the queue."""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][0] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            self.batches += 1
+            self.items += len(batch)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            # Skip items whose callers have gone away
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                context = batch[0][3].copy()
+                results = context.run(self.process, [item for _, item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"Batch of {len(batch)} items returned {len(results)} results")
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,257 @@
+"""Content-addressed store for fetched page text, kept out of graph state.
+
+Each blob is a file named by the SHA-256 of its bytes, so a page stored twice
+takes one file and its reference (``sha256:<hex>``) is stable across processes.
+Writes go to a temporary file that is renamed into place, which makes them
+atomic and safe to race. Graph state carries only the reference, so page
+text is only read back by the code that actually uses it.
+
+When the store outgrows its limit the least recently written blobs are
+deleted, except those still referenced by saved checkpoints. Every process
+pins them by reading the checkpoint database, whichever checkpoint backend it
+uses itself, since other processes sharing CACHE_DIR may have saved runs there.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from utils.config import CACHE_DIR, BLOB_STORE_ENABLED, BLOB_STORE_MAX_BYTES
+from utils.tracing import METRICS
+
+
+REF_PREFIX = "sha256:"
+_REF_PATTERN = re.compile(rb"sha256:([0-9a-f]{64})")
+
+
+class BlobNotFoundError(LookupError):
+    """Raised when a blob reference points at content that is no longer stored."""
+
+
+def find_refs(data: bytes) -> Set[str]:
+    """Digests of every blob reference that appears in serialized data."""
+    return {match.decode("ascii") for match in _REF_PATTERN.findall(data)}
+
+
+class BlobStore:
+    """Stores byte strings on disk under their content hash."""
+
+    def __init__(self, directory: str, max_bytes: int = BLOB_STORE_MAX_BYTES):
+        """Initialize the store.
+
+        Args:
+            directory: Directory holding the blobs (created if missing)
+            max_bytes: Total size above which the least recently written blobs are deleted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # counted on first write
+        self._pin_sources: List[Callable[[], Iterable[str]]] = []
+        self.writes = 0
+        self.reuses = 0
+        self.reads = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def _path(self, digest: str) -> str:
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def _digest(self, ref: str) -> str:
+        if not ref.startswith(REF_PREFIX):
+            raise ValueError(f"Not a blob reference: {ref!r}")
+        return ref[len(REF_PREFIX):]
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """Every blob file as (modification time, size, path)."""
+        files = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def add_pin_source(self, source: Callable[[], Iterable[str]]) -> None:
+        """Register a callable that returns the digests pruning must keep."""
+        with self._lock:
+            self._pin_sources.append(source)
+
+    def put(self, data: bytes) -> str:
+        """Store bytes and return their reference."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            # Refresh the modification time so pruning treats the blob as recent
+            try:
+                os.utime(path)
+                with self._lock:
+                    self.reuses += 1
+                return REF_PREFIX + digest
+            except FileNotFoundError:
+                pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._prune()
+        return REF_PREFIX + digest
+
+    def put_text(self, text: str) -> str:
+        """Store text (UTF-8) and return its reference."""
+        return self.put(text.encode("utf-8"))
+
+    def _prune(self) -> None:
+        """Delete the oldest unpinned blobs until the store is back under 80% of its limit.
+
+        Pinned blobs are kept even if that leaves the store over its limit.
+        If a pin source fails nothing is deleted, since any blob might be in use.
+        """
+        pinned: Set[str] = set()
+        try:
+            for source in self._pin_sources:
+                pinned.update(source())
+        except Exception as e:
+            print(f"Error listing pinned blobs, not pruning: {str(e)}")
+            return
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.8
+        for _, size, path in files:
+            if total <= target:
+                break
+            shard, name = os.path.split(path)
+            if os.path.basename(shard) + name in pinned:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.pruned += 1
+        self._bytes = total
+
+    def has(self, ref: str) -> bool:
+        """Whether the blob behind a reference is stored."""
+        return os.path.exists(self._path(self._digest(ref)))
+
+    def get(self, ref: str) -> Optional[bytes]:
+        """Return the bytes behind a reference, or None if the blob is gone."""
+        return self._read(ref)
+
+    def get_text(self, ref: str) -> Optional[str]:
+        """Return the text behind a reference, or None if the blob is gone."""
+        data = self._read(ref)
+        return None if data is None else data.decode("utf-8", errors="replace")
+
+    def _read(self, ref: str) -> Optional[bytes]:
+        """Read a blob's bytes, counting the read or the miss."""
+        path = self._path(self._digest(ref))
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.reads += 1
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        """Return write/read counters and the stored size."""
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "reuses": self.reuses,
+                "reads": self.reads,
+                "misses": self.misses,
+                "pruned": self.pruned,
+                "bytes": self._bytes or 0,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Return the shared blob store, or None if it is disabled."""
+    global _blob_store
+    if not BLOB_STORE_ENABLED:
+        return None
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(os.path.join(CACHE_DIR, "blobs"))
+                _blob_store.add_pin_source(_checkpoint_refs)
+                METRICS.register_source("blob_store", _blob_store.stats)
+    return _blob_store
+
+
+def _checkpoint_refs() -> Set[str]:
+    """Digests that checkpoints saved in the checkpoint database refer to."""
+    # Imported here because utils.checkpoint imports this module
+    from utils.checkpoint import saved_blob_refs
+    return saved_blob_refs()
+
+
+def store_text(text: str) -> Optional[str]:
+    """Store text in the shared blob store.
+
+    Returns:
+        The blob reference, or None if the store is disabled or the write failed
+    """
+    store = get_blob_store()
+    if store is None:
+        return None
+    try:
+        return store.put_text(text)
+    except OSError as e:
+        print(f"Error storing blob: {str(e)}")
+        return None
+
+
+def load_text(ref: str) -> str:
+    """Load text from the shared blob store.
+
+    Raises:
+        BlobNotFoundError: If the blob is gone or the store is disabled
+    """
+    store = get_blob_store()
+    text = store.get_text(ref) if store is not None else None
+    if text is None:
+        raise BlobNotFoundError(f"Blob not found: {ref}")
+    return text
+
+
+def missing_blobs(refs: Iterable[str]) -> List[str]:
+    """The references whose blobs can't be loaded (all of them if the store is disabled)."""
+    store = get_blob_store()
+    return [ref for ref in refs if store is None or not store.has(ref)]
@@ -0,0 +1,315 @@
+"""Persistent caches shared by the research system."""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+
+def _hit_ratio(hits: int, misses: int) -> float:
+    """Fraction of lookups that were hits (0.0 before the first lookup)."""
+    lookups = hits + misses
+    return hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """A thread-safe in-memory LRU cache with optional per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl: float = 0):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl: Seconds an entry stays valid (0 or less disables expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for a key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters, hit ratio and the current entry count."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": _hit_ratio(self.hits, self.misses),
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class SQLiteDatabase:
+    """Base for stores kept in a SQLite file shared between threads and processes.
+
+    Each thread gets its own connection in WAL mode, and writes go through
+    ``_transaction`` so they are serialized across processes.
+    """
+
+    def __init__(self, path: str):
+        """Open (creating if needed) the database file.
+
+        Args:
+            path: Location of the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a write transaction, serialized across processes."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Run a block of reads against one consistent snapshot of the database."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+
+class SQLiteCache(SQLiteDatabase):
+    """A key/value cache stored in a SQLite file.
+
+    Entries expire after ``ttl`` seconds and the total size of stored values is
+    kept under ``max_bytes`` by evicting the least recently used entries. SQLite
+    handles locking, so several processes can share the same file; hit, miss and
+    eviction counters are stored alongside the entries and are shared as well.
+
+    Lookups are plain reads and never take SQLite's write lock. The hit/miss
+    counters, access times and expired entries they produce are kept in
+    memory and written in one transaction every ``flush_interval`` seconds,
+    with the next ``set``, or at exit.
+    """
+
+    def __init__(self, path: str, ttl: float, max_bytes: int, flush_interval: float = 5.0):
+        """Initialize the cache.
+
+        Args:
+            path: Location of the SQLite database file
+            ttl: Seconds an entry stays valid (0 or less disables expiry)
+            max_bytes: Size budget for stored values
+            flush_interval: Seconds between writes of lookup bookkeeping
+        """
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._pending_lock = threading.Lock()
+        self._pending_counts: Dict[str, int] = {"hits": 0, "misses": 0}
+        self._accessed: Dict[str, float] = {}
+        self._expired: Set[str] = set()
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.executemany(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                [(name,) for name in ("hits", "misses", "evictions", "expirations", "bytes")],
+            )
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for a key, or None if missing or expired.
+
+        Database errors are reported and treated as a miss.
+        """
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            print(f"Cache read error ({self.path}): {str(e)}")
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value, evicting least recently used entries to stay within budget.
+
+        Database errors are reported and the value is simply not cached.
+        """
+        try:
+            self._set(key, value)
+        except sqlite3.Error as e:
+            print(f"Cache write error ({self.path}): {str(e)}")
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        row = self._connection().execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._pending_lock:
+            if row is None:
+                self._pending_counts["misses"] += 1
+                value = None
+            elif self.ttl > 0 and now - row[1] > self.ttl:
+                self._pending_counts["misses"] += 1
+                self._expired.add(key)
+                value = None
+            else:
+                self._pending_counts["hits"] += 1
+                self._accessed[key] = now
+                value = row[0]
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return value
+
+    def _take_pending(self) -> Tuple[Dict[str, int], Dict[str, float], Set[str]]:
+        """Hand over the lookup bookkeeping gathered since the last flush."""
+        with self._pending_lock:
+            pending = (self._pending_counts, self._accessed, self._expired)
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._accessed = {}
+            self._expired = set()
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _write_pending(self, conn: sqlite3.Connection, pending: Tuple[Dict[str, int], Dict[str, float], Set[str]]) -> None:
+        """Apply lookup bookkeeping inside a write transaction."""
+        counts, accessed, expired = pending
+        for name, amount in counts.items():
+            if amount:
+                self._bump(conn, name, amount)
+        conn.executemany(
+            "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+            [(when, key) for key, when in accessed.items()],
+        )
+        now = time.time()
+        for key in expired:
+            # Another writer may have refreshed the entry since it was read
+            row = conn.execute("SELECT size, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, "bytes", -row[0])
+                self._bump(conn, "expirations")
+
+    def flush(self) -> None:
+        """Write the counters, access times and expirations gathered by lookups.
+
+        Database errors are reported and that bookkeeping is dropped.
+        """
+        pending = self._take_pending()
+        counts, accessed, expired = pending
+        if not any(counts.values()) and not accessed and not expired:
+            return
+        try:
+            with self._transaction() as conn:
+                self._write_pending(conn, pending)
+        except sqlite3.Error as e:
+            print(f"Cache write error ({self.path}): {str(e)}")
+
+    def _set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        pending = self._take_pending()
+        with self._transaction() as conn:
+            # The write lock is held anyway, so lookup bookkeeping goes along
+            self._write_pending(conn, pending)
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            old_size = row[0] if row else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._bump(conn, "bytes", size - old_size)
+
+            total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                freed = 0
+                evicted = 0
+                for victim, victim_size in conn.execute(
+                    "SELECT key, size FROM entries WHERE key != ? ORDER BY accessed_at", (key,)
+                ).fetchall():
+                    if total - freed <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM entries WHERE key = ?", (victim,))
+                    freed += victim_size
+                    evicted += 1
+                self._bump(conn, "bytes", -freed)
+                self._bump(conn, "evictions", evicted)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        self._take_pending()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and hit ratio plus current entry count and size."""
+        self.flush()
+        conn = self._connection()
+        stats = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        stats["hit_ratio"] = _hit_ratio(stats["hits"], stats["misses"])
+        stats["entries"] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        stats["max_bytes"] = self.max_bytes
+        return stats
@@ -0,0 +1,457 @@
+"""Durable LangGraph checkpoints, so an interrupted research run can resume.
+
+``SQLiteCheckpointSaver`` implements LangGraph's ``BaseCheckpointSaver``
+interface on a SQLite file. After every graph step LangGraph stores a small
+checkpoint record plus only the state channels that changed in that step, and
+each finished research branch's output is stored as soon as the branch ends, so
+writes stay cheap and a crash loses at most the branches that were still
+running. Any other ``BaseCheckpointSaver`` can be passed to ``ResearchSystem``
+instead.
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import asyncio
+import os
+import threading
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from utils.blobstore import find_refs
+from utils.cache import SQLiteDatabase
+from utils.config import CACHE_DIR, CHECKPOINT_BACKEND, CHECKPOINT_PATH, CHECKPOINT_TTL
+from utils.registry import get_or_create
+from utils.tracing import METRICS
+
+
+class SQLiteCheckpointSaver(SQLiteDatabase, BaseCheckpointSaver):
+    """Stores LangGraph checkpoints in a SQLite file shared between threads and processes.
+
+    Checkpoint records hold channel versions, not values; each channel value is
+    stored once per version in the ``blobs`` table, so a step that changes one
+    channel writes one value. Threads untouched for ``ttl`` seconds are deleted
+    when the saver is opened.
+    """
+
+    def __init__(self, path: str, ttl: float = CHECKPOINT_TTL):
+        """Open (creating if needed) the checkpoint database.
+
+        Args:
+            path: Location of the SQLite database file
+            ttl: Seconds a thread is kept after its last checkpoint (0 or less keeps them forever)
+        """
+        SQLiteDatabase.__init__(self, path)
+        BaseCheckpointSaver.__init__(self)
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self.checkpoints_written = 0
+        self.values_written = 0
+        self.task_writes = 0
+        self.bytes_written = 0
+
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+                "parent_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+                "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, "
+                "version TEXT NOT NULL, type TEXT NOT NULL, value BLOB, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, channel, version))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS writes ("
+                "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+                "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+                "type TEXT NOT NULL, value BLOB, task_path TEXT NOT NULL, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (created_at)")
+        if self.ttl > 0:
+            self.prune(time.time() - self.ttl)
+
+    def _count(self, checkpoints: int = 0, values: int = 0, writes: int = 0, size: int = 0) -> None:
+        with self._stats_lock:
+            self.checkpoints_written += checkpoints
+            self.values_written += values
+            self.task_writes += writes
+            self.bytes_written += size
+
+    def stats(self) -> Dict[str, float]:
+        """Return write counters for this process and the number of stored threads."""
+        threads = self._connection().execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+        with self._stats_lock:
+            return {
+                "threads": threads,
+                "checkpoints_written": self.checkpoints_written,
+                "values_written": self.values_written,
+                "task_writes": self.task_writes,
+                "bytes_written": self.bytes_written,
+            }
+
+    def _load_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        """Load the channel values a checkpoint refers to."""
+        values: Dict[str, Any] = {}
+        conn = self._connection()
+        for channel, version in versions.items():
+            row = conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple) -> CheckpointTuple:
+        """Build a CheckpointTuple from a ``checkpoints`` row and its pending writes."""
+        checkpoint_id, parent_id, type_, checkpoint_data, metadata_type, metadata_data = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_data))
+        writes = self._connection().execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_data)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the checkpoint named by the config, or the thread's latest one.
+
+        Args:
+            config: Config with ``thread_id`` and optionally ``checkpoint_id``
+
+        Returns:
+            The checkpoint tuple, or None if the thread has no such checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            row = self._connection().execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = self._connection().execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first.
+
+        Args:
+            config: Restricts the listing to a thread (and namespace / checkpoint id)
+            filter: Metadata key/values a checkpoint must match
+            before: Only list checkpoints older than this one
+            limit: Most checkpoints to return
+
+        Yields:
+            Matching checkpoint tuples
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self._connection().execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {where}ORDER BY checkpoint_id DESC",
+            params,
+        ).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._to_tuple(row[0], row[1], row[2:])
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint and the channel values that changed since its parent.
+
+        Args:
+            config: Config of the parent checkpoint
+            checkpoint: The checkpoint to store
+            metadata: Metadata stored with the checkpoint
+            new_versions: Channels whose version changed in this step
+
+        Returns:
+            Config naming the stored checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        record = checkpoint.copy()
+        values = record.pop("channel_values")
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version),
+             *(self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)))
+            for channel, version in new_versions.items()
+        ]
+        type_, checkpoint_data = self.serde.dumps_typed(record)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                blobs,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_id, "
+                "type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    type_, checkpoint_data, metadata_type, metadata_data, time.time(),
+                ),
+            )
+        size = len(checkpoint_data) + len(metadata_data) + sum(len(blob[5] or b"") for blob in blobs)
+        self._count(checkpoints=1, values=len(blobs), size=size)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the writes of a finished task before the step's checkpoint is taken.
+
+        Args:
+            config: Config of the checkpoint the task ran from
+            writes: (channel, value) pairs written by the task
+            task_id: Identifier of the task
+            task_path: Path of the task in the graph
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are kept as first stored
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._transaction() as conn:
+            conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                "type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._count(writes=len(rows), size=sum(len(row[7] or b"") for row in rows))
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint, value and write of a thread."""
+        with self._transaction() as conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def blob_refs(self) -> Set[str]:
+        """Digests of the blob store entries that saved checkpoints still refer to."""
+        digests: Set[str] = set()
+        conn = self._connection()
+        for query in (
+            "SELECT checkpoint FROM checkpoints",
+            "SELECT value FROM blobs WHERE value IS NOT NULL",
+            "SELECT value FROM writes WHERE value IS NOT NULL",
+        ):
+            for (data,) in conn.execute(query):
+                digests.update(find_refs(data))
+        return digests
+
+    def prune(self, older_than: float) -> int:
+        """Delete threads whose latest checkpoint was written before a timestamp.
+
+        Args:
+            older_than: Unix time; threads last checkpointed earlier are deleted
+
+        Returns:
+            The number of threads deleted
+        """
+        threads = [
+            row[0]
+            for row in self._connection().execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                (older_than,),
+            )
+        ]
+        for thread_id in threads:
+            self.delete_thread(thread_id)
+        return len(threads)
+
+    # The async interface runs the SQLite calls in the loop's default executor
+    # so a slow disk never blocks the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Async version of get_tuple."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Async version of list."""
+        tuples = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in tuples:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Async version of put."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Async version of put_writes."""
+        await asyncio.get_running_loop().run_in_executor(None, self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Async version of delete_thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self.delete_thread, thread_id)
+
+
+def checkpoint_path() -> str:
+    """Location of the SQLite checkpoint database."""
+    return CHECKPOINT_PATH or os.path.join(CACHE_DIR, "checkpoints.sqlite3")
+
+
+def _sqlite_checkpointer(path: str) -> SQLiteCheckpointSaver:
+    """Return the shared SQLite checkpointer for a database file."""
+    def create() -> SQLiteCheckpointSaver:
+        saver = SQLiteCheckpointSaver(path)
+        METRICS.register_source("checkpoints", saver.stats)
+        return saver
+
+    return get_or_create(("checkpointer", "sqlite", path), create)
+
+
+def saved_blob_refs() -> Set[str]:
+    """Digests of the blob store entries that checkpoints in the database refer to.
+
+    The database is read whatever CHECKPOINT_BACKEND this process uses, since
+    other processes sharing CACHE_DIR may have saved runs in it.
+    """
+    path = checkpoint_path()
+    if not os.path.exists(path):
+        return set()
+    return _sqlite_checkpointer(path).blob_refs()
+
+
+def get_checkpointer(backend: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """Return the shared checkpointer for a backend.
+
+    Args:
+        backend: "sqlite" (CHECKPOINT_PATH), "memory" (lost on exit) or "none";
+            defaults to CHECKPOINT_BACKEND
+
+    Returns:
+        The checkpointer, or None if checkpointing is disabled
+    """
+    backend = (backend or CHECKPOINT_BACKEND).lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return get_or_create(("checkpointer", "memory"), InMemorySaver)
+    if backend == "sqlite":
+        return _sqlite_checkpointer(checkpoint_path())
+    raise ValueError(f"Unknown checkpoint backend: {backend!r} (expected sqlite, memory or none)")
@@ -7,4 +7,121 @@ load_dotenv()
 
 # Set default parameters
 MAX_SEARCH_RESULTS = 5
-SEARCH_TIMEOUT = 10  # seconds 
\ No newline at end of file
+SEARCH_TIMEOUT = 10  # seconds
+
+# Concurrent page fetching
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "2"))
+
+# Shared HTTP client
+HTTP_USER_AGENT = os.getenv(
+    "HTTP_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))  # hosts with pooled connections
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "4"))  # kept-alive connections per host
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "0"))
+HTTP_VALIDATOR_CACHE_SIZE = int(os.getenv("HTTP_VALIDATOR_CACHE_SIZE", "256"))
+
+# On-disk caches
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "researchbot"))
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "1") == "1"
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(24 * 3600)))  # seconds
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Search result cache (raw DuckDuckGo hits keyed by normalized query)
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))  # seconds
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))  # in-memory entries
+SEARCH_CACHE_PERSIST = os.getenv("SEARCH_CACHE_PERSIST", "0") == "1"
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Page download and text extraction limits
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))  # bytes read per page
+PAGE_MAX_CHARS = int(os.getenv("PAGE_MAX_CHARS", "10000"))  # extracted text kept per page
+
+# Worker processes for HTML text extraction (0 extracts in the fetching thread)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0"))
+
+# LLM completion cache (keyed by a hash of the formatted prompt, model and temperature)
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "1") == "1"
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "256"))  # in-memory entries
+COMPLETION_CACHE_PERSIST = os.getenv("COMPLETION_CACHE_PERSIST", "1") == "1"
+COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Micro-batching of concurrent LLM calls (a max size of 1 disables it)
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+LLM_BATCH_MAX_WAIT_MS = int(os.getenv("LLM_BATCH_MAX_WAIT_MS", "5"))  # wait for a batch to fill
+
+# Prompt context packing: best-matching passages of the fetched pages, within a token budget
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # estimated tokens for source text
+CONTEXT_PASSAGE_CHARS = int(os.getenv("CONTEXT_PASSAGE_CHARS", "400"))
+
+# Near-duplicate source removal (SimHash over extracted page text)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))  # differing fingerprint bits
+DEDUP_MIN_CHARS = int(os.getenv("DEDUP_MIN_CHARS", "200"))  # shorter texts are compared by URL only
+DEDUP_BACKFILL = int(os.getenv("DEDUP_BACKFILL", "3"))  # extra search hits held back to replace duplicates
+
+# Local retrieval index of fetched pages
+INDEX_DIR = os.getenv("INDEX_DIR", "")  # defaults to CACHE_DIR/index
+INDEX_ENABLED = os.getenv("INDEX_ENABLED", "1") == "1"
+INDEX_EMBEDDER = os.getenv("INDEX_EMBEDDER", "hashing")  # or "st:<sentence-transformers model>"
+INDEX_DIM = int(os.getenv("INDEX_DIM", "256"))  # hashing embedder dimensions
+INDEX_CHUNK_CHARS = int(os.getenv("INDEX_CHUNK_CHARS", "600"))
+INDEX_EXACT_LIMIT = int(os.getenv("INDEX_EXACT_LIMIT", "50000"))  # rows searched exactly before using LSH
+INDEX_LSH_TABLES = int(os.getenv("INDEX_LSH_TABLES", "16"))
+INDEX_LSH_BITS = int(os.getenv("INDEX_LSH_BITS", "8"))
+INDEX_MAX_BYTES = int(os.getenv("INDEX_MAX_BYTES", str(256 * 1024 * 1024)))  # oldest pages are dropped beyond this
+INDEX_LOCAL_FIRST = os.getenv("INDEX_LOCAL_FIRST", "0") == "1"  # answer from the index before searching the web
+INDEX_TOP_K = int(os.getenv("INDEX_TOP_K", "12"))  # chunks retrieved for a local answer
+INDEX_MIN_SCORE = float(os.getenv("INDEX_MIN_SCORE", "0.3"))  # similarity a chunk needs to count
+INDEX_MIN_SOURCES = int(os.getenv("INDEX_MIN_SOURCES", "3"))  # distinct pages needed to skip the web
+
+# Query planning: sub-queries searched as parallel graph branches and merged
+PLAN_MAX_SUBQUERIES = int(os.getenv("PLAN_MAX_SUBQUERIES", "3"))  # including the original query; 1 disables
+PLAN_MAX_FACETS = int(os.getenv("PLAN_MAX_FACETS", "0"))  # facet searches added to short, broad queries
+PLAN_MAX_CONCURRENCY = int(os.getenv("PLAN_MAX_CONCURRENCY", "4"))  # branches running at once
+PLAN_MAX_SOURCES = int(os.getenv("PLAN_MAX_SOURCES", "10"))  # sources kept after merging branches
+
+# Incremental summarization: a short note per source as its page arrives, then one summary over the notes
+SUMMARY_SOURCE_NOTES = os.getenv("SUMMARY_SOURCE_NOTES", "1") == "1"
+SUMMARY_NOTE_TOKENS = int(os.getenv("SUMMARY_NOTE_TOKENS", "300"))  # page text budget per note
+SUMMARY_NOTE_MAX_TOKENS = int(os.getenv("SUMMARY_NOTE_MAX_TOKENS", "150"))  # longest note kept
+SUMMARY_NOTE_WORKERS = int(os.getenv("SUMMARY_NOTE_WORKERS", "4"))
+# Early stop: finish a search once this many good sources have arrived (0 waits for every page)
+EARLY_STOP_SOURCES = int(os.getenv("EARLY_STOP_SOURCES", "0"))
+GOOD_SOURCE_MIN_CHARS = int(os.getenv("GOOD_SOURCE_MIN_CHARS", "500"))
+GOOD_SOURCE_MIN_COVERAGE = float(os.getenv("GOOD_SOURCE_MIN_COVERAGE", "0.5"))  # share of query terms on the page
+
+# HTTP service mode (python main.py serve)
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "4"))  # graph executions at once
+SERVE_MAX_QUEUE = int(os.getenv("SERVE_MAX_QUEUE", "16"))  # executions waiting for a worker before 503s
+SERVE_MAX_BODY_BYTES = int(os.getenv("SERVE_MAX_BODY_BYTES", str(64 * 1024)))
+SERVE_READ_TIMEOUT = float(os.getenv("SERVE_READ_TIMEOUT", "10"))  # seconds to send each request line, header block and body
+SERVE_MAX_CONNECTIONS = int(os.getenv("SERVE_MAX_CONNECTIONS", "256"))  # open connections before new ones get 503
+
+# Content-addressed store for fetched page text (under CACHE_DIR/blobs); graph state holds references
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "1") == "1"
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Per-query deadline: stages spend only the remaining budget and the final state lists what was skipped
+QUERY_DEADLINE = float(os.getenv("QUERY_DEADLINE", "0"))  # seconds per query; 0 disables
+QUERY_DEADLINE_RESERVE = float(os.getenv("QUERY_DEADLINE_RESERVE", "2"))  # seconds kept for summarizing and answering
+
+# Durable graph checkpoints, so runs given a thread id resume after a failure or crash
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")  # "sqlite", "memory" or "none"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "")  # defaults to CACHE_DIR/checkpoints.sqlite3
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 3600)))  # seconds a run's checkpoints are kept
+
+# Per-host health tracking (under CACHE_DIR/hosts.sqlite3): healthy hosts are fetched first, failing ones skipped
+HEALTH_ENABLED = os.getenv("HEALTH_ENABLED", "1") == "1"
+HEALTH_EWMA_ALPHA = float(os.getenv("HEALTH_EWMA_ALPHA", "0.3"))  # weight of the newest request
+HEALTH_FAILURE_THRESHOLD = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "3"))  # consecutive failures that open a circuit
+HEALTH_COOLDOWN = float(os.getenv("HEALTH_COOLDOWN", "300"))  # seconds before an open circuit is probed; doubles per trip
+HEALTH_MAX_COOLDOWN = float(os.getenv("HEALTH_MAX_COOLDOWN", str(24 * 3600)))
+HEALTH_FLUSH_SECONDS = float(os.getenv("HEALTH_FLUSH_SECONDS", "5"))  # seconds between writes to disk
+HEALTH_DEFAULT_LATENCY = float(os.getenv("HEALTH_DEFAULT_LATENCY", "1.0"))  # assumed seconds for hosts never seen
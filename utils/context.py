@@ -0,0 +1,178 @@
+"""Query-aware context packing for LLM prompts.
+
+Source texts are split into passages, every passage is scored against the query
+with BM25, and the best passages across all sources are packed into a token
+budget. Each source keeps its selected passages in document order.
+"""
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+import math
+import re
+
+from utils.config import CONTEXT_TOKEN_BUDGET, CONTEXT_PASSAGE_CHARS
+
+
+# Rough size of a token for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+# Words too common to say anything about a passage's relevance
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was "
+    "were what when where which who why will with".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a text takes up in a prompt."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to about ``max_tokens``, ending at a sentence (or word) boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if end >= max_chars // 2:
+        return cut[:end + 1].rstrip()
+    return cut.rsplit(" ", 1)[0].rstrip() + " ..."
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a text, without stopwords."""
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def query_coverage(query: str, text: str) -> float:
+    """Share of the query's distinct terms that appear in a text (1.0 for a query without terms)."""
+    terms = set(tokenize(query))
+    if not terms:
+        return 1.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+def split_passages(text: str, max_chars: int = CONTEXT_PASSAGE_CHARS) -> List[str]:
+    """Split text into passages of whole sentences, each at most ``max_chars`` long.
+
+    Sentences longer than ``max_chars`` are split between words.
+    """
+    passages: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            passages.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25:
+    """Okapi BM25 scoring over a fixed set of passages."""
+
+    def __init__(self, passages: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        """Index the passages.
+
+        Args:
+            passages: The texts to score
+            k1: Term-frequency saturation
+            b: Strength of the document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self._term_counts)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """Score every passage against a query."""
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        results = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            if terms and length:
+                norm = self.k1 * (1 - self.b + self.b * length / self._average_length)
+                for term in terms:
+                    frequency = counts.get(term, 0)
+                    if frequency:
+                        score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+
+def pack_context(
+    query: str,
+    texts: Sequence[str],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    passage_chars: int = CONTEXT_PASSAGE_CHARS,
+) -> List[List[str]]:
+    """Choose the passages of several source texts that best answer a query within a budget.
+
+    Every source with text first gets its single best passage, so each one can
+    still be cited, and the remaining budget goes to the highest-scoring
+    passages overall. Ties (including passages that match no query term) go to
+    earlier sources and earlier passages.
+
+    Args:
+        query: The search query
+        texts: One text per source
+        token_budget: Estimated tokens the selected passages may take up in total
+        passage_chars: Maximum passage length
+
+    Returns:
+        For each source, its selected passages in document order
+    """
+    # (source index, position in source, passage)
+    passages: List[Tuple[int, int, str]] = [
+        (source, position, passage)
+        for source, text in enumerate(texts)
+        for position, passage in enumerate(split_passages(text or "", passage_chars))
+    ]
+    scores = BM25([passage for _, _, passage in passages]).scores(query)
+    ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], passages[i][0], passages[i][1]))
+
+    # Best passage per source first, then everything else by score
+    best_per_source: Dict[int, int] = {}
+    for i in ranked:
+        best_per_source.setdefault(passages[i][0], i)
+    firsts = set(best_per_source.values())
+    order = [i for i in ranked if i in firsts] + [i for i in ranked if i not in firsts]
+
+    selected: List[int] = []
+    used = 0
+    for i in order:
+        cost = estimate_tokens(passages[i][2])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+
+    packed: List[List[str]] = [[] for _ in texts]
+    for i in sorted(selected, key=lambda i: (passages[i][0], passages[i][1])):
+        packed[passages[i][0]].append(passages[i][2])
+    return packed
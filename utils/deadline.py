@@ -0,0 +1,129 @@
+"""Per-query deadline budget shared by every stage of the research pipeline.
+
+A Deadline is activated for a query with ``use_deadline``. Like the tracer, the
+active deadline lives in a context variable, so the searches, page fetches and
+LLM calls made for the query see it without it being passed around, including
+on worker threads started with ``contextvars.copy_context()``. Each stage caps
+its own timeouts to the remaining budget, gives up on work that cannot finish
+in time, and records what it dropped in the deadline's skip log, which ends up
+in the final graph state.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import copy
+import threading
+import time
+
+
+class Deadline:
+    """A point in time by which a query should be answered."""
+
+    def __init__(self, seconds: float):
+        """Start the budget.
+
+        Args:
+            seconds: Time the query may take from now
+        """
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._skipped: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, limit: float) -> float:
+        """Cap a stage's own timeout to the remaining budget."""
+        return min(limit, self.remaining())
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """Return a deadline that expires ``seconds`` earlier, keeping that time for later stages.
+
+        At most half of the budget is reserved, so a tight deadline still
+        leaves the earlier stages some time. The returned deadline records
+        skips in this one's log.
+        """
+        held = min(seconds, self.budget / 2)
+        # A shallow copy shares the skip log and its lock
+        child = copy.copy(self)
+        child.budget = self.budget - held
+        child.expires_at = self.expires_at - held
+        return child
+
+    def skip(self, stage: str, **details: Any) -> None:
+        """Record that a piece of work was dropped to meet the deadline.
+
+        Args:
+            stage: The stage that gave up, e.g. ``fetch`` or ``note``
+            details: What was dropped, e.g. the URL; a ``partial`` flag marks
+                work that was cut short rather than dropped
+        """
+        entry = {"stage": stage, **details}
+        with self._lock:
+            # A fetch abandoned by its caller may also notice the deadline itself
+            if entry not in self._skipped:
+                self._skipped.append(entry)
+
+    @property
+    def skipped(self) -> List[Dict[str, Any]]:
+        """The work dropped so far, in the order it was given up."""
+        with self._lock:
+            return list(self._skipped)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """Return the deadline active in the current context, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make a deadline the active one for a block (None runs the block without a deadline)."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def reserve_time(seconds: float) -> Iterator[Optional[Deadline]]:
+    """Run a block under a deadline ``seconds`` earlier than the active one, if there is one."""
+    deadline = _current_deadline.get()
+    with use_deadline(deadline.reserve(seconds) if deadline is not None else None) as reserved:
+        yield reserved
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left on the active deadline, or None without one."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def stage_timeout(limit: float) -> float:
+    """Cap a stage's timeout to the active deadline's remaining budget."""
+    deadline = _current_deadline.get()
+    return deadline.timeout(limit) if deadline is not None else limit
+
+
+def deadline_expired() -> bool:
+    """Whether the active deadline has passed (False without one)."""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired
+
+
+def record_skip(stage: str, **details: Any) -> None:
+    """Record dropped work on the active deadline; does nothing without one."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.skip(stage, **details)
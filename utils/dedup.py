@@ -0,0 +1,164 @@
+"""Near-duplicate detection for fetched sources using SimHash fingerprints.
+
+Mirrors and syndicated copies of an article extract to nearly the same text.
+Their 64-bit SimHash fingerprints then differ in only a few bits. Candidate
+pairs are found with LSH banding: the fingerprint is cut into
+``max_distance + 1`` bands, and two fingerprints within ``max_distance`` bits of
+each other must agree exactly on at least one band.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import re
+
+from utils.config import DEDUP_MAX_DISTANCE, DEDUP_MIN_CHARS
+from utils.http import normalize_url
+
+
+FINGERPRINT_BITS = 64
+
+# Words per shingle; 3-word shingles ignore small edits but keep word order
+_SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """Compute the 64-bit SimHash fingerprint of a text from its word shingles."""
+    words = _WORD.findall(text.lower())
+    if len(words) < _SHINGLE_SIZE:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)]
+
+    if not shingles:
+        return 0
+    # A bit is set when most shingle hashes have it set; counting the columns
+    # of the hashes' bit strings keeps the per-bit loop out of Python
+    bit_strings = [format(_hash(shingle), "064b") for shingle in shingles]
+    majority = len(bit_strings) / 2
+    fingerprint = 0
+    for column in zip(*bit_strings):
+        fingerprint = fingerprint << 1 | (column.count("1") > majority)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of bits in which two fingerprints differ."""
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """Finds previously added fingerprints within a Hamming distance of a new one."""
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        """Initialize the index.
+
+        Args:
+            max_distance: Largest number of differing bits counted as a near-duplicate
+        """
+        self.max_distance = max_distance
+        self._band_count = max_distance + 1
+        self._band_bits = FINGERPRINT_BITS // self._band_count
+        self._buckets: Dict[Tuple[int, int], List[Tuple[int, Any]]] = {}
+
+    def _bands(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self._band_bits) - 1
+        bands = []
+        for band in range(self._band_count):
+            # The last band takes any bits left over by the integer division
+            if band == self._band_count - 1:
+                value = fingerprint >> (band * self._band_bits)
+            else:
+                value = fingerprint >> (band * self._band_bits) & mask
+            bands.append((band, value))
+        return bands
+
+    def find(self, fingerprint: int) -> Optional[Any]:
+        """Return the key of a near-duplicate fingerprint already in the index, if any."""
+        for band in self._bands(fingerprint):
+            for other, key in self._buckets.get(band, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint: int, key: Any) -> None:
+        """Add a fingerprint under a key."""
+        for band in self._bands(fingerprint):
+            self._buckets.setdefault(band, []).append((fingerprint, key))
+
+
+class Deduplicator:
+    """Checks results one at a time as they arrive, keeping the first copy of each page.
+
+    Results are compared on their fetched text (``raw_content``), whose
+    fingerprint is cached on the result under ``simhash``. Results without
+    enough fetched text to fingerprint reliably are only compared by
+    normalized URL. The kept result lists the URLs of its dropped copies under
+    ``duplicates``.
+    """
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE, min_chars: int = DEDUP_MIN_CHARS):
+        """Initialize the deduplicator.
+
+        Args:
+            max_distance: Largest SimHash distance counted as a near-duplicate
+            min_chars: Shortest fetched text that is fingerprinted
+        """
+        self.min_chars = min_chars
+        self._index = SimHashIndex(max_distance)
+        self._seen_urls: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Add a result unless it copies one added before.
+
+        Returns:
+            The earlier result this one duplicates, or None if it was kept
+        """
+        url = normalize_url(result.get("url", "")) if result.get("url") else None
+        original = self._seen_urls.get(url) if url else None
+
+        if "simhash" in result:
+            fingerprint = result["simhash"]
+        else:
+            text = result.get("raw_content", "")
+            fingerprint = simhash(text) if len(text) >= self.min_chars else None
+            # Kept on fetched results so they can still be compared once their text is moved out
+            if text:
+                result["simhash"] = fingerprint
+        if original is None and fingerprint is not None:
+            original = self._index.find(fingerprint)
+
+        if original is not None:
+            original.setdefault("duplicates", []).append(result.get("url", ""))
+            return original
+
+        if url:
+            self._seen_urls[url] = result
+        if fingerprint is not None:
+            self._index.add(fingerprint, result)
+        return None
+
+
+def deduplicate_results(
+    results: List[Dict[str, Any]],
+    max_distance: int = DEDUP_MAX_DISTANCE,
+    min_chars: int = DEDUP_MIN_CHARS,
+) -> List[Dict[str, Any]]:
+    """Drop search results whose page is the same as, or nearly the same as, a higher-ranked one.
+
+    See Deduplicator for how results are compared.
+
+    Args:
+        results: Search results in rank order
+        max_distance: Largest SimHash distance counted as a near-duplicate
+        min_chars: Shortest fetched text that is fingerprinted
+
+    Returns:
+        The distinct results, in their original order
+    """
+    deduplicator = Deduplicator(max_distance, min_chars)
+    return [result for result in results if deduplicator.add(result) is None]
@@ -0,0 +1,200 @@
+"""Incremental HTML-to-text extraction that stops once enough text is collected."""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from typing import List, Optional
+import codecs
+import multiprocessing
+import re
+import threading
+
+from utils.config import PAGE_MAX_CHARS, EXTRACT_WORKERS
+from utils.deadline import remaining_time
+
+
+# Elements whose contents are never visible text
+SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+# Slice size used when feeding an already-downloaded document
+_CHUNK_SIZE = 64 * 1024
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+
+def sniff_encoding(head: bytes, default: str = "utf-8") -> str:
+    """Detect a document's encoding from a <meta charset> declaration in its first bytes."""
+    match = _META_CHARSET.search(head[:4096])
+    if match:
+        encoding = match.group(1).decode("ascii", errors="ignore")
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            pass
+    return default
+
+
+class HtmlTextExtractor(HTMLParser):
+    """Streaming extractor for the visible text of an HTML document.
+
+    Feed it raw bytes as they are downloaded. Script/style contents are skipped
+    as they stream past, whitespace is normalized on the fly, and ``feed_bytes``
+    returns True once ``max_chars`` of text have been collected so the caller
+    can stop downloading.
+    """
+
+    def __init__(self, max_chars: int = PAGE_MAX_CHARS, encoding: Optional[str] = None):
+        """Initialize the extractor.
+
+        Args:
+            max_chars: Amount of text to collect before stopping
+            encoding: Document encoding; sniffed from the first chunk if not given
+        """
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.encoding = encoding
+        self._decoder = None
+        self._parts: List[str] = []
+        self._pending: List[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self.done = False
+
+    def _flush(self) -> None:
+        """Move the pending text node into the collected text."""
+        if not self._pending:
+            return
+        words = "".join(self._pending).split()
+        self._pending = []
+        if not words:
+            return
+        chunk = " ".join(words)
+        self._parts.append(chunk)
+        self._length += len(chunk) + 1
+        if self._length >= self.max_chars:
+            self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIPPED_TAGS and self._skip_depth > 0:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        # A text node can arrive in pieces when it spans download chunks, so
+        # buffer it until the next tag instead of splitting words apart
+        if self._skip_depth or self.done:
+            return
+        self._pending.append(data)
+
+    def feed_bytes(self, data: bytes) -> bool:
+        """Feed a chunk of the raw document.
+
+        Returns:
+            True once enough text has been collected
+        """
+        if self.done:
+            return True
+        if self._decoder is None:
+            if self.encoding is None:
+                self.encoding = sniff_encoding(data)
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        self.feed(self._decoder.decode(data))
+        return self.done
+
+    def get_text(self) -> str:
+        """Flush buffered input and return the collected text, capped at ``max_chars``."""
+        if not self.done:
+            if self._decoder is not None:
+                self.feed(self._decoder.decode(b"", final=True))
+            self.close()
+            self._flush()
+        return " ".join(self._parts)[:self.max_chars]
+
+
+def extract_text(html: bytes, max_chars: int = PAGE_MAX_CHARS, encoding: Optional[str] = None) -> str:
+    """Extract the visible text of a complete HTML document.
+
+    Args:
+        html: The raw document
+        max_chars: Maximum length of the returned text
+        encoding: Document encoding; sniffed from the document if not given
+
+    Returns:
+        Whitespace-normalized visible text
+    """
+    extractor = HtmlTextExtractor(max_chars=max_chars, encoding=encoding)
+    for start in range(0, len(html), _CHUNK_SIZE):
+        if extractor.feed_bytes(html[start:start + _CHUNK_SIZE]):
+            break
+    return extractor.get_text()
+
+
+# Process pool for CPU-bound extraction, created on first use
+_extract_workers = EXTRACT_WORKERS
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+
+def set_extract_workers(workers: int) -> None:
+    """Change the number of extraction worker processes (0 extracts in-process)."""
+    global _extract_workers, _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False)
+            _extract_pool = None
+        _extract_workers = workers
+
+
+def get_extract_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the extraction process pool, or None if extraction runs in-process."""
+    global _extract_pool
+    if _extract_workers <= 0:
+        return None
+    if _extract_pool is None:
+        with _extract_pool_lock:
+            if _extract_pool is None:
+                # spawn rather than fork: the parent has fetch threads running
+                _extract_pool = ProcessPoolExecutor(
+                    max_workers=_extract_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _extract_pool
+
+
+def extract_text_in_pool(html: bytes, max_chars: int = PAGE_MAX_CHARS, encoding: Optional[str] = None) -> str:
+    """Extract text on the worker pool, falling back to in-process extraction.
+
+    Only the raw bytes go to the worker and only the extracted string comes
+    back, so nothing larger than the page itself is pickled.
+
+    Raises:
+        TimeoutError: If the active deadline passes before the worker is done
+    """
+    global _extract_pool
+    pool = get_extract_pool()
+    if pool is None:
+        return extract_text(html, max_chars=max_chars, encoding=encoding)
+    try:
+        future = pool.submit(extract_text, html, max_chars, encoding)
+        return future.result(timeout=remaining_time())
+    except FuturesTimeoutError:
+        # A queued page is dropped; one already being parsed finishes unread
+        future.cancel()
+        raise TimeoutError("Deadline reached while extracting page text") from None
+    except BrokenProcessPool:
+        print("Extraction worker pool broke; restarting it")
+        with _extract_pool_lock:
+            if _extract_pool is pool:
+                _extract_pool = None
+        return extract_text(html, max_chars=max_chars, encoding=encoding)
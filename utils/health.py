@@ -0,0 +1,266 @@
+"""Per-host health tracking with a circuit breaker for page fetches.
+
+Every request made by the shared HttpClient reports its host's outcome here:
+an exponentially weighted moving average (EWMA) of latency and error rate,
+the total counts and the last failure. A host that fails
+HEALTH_FAILURE_THRESHOLD times in a row has its circuit opened: requests to it
+are refused without touching the network for a cooldown that doubles each time
+the circuit trips again. Once the cooldown is over one probe request is let
+through (half-open); its success closes the circuit, its failure reopens it.
+
+Search results are fetched healthiest host first, and hits on hosts with an
+open circuit are only used when there is nothing better. The figures are
+kept in memory and written to a SQLite file every few seconds, so they carry
+over between runs and can be inspected with ``python main.py host-stats``.
+"""
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlparse
+import atexit
+import os
+import threading
+import time
+
+from utils.cache import SQLiteDatabase
+from utils.config import (
+    CACHE_DIR,
+    SEARCH_TIMEOUT,
+    HEALTH_ENABLED,
+    HEALTH_EWMA_ALPHA,
+    HEALTH_FAILURE_THRESHOLD,
+    HEALTH_COOLDOWN,
+    HEALTH_MAX_COOLDOWN,
+    HEALTH_FLUSH_SECONDS,
+    HEALTH_DEFAULT_LATENCY,
+)
+from utils.tracing import METRICS
+
+
+_COLUMNS = (
+    "host", "requests", "failures", "latency_ewma", "error_rate",
+    "consecutive_failures", "trips", "last_failure", "last_error", "open_until",
+)
+
+
+def host_of(url: str) -> str:
+    """Return the host (with port, if any) a URL points at, lowercased."""
+    return urlparse(url).netloc.lower()
+
+
+class HostHealthTracker(SQLiteDatabase):
+    """Tracks latency and failures per host and decides which hosts to skip."""
+
+    def __init__(
+        self,
+        path: str,
+        alpha: float = HEALTH_EWMA_ALPHA,
+        failure_threshold: int = HEALTH_FAILURE_THRESHOLD,
+        cooldown: float = HEALTH_COOLDOWN,
+        max_cooldown: float = HEALTH_MAX_COOLDOWN,
+        flush_interval: float = HEALTH_FLUSH_SECONDS,
+    ):
+        """Open the tracker, loading the figures saved by earlier runs.
+
+        Args:
+            path: Location of the SQLite database file
+            alpha: Weight of the newest request in the latency and error-rate EWMAs
+            failure_threshold: Consecutive failures that open a host's circuit
+            cooldown: Seconds a circuit stays open after its first trip
+            max_cooldown: Longest cooldown, however often the circuit trips
+            flush_interval: Seconds between writes of changed hosts to disk
+        """
+        super().__init__(path)
+        self.alpha = alpha
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.flush_interval = flush_interval
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._probing: Set[str] = set()  # half-open hosts with a probe request in flight
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.short_circuits = 0
+
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS hosts ("
+                "host TEXT PRIMARY KEY, requests INTEGER NOT NULL, failures INTEGER NOT NULL, "
+                "latency_ewma REAL NOT NULL, error_rate REAL NOT NULL, consecutive_failures INTEGER NOT NULL, "
+                "trips INTEGER NOT NULL, last_failure REAL NOT NULL, last_error TEXT NOT NULL, "
+                "open_until REAL NOT NULL)"
+            )
+        for row in self._connection().execute(f"SELECT {', '.join(_COLUMNS)} FROM hosts"):
+            self._hosts[row[0]] = dict(zip(_COLUMNS, row))
+
+    def _entry(self, host: str) -> Dict[str, Any]:
+        """Return a host's figures, creating them on its first request."""
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = dict(zip(_COLUMNS, (host, 0, 0, 0.0, 0.0, 0, 0, 0.0, "", 0.0)))
+            self._hosts[host] = entry
+        return entry
+
+    def _state(self, host: str) -> str:
+        """Circuit state of a host: "closed", "open" or "half-open"."""
+        entry = self._hosts.get(host)
+        if entry is None or not entry["open_until"]:
+            return "closed"
+        return "open" if time.time() < entry["open_until"] else "half-open"
+
+    def available(self, host: str) -> bool:
+        """Whether a request to the host would be let through right now."""
+        with self._lock:
+            state = self._state(host)
+            return state == "closed" or (state == "half-open" and host not in self._probing)
+
+    def allow_request(self, host: str) -> bool:
+        """Claim permission for a request to a host.
+
+        Refuses while the host's circuit is open. Once the cooldown is over,
+        the first caller gets to send the probe request and others are
+        refused until it has been recorded.
+        """
+        with self._lock:
+            state = self._state(host)
+            if state == "closed":
+                return True
+            if state == "half-open" and host not in self._probing:
+                self._probing.add(host)
+                return True
+            self.short_circuits += 1
+            return False
+
+    def release(self, host: str) -> None:
+        """Give up a request allowed by allow_request without recording an outcome."""
+        with self._lock:
+            self._probing.discard(host)
+
+    def record_success(self, host: str, latency: float) -> None:
+        """Record a request that got a usable response."""
+        self._record(host, latency, None)
+
+    def record_failure(self, host: str, latency: float, error: str) -> None:
+        """Record a request that failed (connection error, timeout, 5xx, 403 or 429)."""
+        self._record(host, latency, error)
+
+    def _record(self, host: str, latency: float, error: Optional[str]) -> None:
+        """Fold a request's outcome into its host's figures and update the circuit."""
+        with self._lock:
+            entry = self._entry(host)
+            entry["requests"] += 1
+            if entry["requests"] == 1:
+                entry["latency_ewma"] = latency
+            else:
+                entry["latency_ewma"] = self.alpha * latency + (1 - self.alpha) * entry["latency_ewma"]
+            failed = error is not None
+            entry["error_rate"] = self.alpha * failed + (1 - self.alpha) * entry["error_rate"]
+            self._probing.discard(host)
+
+            if failed:
+                entry["failures"] += 1
+                entry["consecutive_failures"] += 1
+                entry["last_failure"] = time.time()
+                entry["last_error"] = error[:200]
+                # Also reached when a half-open probe fails, since the count was not reset
+                if entry["consecutive_failures"] >= self.failure_threshold:
+                    entry["trips"] += 1
+                    cooldown = min(self.max_cooldown, self.cooldown * 2 ** (entry["trips"] - 1))
+                    entry["open_until"] = time.time() + cooldown
+            else:
+                entry["consecutive_failures"] = 0
+                entry["trips"] = 0
+                entry["open_until"] = 0.0
+
+            self._dirty.add(host)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def score(self, host: str) -> float:
+        """Expected seconds a fetch from the host costs; lower is better.
+
+        A failed request typically costs a full timeout, so the latency EWMA
+        is charged SEARCH_TIMEOUT per expected failure. Hosts never seen get
+        HEALTH_DEFAULT_LATENCY, which places them between good and bad hosts.
+        """
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or not entry["requests"]:
+                return HEALTH_DEFAULT_LATENCY
+            return entry["latency_ewma"] + entry["error_rate"] * SEARCH_TIMEOUT
+
+    def fetch_order(self, urls: List[str]) -> List[int]:
+        """Indices of ``urls`` in the order they should be fetched, best host first.
+
+        Ties keep their original (search rank) order.
+        """
+        scores = [self.score(host_of(url)) for url in urls]
+        return sorted(range(len(urls)), key=lambda index: scores[index])
+
+    def flush(self) -> None:
+        """Write the hosts changed since the last flush to disk."""
+        with self._lock:
+            rows = [tuple(self._hosts[host][column] for column in _COLUMNS) for host in self._dirty]
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+        if not rows:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO hosts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                rows,
+            )
+
+    def hosts(self) -> List[Dict[str, Any]]:
+        """Every tracked host's figures, with its circuit ``state`` and fetch ``score``."""
+        with self._lock:
+            entries = [dict(entry, state=self._state(host)) for host, entry in self._hosts.items()]
+        for entry in entries:
+            entry["score"] = self.score(entry["host"])
+        return entries
+
+    def reset(self, host: Optional[str] = None) -> None:
+        """Forget one host's figures (closing its circuit), or every host's."""
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+                self._dirty.clear()
+                self._probing.clear()
+            else:
+                self._hosts.pop(host, None)
+                self._dirty.discard(host)
+                self._probing.discard(host)
+        with self._transaction() as conn:
+            if host is None:
+                conn.execute("DELETE FROM hosts")
+            else:
+                conn.execute("DELETE FROM hosts WHERE host = ?", (host,))
+
+    def stats(self) -> Dict[str, float]:
+        """Return the number of tracked hosts, open circuits and refused requests."""
+        with self._lock:
+            states = [self._state(host) for host in self._hosts]
+            return {
+                "hosts": len(states),
+                "open": states.count("open"),
+                "half_open": states.count("half-open"),
+                "short_circuits": self.short_circuits,
+            }
+
+
+_tracker: Optional[HostHealthTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_health_tracker() -> Optional[HostHealthTracker]:
+    """Return the shared host health tracker, or None if it is disabled."""
+    global _tracker
+    if not HEALTH_ENABLED:
+        return None
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = HostHealthTracker(os.path.join(CACHE_DIR, "hosts.sqlite3"))
+                METRICS.register_source("host_health", _tracker.stats)
+                atexit.register(_tracker.flush)
+    return _tracker
@@ -0,0 +1,492 @@
+"""Shared HTTP client with pooled keep-alive connections and conditional revalidation."""
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import TimeoutError as Urllib3TimeoutError
+from urllib3.util import make_headers
+
+from utils.config import (
+    SEARCH_TIMEOUT,
+    HTTP_USER_AGENT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_VALIDATOR_CACHE_SIZE,
+)
+from utils.deadline import remaining_time
+from utils.health import HostHealthTracker, get_health_tracker, host_of
+
+
+# Query parameters that only track the referrer and never change page content
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so equivalent spellings map to the same cache key.
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters, and sorts the remaining query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(_TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class HttpResponse:
+    """A fully-read HTTP response returned by HttpClient."""
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        content: bytes,
+        encoding: Optional[str],
+        revalidated: bool = False,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        # True when the body came from the validator cache after a 304
+        self.revalidated = revalidated
+
+    @property
+    def text(self) -> str:
+        """The body decoded with the response encoding."""
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        """Raise requests.HTTPError for 4xx/5xx responses."""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+
+class UnsupportedContentType(requests.RequestException):
+    """Raised when a response's Content-Type is not one the caller accepts."""
+
+
+class HostUnavailable(requests.RequestException):
+    """Raised without sending a request when the host's circuit is open."""
+
+
+# Statuses that say the host is struggling or refusing us, rather than that the page is missing
+_FAILURE_STATUSES = (403, 429)
+
+
+_CHARSET = re.compile(r"charset\s*=\s*[\"']?([^;\s\"']+)", re.IGNORECASE)
+
+
+class _HostOutcome:
+    """Reports one request's outcome to the health tracker, once.
+
+    A response that arrives is only a success once its body has been read (or
+    the reader stopped early with what it needed), so a host that sends
+    headers and then stalls or drops the connection still counts as failing.
+    """
+
+    def __init__(self, health: HostHealthTracker, host: str, deadline_bound: bool):
+        """Start timing a request.
+
+        Args:
+            health: The tracker to report to
+            host: The request's host
+            deadline_bound: Whether the query deadline, not the host, set the timeout
+        """
+        self.health = health
+        self.host = host
+        self.deadline_bound = deadline_bound
+        self.started = time.perf_counter()
+        self.reported = False
+
+    def success(self) -> None:
+        """Record a usable response, timed up to now."""
+        if not self.reported:
+            self.reported = True
+            self.health.record_success(self.host, time.perf_counter() - self.started)
+
+    def failure(self, error: str) -> None:
+        """Record a failed request, timed up to now."""
+        if not self.reported:
+            self.reported = True
+            self.health.record_failure(self.host, time.perf_counter() - self.started, error)
+
+    def exception(self, e: BaseException) -> None:
+        """Record the exception a request or body read raised."""
+        if isinstance(e, (requests.Timeout, Urllib3TimeoutError, TimeoutError)) and self.deadline_bound:
+            # Cut short by the query's deadline, which says nothing about the host
+            if not self.reported:
+                self.reported = True
+                self.health.release(self.host)
+        else:
+            self.failure(type(e).__name__)
+
+
+class StreamingResponse:
+    """An HTTP response whose body is read incrementally.
+
+    Use as a context manager so the connection is always released. A body
+    read to the end returns its connection to the pool; one abandoned midway
+    (an early stop or ``max_bytes``) has its connection closed instead, since
+    the unread rest of the body would otherwise be left on it.
+
+    With a health tracker, the host's outcome is recorded when the body is
+    done: a failure if reading it raised, a success once it was read or the
+    response was closed.
+    """
+
+    def __init__(
+        self,
+        client: "HttpClient",
+        request_url: str,
+        response: Optional[requests.Response] = None,
+        cached: Optional[HttpResponse] = None,
+        outcome: Optional[_HostOutcome] = None,
+    ):
+        self._client = client
+        self._request_url = request_url
+        self._response = response
+        self._cached = cached
+        self._outcome = outcome
+        source = cached if cached is not None else response
+        self.url = source.url
+        self.status_code = source.status_code
+        self.headers = source.headers
+        # True when the body comes from the validator cache after a 304
+        self.revalidated = cached is not None
+        # True when iter_bytes stopped at max_bytes before the end of the body
+        self.truncated = False
+
+    @property
+    def content_type(self) -> str:
+        """The media type of the response, without parameters."""
+        return self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+    @property
+    def encoding(self) -> Optional[str]:
+        """The charset declared in the Content-Type header, if any."""
+        match = _CHARSET.search(self.headers.get("Content-Type", ""))
+        return match.group(1) if match else None
+
+    def raise_for_status(self) -> None:
+        """Raise requests.HTTPError for 4xx/5xx responses."""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+    def iter_bytes(self, max_bytes: Optional[int] = None, chunk_size: int = 16 * 1024) -> Iterator[bytes]:
+        """Yield the (decompressed) body in chunks.
+
+        Args:
+            max_bytes: Stop after this many bytes
+            chunk_size: Preferred chunk size
+
+        Yields:
+            Body chunks, totalling at most ``max_bytes``
+        """
+        if self._cached is not None:
+            content = self._cached.content
+            if max_bytes is not None and len(content) > max_bytes:
+                content = content[:max_bytes]
+                self.truncated = True
+            if content:
+                yield content
+            return
+
+        received: List[bytes] = []
+        size = 0
+        chunks = self._chunks(chunk_size)
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except Exception as e:
+                if self._outcome is not None:
+                    self._outcome.exception(e)
+                raise
+            if chunk is None:
+                break
+            if max_bytes is not None and size + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - size]
+                self.truncated = True
+            size += len(chunk)
+            received.append(chunk)
+            if chunk:
+                yield chunk
+            if self.truncated:
+                self._succeeded()
+                return
+        self._succeeded()
+
+        # Only a fully-read body can stand in for the page on a later 304
+        if self._response.ok:
+            self._client._store_validators(self._request_url, HttpResponse(
+                url=self.url,
+                status_code=self.status_code,
+                headers=self.headers,
+                content=b"".join(received),
+                encoding=self.encoding,
+            ))
+
+    def _chunks(self, chunk_size: int) -> Iterator[bytes]:
+        """Yield body chunks as they arrive.
+
+        ``read1`` returns whatever the server has sent so far instead of
+        waiting for a full chunk, so a slowly trickling page can be cut short
+        with the text already received (urllib3 1.x lacks it).
+        """
+        raw = self._response.raw
+        if not hasattr(raw, "read1"):
+            yield from self._response.iter_content(chunk_size=chunk_size)
+            return
+        while True:
+            chunk = raw.read1(chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, max_bytes: Optional[int] = None) -> bytes:
+        """Read the body, up to ``max_bytes``."""
+        return b"".join(self.iter_bytes(max_bytes=max_bytes))
+
+    def _succeeded(self) -> None:
+        """Record the host's success unless an outcome was already recorded."""
+        if self._outcome is not None:
+            self._outcome.success()
+
+    def close(self) -> None:
+        """Release the connection: back to the pool if the body was read to the end, closed otherwise.
+
+        A body the reader stopped reading early still counts as a success for the host.
+        """
+        if self._response is not None:
+            self._response.close()
+        self._succeeded()
+
+    def __enter__(self) -> "StreamingResponse":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class HttpClient:
+    """HTTP client shared by all fetchers.
+
+    Connections are pooled per host and kept alive between requests, compressed
+    transfer encodings are negotiated, and responses carrying an ETag or
+    Last-Modified header are revalidated with conditional requests. With a
+    health tracker, each request's latency and outcome is reported for its
+    host, and requests to hosts whose circuit is open are refused.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        max_retries: int = HTTP_MAX_RETRIES,
+        validator_cache_size: int = HTTP_VALIDATOR_CACHE_SIZE,
+        user_agent: str = HTTP_USER_AGENT,
+        health: Optional[HostHealthTracker] = None,
+    ):
+        """Initialize the client.
+
+        Args:
+            pool_connections: Number of per-host connection pools to keep
+            pool_maxsize: Maximum kept-alive connections per host
+            max_retries: Connection-level retries per request
+            validator_cache_size: Number of responses kept for conditional revalidation
+            user_agent: User-Agent header sent with every request
+            health: Tracker that records per-host latency and failures
+        """
+        # One adapter holds the connection pools; each thread gets its own
+        # Session mounted on it, so pools are shared without sharing Session state.
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self._local = threading.local()
+        self._default_headers = {
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+            # gzip/deflate always, plus br/zstd when a decoder is installed
+            "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+            "Connection": "keep-alive",
+        }
+
+        self._validator_cache_size = validator_cache_size
+        self._validators: "OrderedDict[str, Tuple[Dict[str, str], HttpResponse]]" = OrderedDict()
+        self._validators_lock = threading.Lock()
+        self.health = health
+
+    def _session(self) -> requests.Session:
+        """Return the calling thread's session."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self._default_headers)
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def _get_validators(self, url: str) -> Optional[Tuple[Dict[str, str], HttpResponse]]:
+        """Look up stored validators for a URL."""
+        with self._validators_lock:
+            entry = self._validators.get(url)
+            if entry is not None:
+                self._validators.move_to_end(url)
+            return entry
+
+    def _store_validators(self, url: str, response: HttpResponse) -> None:
+        """Remember a response's validators so the next request can be conditional."""
+        conditional_headers = {}
+        if response.headers.get("ETag"):
+            conditional_headers["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            conditional_headers["If-Modified-Since"] = response.headers["Last-Modified"]
+        if not conditional_headers or self._validator_cache_size <= 0:
+            return
+
+        with self._validators_lock:
+            self._validators[url] = (conditional_headers, response)
+            self._validators.move_to_end(url)
+            while len(self._validators) > self._validator_cache_size:
+                self._validators.popitem(last=False)
+
+    def open(
+        self,
+        url: str,
+        timeout: float = SEARCH_TIMEOUT,
+        headers: Optional[Dict[str, str]] = None,
+        content_types: Optional[Sequence[str]] = None,
+    ) -> StreamingResponse:
+        """Send a GET request and return once the response headers have arrived.
+
+        Close the returned response (or use it as a context manager) when done;
+        see StreamingResponse for when its connection can be reused.
+
+        Args:
+            url: The URL to fetch
+            timeout: Connect/read timeout in seconds
+            headers: Extra headers for this request
+            content_types: Accepted media types; anything else is rejected before
+                the body is downloaded. Error responses are returned unchecked,
+                so the caller's raise_for_status reports them as HTTP errors
+
+        Returns:
+            A StreamingResponse; on a 304 its body is the previously seen one
+
+        Raises:
+            UnsupportedContentType: If the response has a media type not in ``content_types``
+            HostUnavailable: If the host's circuit is open
+        """
+        request_headers = dict(headers or {})
+        cached = self._get_validators(url)
+        if cached is not None:
+            request_headers.update(cached[0])
+
+        response, outcome = self._send(url, request_headers, timeout)
+
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            result = StreamingResponse(self, url, cached=cached[1], outcome=outcome)
+        else:
+            result = StreamingResponse(self, url, response=response, outcome=outcome)
+
+        # Check the status first: an error page's type says nothing about the URL
+        if (
+            content_types
+            and result.status_code < 400
+            and result.content_type
+            and result.content_type not in content_types
+        ):
+            result.close()
+            raise UnsupportedContentType(f"Unsupported content type {result.content_type!r} for url: {url}")
+        return result
+
+    def _send(self, url: str, headers: Dict[str, str], timeout: float) -> Tuple[requests.Response, Optional[_HostOutcome]]:
+        """Send a streaming GET, reporting the host's latency and outcome to the health tracker.
+
+        Failures up to the response headers are recorded here. For any other
+        response the outcome is returned, to be recorded once its body is done.
+        """
+        if self.health is None:
+            return self._session().get(url, headers=headers, timeout=timeout, stream=True), None
+
+        host = host_of(url)
+        if not self.health.allow_request(host):
+            raise HostUnavailable(f"Circuit open for host {host}, skipping url: {url}")
+        # Whether the active query deadline, not the host, set how long to wait
+        remaining = remaining_time()
+        outcome = _HostOutcome(self.health, host, remaining is not None and remaining <= timeout)
+        try:
+            response = self._session().get(url, headers=headers, timeout=timeout, stream=True)
+        except Exception as e:
+            outcome.exception(e)
+            raise
+        if response.status_code >= 500 or response.status_code in _FAILURE_STATUSES:
+            outcome.failure(f"HTTP {response.status_code}")
+        return response, outcome
+
+    def get(self, url: str, timeout: float = SEARCH_TIMEOUT, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """Perform a GET request and read the whole body.
+
+        Args:
+            url: The URL to fetch
+            timeout: Request timeout in seconds
+            headers: Extra headers for this request
+
+        Returns:
+            The response, with the previously seen body filled in on a 304
+        """
+        with self.open(url, timeout=timeout, headers=headers) as response:
+            content = response.read()
+            return HttpResponse(
+                url=response.url,
+                status_code=response.status_code,
+                headers=response.headers,
+                content=content,
+                encoding=response.encoding,
+                revalidated=response.revalidated,
+            )
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._adapter.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(health=get_health_tracker())
+    return _client
+
+
+def set_http_client(client: Optional[HttpClient]) -> None:
+    """Replace the process-wide HTTP client (pass None to reset to the default)."""
+    global _client
+    with _client_lock:
+        _client = client
@@ -0,0 +1,581 @@
+"""Persistent local retrieval index over the pages the research system has fetched.
+
+Page text is split into chunks and embedded. The embeddings live in a
+memory-mapped float32 matrix, one row per chunk, and chunk text and page
+metadata live in SQLite. Small corpora are searched exactly with one matrix
+product. Past INDEX_EXACT_LIMIT rows, random-hyperplane LSH tables narrow the
+search to candidate rows first; the tables are only built once the index grows
+that large. When the index outgrows INDEX_MAX_BYTES the oldest pages are
+dropped and the remaining rows compacted into a new matrix file.
+
+Two embedders are available: a fully offline feature-hashing embedder
+(the default) and sentence-transformers, when that package is installed.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.cache import SQLiteDatabase
+from utils.config import (
+    CACHE_DIR,
+    INDEX_DIR,
+    INDEX_ENABLED,
+    INDEX_EMBEDDER,
+    INDEX_DIM,
+    INDEX_CHUNK_CHARS,
+    INDEX_EXACT_LIMIT,
+    INDEX_LSH_TABLES,
+    INDEX_LSH_BITS,
+    INDEX_MAX_BYTES,
+)
+from utils.context import split_passages, tokenize
+from utils.registry import get_or_create
+from utils.tracing import METRICS
+
+
+# Rough on-disk cost of one LSH bucket row, including its index entry
+_BUCKET_ROW_BYTES = 32
+
+
+class HashingEmbedder:
+    """Offline embedder: hashed unigram and bigram counts, L2-normalized.
+
+    Needs no model download and embeds thousands of chunks per second, at the
+    cost of matching words rather than meaning.
+    """
+
+    def __init__(self, dim: int = INDEX_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = tokenize(text)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into unit-length rows of a (len(texts), dim) float32 matrix."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                # The top bit picks the sign so colliding features tend to cancel out
+                vectors[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into unit-length rows of a (len(texts), dim) float32 matrix."""
+        return np.asarray(
+            self._model.encode(list(texts), normalize_embeddings=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+
+def get_embedder(spec: str = INDEX_EMBEDDER) -> Any:
+    """Return the shared embedder for a spec.
+
+    Args:
+        spec: ``hashing``, or ``st:<model name>`` for a sentence-transformers model
+
+    Returns:
+        An object with ``name``, ``dim`` and ``embed(texts)``
+    """
+    def build() -> Any:
+        if spec.startswith("st:"):
+            try:
+                return SentenceTransformerEmbedder(spec[3:])
+            except ImportError:
+                print("sentence-transformers is not installed; using the hashing embedder")
+            except OSError as e:
+                # A missing model or failed download
+                print(f"Could not load embedding model {spec[3:]!r} ({str(e)}); using the hashing embedder")
+        return HashingEmbedder()
+
+    return get_or_create(("embedder", spec), build)
+
+
+class VectorIndex(SQLiteDatabase):
+    """Chunk embeddings in a memory-mapped matrix with metadata in SQLite.
+
+    Writers allocate rows inside a SQLite write transaction, so several
+    processes can share one index directory. The stored size (matrix rows,
+    chunk text and bucket rows) is kept under ``max_bytes`` by dropping the
+    least recently indexed pages.
+
+    Rows a search can see are never moved within a matrix file: new rows are
+    appended past the row count, and compaction writes the surviving rows to
+    the file of the next ``generation``. A search reads the row count,
+    generation and chunk rows from one SQLite snapshot and uses that
+    generation's file, so a compaction in another process cannot shift rows
+    under it. A re-indexed page's old rows are zeroed in place, so a search
+    racing the update may just miss that page.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedder: Any,
+        chunk_chars: int = INDEX_CHUNK_CHARS,
+        max_bytes: int = INDEX_MAX_BYTES,
+    ):
+        """Open (creating if needed) the index in a directory.
+
+        Args:
+            directory: Where the matrix and metadata files live
+            embedder: Embeds chunk and query text
+            chunk_chars: Maximum chunk length
+            max_bytes: Size budget for the index
+
+        Raises:
+            ValueError: If the index was built with a different embedder
+        """
+        super().__init__(os.path.join(directory, "index.sqlite3"))
+        self.directory = directory
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.chunk_chars = chunk_chars
+        self.max_bytes = max_bytes
+        self.pruned = 0
+        self._matrix: Optional[np.memmap] = None
+        self._matrix_generation = 0
+        self._lock = threading.Lock()
+        self._planes = np.random.default_rng(0).standard_normal(
+            (INDEX_LSH_TABLES * INDEX_LSH_BITS, self.dim)
+        ).astype(np.float32)
+
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, title TEXT NOT NULL, content_hash TEXT NOT NULL, indexed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, url TEXT NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_url ON chunks (url)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (tbl INTEGER NOT NULL, key INTEGER NOT NULL, row INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_key ON buckets (tbl, key)")
+            conn.execute("INSERT OR IGNORE INTO info (key, value) VALUES ('embedder', ?)", (embedder.name,))
+            conn.execute("INSERT OR IGNORE INTO info (key, value) VALUES ('rows', '0')")
+            conn.execute("INSERT OR IGNORE INTO info (key, value) VALUES ('generation', '0')")
+            conn.execute(
+                "INSERT OR IGNORE INTO info (key, value) "
+                "SELECT 'text_bytes', COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0) FROM chunks"
+            )
+            if conn.execute("SELECT 1 FROM info WHERE key = 'bucketed'").fetchone() is None:
+                # Indexes written before buckets were built lazily: drop the unused ones
+                bucketed = self._row_count(conn) > INDEX_EXACT_LIMIT
+                if not bucketed:
+                    conn.execute("DELETE FROM buckets")
+                conn.execute("INSERT INTO info (key, value) VALUES ('bucketed', ?)", ("1" if bucketed else "0",))
+            stored = conn.execute("SELECT value FROM info WHERE key = 'embedder'").fetchone()[0]
+        if stored != embedder.name:
+            raise ValueError(
+                f"Index at {directory} was built with embedder {stored!r}, not {embedder.name!r}; "
+                "set INDEX_DIR to another directory or delete the index"
+            )
+
+    # -- matrix storage ---------------------------------------------------
+
+    def _vectors_path(self, generation: int) -> str:
+        """The matrix file of a generation; each compaction starts the next one."""
+        name = "vectors.f32" if generation == 0 else f"vectors.{generation}.f32"
+        return os.path.join(self.directory, name)
+
+    def _capacity(self, generation: int) -> int:
+        """Rows a generation's matrix file currently has room for."""
+        try:
+            return os.path.getsize(self._vectors_path(generation)) // (self.dim * 4)
+        except OSError:
+            return 0
+
+    def _grow(self, rows: int, generation: int) -> None:
+        """Make the matrix file large enough for ``rows`` rows, doubling as it fills."""
+        capacity = self._capacity(generation)
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        with self._lock:
+            with open(self._vectors_path(generation), "ab") as f:
+                f.truncate(new_capacity * self.dim * 4)
+            # Readers holding the old mapping keep working; the next _map sees the new size
+            self._matrix = None
+
+    def _map(self, rows: int, generation: int) -> np.memmap:
+        """Return a generation's memory-mapped matrix, remapping if another writer has grown the file.
+
+        Raises:
+            FileNotFoundError: If the generation has been compacted away
+        """
+        with self._lock:
+            if self._matrix is None or self._matrix_generation != generation or self._matrix.shape[0] < rows:
+                capacity = self._capacity(generation)
+                if capacity < rows:
+                    raise FileNotFoundError(f"No matrix file with {rows} rows for index generation {generation}")
+                if capacity == 0:
+                    return np.zeros((0, self.dim), dtype=np.float32)
+                self._matrix = np.memmap(
+                    self._vectors_path(generation), dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+                )
+                self._matrix_generation = generation
+            return self._matrix
+
+    def _remove_generations(self, before: int) -> None:
+        """Delete the matrix files of generations older than ``before``."""
+        for name in os.listdir(self.directory):
+            if name == "vectors.f32":
+                generation = 0
+            elif name.startswith("vectors.") and name.endswith(".f32") and name[8:-4].isdigit():
+                generation = int(name[8:-4])
+            else:
+                continue
+            if generation < before:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _info(self, conn, key: str) -> int:
+        return int(conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()[0])
+
+    def _set_info(self, conn, key: str, value: int) -> None:
+        conn.execute("UPDATE info SET value = ? WHERE key = ?", (str(value), key))
+
+    def _row_count(self, conn=None) -> int:
+        return self._info(conn or self._connection(), "rows")
+
+    def _size(self, conn) -> int:
+        """Approximate stored bytes: matrix rows (retired ones too), chunk text and bucket rows."""
+        rows = self._row_count(conn)
+        size = rows * self.dim * 4 + self._info(conn, "text_bytes")
+        if self._info(conn, "bucketed"):
+            size += rows * INDEX_LSH_TABLES * _BUCKET_ROW_BYTES
+        return size
+
+    def _bucket_keys(self, vectors: np.ndarray) -> np.ndarray:
+        """LSH keys of vectors: one INDEX_LSH_BITS-bit hyperplane signature per table."""
+        bits = (vectors @ self._planes.T > 0).reshape(len(vectors), INDEX_LSH_TABLES, INDEX_LSH_BITS)
+        weights = 1 << np.arange(INDEX_LSH_BITS)
+        return (bits * weights).sum(axis=2)
+
+    def _write_buckets(self, conn, start: int, vectors: np.ndarray) -> None:
+        """Add the LSH bucket rows of consecutive rows starting at ``start``."""
+        keys = self._bucket_keys(vectors)
+        conn.executemany(
+            "INSERT INTO buckets (tbl, key, row) VALUES (?, ?, ?)",
+            [
+                (table, int(keys[i, table]), start + i)
+                for i in range(len(vectors))
+                for table in range(INDEX_LSH_TABLES)
+            ],
+        )
+
+    # -- writing ----------------------------------------------------------
+
+    def add_page(self, url: str, title: str, text: str) -> int:
+        """Index a page's text, replacing any older version of the same page.
+
+        Args:
+            url: The page URL
+            title: The page title
+            text: Extracted page text
+
+        Returns:
+            The number of chunks added (0 if the page is already indexed unchanged)
+        """
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        conn = self._connection()
+        row = conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is not None and row[0] == content_hash:
+            return 0
+
+        chunks = split_passages(text, self.chunk_chars)
+        vectors = self.embedder.embed(chunks) if chunks else np.zeros((0, self.dim), dtype=np.float32)
+        text_bytes = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+
+        with self._transaction() as conn:
+            bucketed = bool(self._info(conn, "bucketed"))
+            generation = self._info(conn, "generation")
+            # Retire the chunks of an older version; zeroed rows never score above 0
+            old = conn.execute("SELECT row, LENGTH(CAST(text AS BLOB)) FROM chunks WHERE url = ?", (url,)).fetchall()
+            if old:
+                old_rows = [r for r, _ in old]
+                matrix = self._map(max(old_rows) + 1, generation)
+                matrix[old_rows] = 0
+                conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+                if bucketed:
+                    conn.executemany("DELETE FROM buckets WHERE row = ?", [(r,) for r in old_rows])
+                text_bytes -= sum(size for _, size in old)
+
+            start = self._row_count(conn)
+            end = start + len(chunks)
+            self._grow(end, generation)
+            if chunks:
+                matrix = self._map(end, generation)
+                matrix[start:end] = vectors
+                matrix.flush()
+            conn.executemany(
+                "INSERT INTO chunks (row, url, position, text) VALUES (?, ?, ?, ?)",
+                [(start + i, url, i, chunk) for i, chunk in enumerate(chunks)],
+            )
+            if bucketed:
+                self._write_buckets(conn, start, vectors)
+            elif end > INDEX_EXACT_LIMIT:
+                # Searches switch to LSH from here on, so bucket every row once
+                self._write_buckets(conn, 0, np.asarray(self._map(end, generation)[:end]))
+                self._set_info(conn, "bucketed", 1)
+            self._set_info(conn, "rows", end)
+            self._set_info(conn, "text_bytes", self._info(conn, "text_bytes") + text_bytes)
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, title, content_hash, indexed_at) VALUES (?, ?, ?, ?)",
+                (url, title, content_hash, time.time()),
+            )
+            if self._size(conn) > self.max_bytes:
+                self._prune(conn, keep=url)
+        return len(chunks)
+
+    def _prune(self, conn, keep: str) -> None:
+        """Drop the least recently indexed pages until the index is under 80% of its budget.
+
+        Surviving rows, minus those retired by re-indexed pages, are copied to
+        the front of the next generation's matrix file, so the freed rows are
+        reused by later pages. The current file is left for searches still
+        reading it, and the one before it is deleted.
+        """
+        row_bytes = self.dim * 4 + INDEX_LSH_TABLES * _BUCKET_ROW_BYTES
+        live_rows = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        text_bytes = self._info(conn, "text_bytes")
+        target = self.max_bytes * 0.8
+        victims = []
+        for url, rows, size in conn.execute(
+            "SELECT pages.url, COUNT(chunks.row), COALESCE(SUM(LENGTH(CAST(chunks.text AS BLOB))), 0) "
+            "FROM pages LEFT JOIN chunks ON chunks.url = pages.url WHERE pages.url != ? "
+            "GROUP BY pages.url ORDER BY pages.indexed_at", (keep,)
+        ).fetchall():
+            if live_rows * row_bytes + text_bytes <= target:
+                break
+            victims.append(url)
+            live_rows -= rows
+            text_bytes -= size
+        conn.executemany("DELETE FROM chunks WHERE url = ?", [(url,) for url in victims])
+        conn.executemany("DELETE FROM pages WHERE url = ?", [(url,) for url in victims])
+
+        # Compact: surviving row i moves to position i. Rows only move down, so
+        # renumbering in ascending order never collides with a row still to move.
+        rows = self._row_count(conn)
+        generation = self._info(conn, "generation")
+        surviving = [r for (r,) in conn.execute("SELECT row FROM chunks ORDER BY row")]
+        count = len(surviving)
+        old_matrix = self._map(rows, generation)
+        self._remove_generations(generation)
+        with self._lock:
+            # Truncating also replaces a file left by a compaction that was rolled back
+            with open(self._vectors_path(generation + 1), "wb") as f:
+                f.truncate(max(count, 1024) * self.dim * 4)
+            self._matrix = None
+        matrix = self._map(count, generation + 1)
+        matrix[:count] = old_matrix[surviving]
+        matrix.flush()
+        conn.executemany(
+            "UPDATE chunks SET row = ? WHERE row = ?",
+            [(new, old) for new, old in enumerate(surviving) if new != old],
+        )
+        conn.execute("DELETE FROM buckets")
+        bucketed = count > INDEX_EXACT_LIMIT
+        if bucketed:
+            self._write_buckets(conn, 0, np.asarray(matrix[:count]))
+        self._set_info(conn, "bucketed", int(bucketed))
+        self._set_info(conn, "generation", generation + 1)
+        self._set_info(conn, "rows", count)
+        self._set_info(conn, "text_bytes", text_bytes)
+        self.pruned += len(victims)
+
+    # -- reading ----------------------------------------------------------
+
+    def _candidates(self, conn, query_vector: np.ndarray) -> np.ndarray:
+        """Rows sharing an LSH bucket with the query, or a bucket one bit away, in any table."""
+        keys = self._bucket_keys(query_vector[None, :])[0]
+        rows = set()
+        for table in range(INDEX_LSH_TABLES):
+            key = int(keys[table])
+            # Multi-probe: neighbouring buckets catch near misses without more tables
+            probes = [key] + [key ^ (1 << bit) for bit in range(INDEX_LSH_BITS)]
+            placeholders = ",".join("?" * len(probes))
+            rows.update(r for (r,) in conn.execute(
+                f"SELECT row FROM buckets WHERE tbl = ? AND key IN ({placeholders})", [table] + probes
+            ))
+        return np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+
+    def search(self, query: str, k: int = 8) -> List[Dict[str, Any]]:
+        """Return the chunks most similar to a query.
+
+        Args:
+            query: The query text
+            k: Maximum number of chunks returned
+
+        Returns:
+            Dicts with ``url``, ``title``, ``text`` and cosine ``score``, best first
+        """
+        query_vector = self.embedder.embed([query])[0]
+        for _ in range(3):
+            try:
+                return self._search(query_vector, k)
+            except FileNotFoundError:
+                # Compacted twice since the snapshot was taken; try a fresh one
+                continue
+        return []
+
+    def _search(self, query_vector: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        """Score and look up chunks, all from one snapshot of the index."""
+        with self._snapshot() as conn:
+            rows = self._row_count(conn)
+            if rows == 0:
+                return []
+            matrix = self._map(rows, self._info(conn, "generation"))[:rows]
+
+            if rows <= INDEX_EXACT_LIMIT:
+                candidates = None
+                scores = matrix @ query_vector
+            else:
+                candidates = self._candidates(conn, query_vector)
+                if len(candidates) == 0:
+                    return []
+                scores = matrix[candidates] @ query_vector
+
+            top = np.argsort(-scores)[:k]
+            hits = []
+            for i in top:
+                score = float(scores[i])
+                if score <= 0:
+                    break
+                row = int(candidates[i]) if candidates is not None else int(i)
+                found = conn.execute(
+                    "SELECT chunks.url, pages.title, chunks.text FROM chunks JOIN pages ON pages.url = chunks.url "
+                    "WHERE chunks.row = ?", (row,)
+                ).fetchone()
+                if found is not None:
+                    hits.append({"url": found[0], "title": found[1], "text": found[2], "score": score})
+            return hits
+
+    def stats(self) -> Dict[str, float]:
+        """Return the number of indexed pages and chunks, the stored size and pages pruned."""
+        conn = self._connection()
+        return {
+            "pages": conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0],
+            "chunks": conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+            "rows": self._row_count(conn),
+            "generation": self._info(conn, "generation"),
+            "matrix_bytes": self._capacity(self._info(conn, "generation")) * self.dim * 4,
+            "bytes": self._size(conn),
+            "max_bytes": self.max_bytes,
+            "pruned": self.pruned,
+        }
+
+
+_index: Optional[VectorIndex] = None
+_index_failed = False
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[VectorIndex]:
+    """Return the process-wide page index, or None if it is disabled.
+
+    If the index cannot be opened (for example it was built with another
+    embedder), the problem is reported once and the index stays off for the
+    rest of the process, so research carries on without it.
+    """
+    global _index, _index_failed
+    if not INDEX_ENABLED or _index_failed:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None and not _index_failed:
+                try:
+                    index = VectorIndex(INDEX_DIR or os.path.join(CACHE_DIR, "index"), get_embedder())
+                except Exception as e:
+                    print(f"Local page index unavailable, continuing without it: {str(e)}")
+                    _index_failed = True
+                    return None
+                METRICS.register_source("page_index", index.stats)
+                _index = index
+    return _index
+
+
+def index_results(results: List[Dict[str, Any]]) -> int:
+    """Add the fetched pages of search results to the local index.
+
+    Indexing problems are reported and otherwise ignored.
+
+    Returns:
+        The number of chunks added
+    """
+    index = get_index()
+    if index is None:
+        return 0
+    added = 0
+    for result in results:
+        if not result.get("raw_content") or not result.get("url"):
+            continue
+        try:
+            added += index.add_page(result["url"], result.get("title", ""), result["raw_content"])
+        except Exception as e:
+            print(f"Error indexing {result['url']}: {str(e)}")
+    return added
+
+
+def search_local(query: str, k: int, min_score: float) -> List[Dict[str, Any]]:
+    """Answer a query from the local index, one result per page.
+
+    Args:
+        query: The search query
+        k: Chunks to retrieve
+        min_score: Lowest similarity a chunk needs to count
+
+    Returns:
+        Search results shaped like search_web's (title, url, content, raw_content),
+        best page first, with the page's matching chunks as its content
+    """
+    index = get_index()
+    if index is None:
+        return []
+    try:
+        hits = index.search(query, k=k)
+    except Exception as e:
+        print(f"Error searching the local index: {str(e)}")
+        return []
+    pages: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        if hit["score"] < min_score:
+            continue
+        page = pages.setdefault(hit["url"], {"title": hit["title"], "url": hit["url"], "chunks": [], "score": hit["score"]})
+        page["chunks"].append(hit["text"])
+    return [
+        {
+            "title": page["title"],
+            "url": page["url"],
+            "content": page["chunks"][0],
+            "raw_content": " ".join(page["chunks"]),
+            "local_score": page["score"],
+        }
+        for page in pages.values()
+    ]
@@ -1,7 +1,42 @@
 """A simple, local mock LLM for demo purposes that doesn't require API keys."""
-from typing import Dict, Any, Optional, List
-from langchain.schema.output_parser import StrOutputParser
-from langchain.prompts import PromptTemplate
+from typing import Dict, Any, AsyncIterator, Iterator, Optional, List, Tuple
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+from langchain_core.prompts import PromptTemplate
+
+from utils.cache import LRUCache, SQLiteCache
+from utils.config import (
+    CACHE_DIR,
+    COMPLETION_CACHE_ENABLED,
+    COMPLETION_CACHE_SIZE,
+    COMPLETION_CACHE_PERSIST,
+    COMPLETION_CACHE_TTL,
+    COMPLETION_CACHE_MAX_BYTES,
+    LLM_BATCH_MAX_SIZE,
+    LLM_BATCH_MAX_WAIT_MS,
+)
+from utils.batching import MicroBatcher
+from utils.registry import get_or_create
+from utils.tracing import METRICS, trace_span
+
+
+# Notes on a page quote at most this many of its sentences
+_NOTE_SENTENCES = 3
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+# Streamed responses are split into words with their surrounding whitespace
+_CHUNK_PATTERN = re.compile(r"\s*\S+\s*")
+
+
+def _chunks(text: str) -> Iterator[str]:
+    """Split a response into the pieces yielded when streaming."""
+    for chunk in _CHUNK_PATTERN.finditer(text):
+        yield chunk.group(0)
 
 
 class SimpleLLM:
@@ -21,13 +56,76 @@ class SimpleLLM:
             A generated response
         """
         # Generate a basic response based on the prompt
-        if "search results" in prompt.lower():
+        if "taking notes on one web page" in prompt.lower():
+            # For per-source notes (checked first, since page text may say "search results")
+            return self._generate_note(prompt)
+        elif "search results" in prompt.lower():
             # For research summarization
             return self._generate_research_summary(prompt)
         else:
             # For answer generation
             return self._generate_answer(prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        """Asynchronously process the prompt and return a response.
+
+        Generation runs in the default executor so the event loop stays free
+        while a (potentially slow) model works.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, self.invoke, prompt)
+
+    def batch(self, prompts: List[str]) -> List[str]:
+        """Process several prompts in one call.
+
+        The mock model has nothing to share between prompts, so it answers
+        them one by one; a real local backend runs them as one batch.
+
+        Args:
+            prompts: The input prompts
+
+        Returns:
+            One response per prompt, in order
+        """
+        return [self.invoke(prompt) for prompt in prompts]
+
+    async def abatch(self, prompts: List[str]) -> List[str]:
+        """Asynchronously process several prompts in one call."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, self.batch, prompts)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Process the prompt and yield the response in chunks as it is generated.
+
+        Args:
+            prompt: The input prompt
+
+        Yields:
+            Consecutive pieces of the response (each word with its trailing whitespace)
+        """
+        yield from _chunks(self.invoke(prompt))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Asynchronously yield the response in chunks as it is generated."""
+        response = await self.ainvoke(prompt)
+        for chunk in _chunks(response):
+            yield chunk
     
+    def _generate_note(self, prompt: str) -> str:
+        """Generate brief notes on one page from its sentences that mention the query."""
+        query = prompt.split("Query:")[1].split("\n")[0].strip() if "Query:" in prompt else ""
+        content = prompt.split("Content:")[1] if "Content:" in prompt else ""
+        content = content.split("Write brief notes")[0]
+        sentences = [s.strip() for s in _SENTENCE_BREAK.split(" ".join(content.split())) if s.strip()]
+        terms = {word for word in re.findall(r"\w+", query.lower()) if len(word) > 2}
+        relevant = [s for s in sentences if terms & set(re.findall(r"\w+", s.lower()))]
+        picked = (relevant or sentences)[:_NOTE_SENTENCES]
+        if not picked:
+            return f"This page has nothing relevant to {query}."
+        return "\n".join(f"- {sentence}" for sentence in picked)
+
     def _generate_research_summary(self, prompt: str) -> str:
         """Generate a research summary."""
         query = prompt.split("Search Query:")[1].split("\n")[0].strip() if "Search Query:" in prompt else "unknown query"
@@ -100,26 +198,329 @@ The next few years will likely see continued improvements in qubit count, cohere
 """
 
 
+# Completions keyed by completion_cache_key: an in-memory LRU in front of an
+# optional SQLite store shared with other processes
+_completion_cache = LRUCache(COMPLETION_CACHE_SIZE, ttl=COMPLETION_CACHE_TTL)
+METRICS.register_source("completion_cache", _completion_cache.stats)
+_completion_store: Optional[SQLiteCache] = None
+_completion_store_lock = threading.Lock()
+
+
+def get_completion_store() -> Optional[SQLiteCache]:
+    """Return the durable completion store, or None if persistence is disabled."""
+    global _completion_store
+    if not (COMPLETION_CACHE_ENABLED and COMPLETION_CACHE_PERSIST):
+        return None
+    if _completion_store is None:
+        with _completion_store_lock:
+            if _completion_store is None:
+                _completion_store = SQLiteCache(
+                    os.path.join(CACHE_DIR, "completions.sqlite3"),
+                    ttl=COMPLETION_CACHE_TTL,
+                    max_bytes=COMPLETION_CACHE_MAX_BYTES,
+                )
+                METRICS.register_source("completion_store", _completion_store.stats)
+    return _completion_store
+
+
+def get_completion_cache() -> LRUCache:
+    """Return the in-memory completion cache."""
+    return _completion_cache
+
+
+def completion_cache_key(prompt: str, model_name: Optional[str], temperature: float) -> str:
+    """Hash a formatted prompt together with the model settings that produced its completion."""
+    payload = json.dumps([model_name, temperature, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lookup_completion(key: str) -> Optional[str]:
+    """Return a cached completion from the memory tier, then the persistent tier."""
+    text = _completion_cache.get(key)
+    if text is None:
+        store = get_completion_store()
+        if store is not None:
+            text = store.get(key)
+            if text is not None:
+                _completion_cache.set(key, text)
+    return text
+
+
+def _store_completion(key: str, text: str) -> None:
+    """Remember a completion in both tiers."""
+    _completion_cache.set(key, text)
+    store = get_completion_store()
+    if store is not None:
+        store.set(key, text)
+
+
+def get_llm(model_name: Optional[str] = None, temperature: float = 0.1) -> SimpleLLM:
+    """Return the shared LLM for a model and temperature, loading it on first use.
+
+    Args:
+        model_name: Not used in this simple implementation
+        temperature: Controls randomness (not actually used in simple implementation)
+
+    Returns:
+        The process-wide model instance
+    """
+    return get_or_create(("llm", model_name, temperature), lambda: SimpleLLM(temperature=temperature))
+
+
+# Micro-batchers built so far, by "<model>@<temperature>", for the metrics endpoint
+_batchers: Dict[str, MicroBatcher] = {}
+
+
+def _batcher_stats() -> Dict[str, float]:
+    """Counters of every micro-batcher, keyed ``<model>@<temperature>:<counter>``."""
+    return {
+        f"{label}:{name}": value
+        for label, batcher in list(_batchers.items())
+        for name, value in batcher.stats().items()
+    }
+
+
+METRICS.register_source("llm_batcher", _batcher_stats)
+
+
+def get_batcher(model_name: Optional[str] = None, temperature: float = 0.1) -> Optional[MicroBatcher]:
+    """Return the micro-batcher feeding the shared LLM, or None if batching is disabled.
+
+    Concurrent completions for the same model are grouped into ``batch`` calls
+    of up to LLM_BATCH_MAX_SIZE prompts, waiting at most LLM_BATCH_MAX_WAIT_MS
+    for a batch to fill.
+    """
+    if LLM_BATCH_MAX_SIZE <= 1:
+        return None
+
+    def build() -> MicroBatcher:
+        batcher = MicroBatcher(
+            get_llm(model_name, temperature).batch,
+            max_batch_size=LLM_BATCH_MAX_SIZE,
+            max_wait=LLM_BATCH_MAX_WAIT_MS / 1000,
+        )
+        _batchers[f"{model_name or 'default'}@{temperature}"] = batcher
+        return batcher
+
+    return get_or_create(("batcher", model_name, temperature), build)
+
+
 def create_prompt_template(template: str) -> PromptTemplate:
-    """Create a prompt template from a string template."""
-    return PromptTemplate.from_template(template)
+    """Create a prompt template from a string template.
+
+    Templates are parsed once per distinct string and shared afterwards.
+    """
+    return get_or_create(("prompt", template), lambda: PromptTemplate.from_template(template))
+
+
+class CompletionChain:
+    """A prompt template bound to an LLM.
+
+    Call it (or use ``invoke``) with the template variables to get the
+    completion; ``stream`` yields it in chunks, and ``ainvoke``/``astream``
+    are the asynchronous equivalents; ``batch``/``abatch`` handle several sets
+    of variables in one model call. With ``cache`` enabled, a prompt seen
+    before is answered from the completion cache without running the model.
+    With a ``batcher``, single completions from concurrent callers are grouped
+    into batched model calls.
+    """
+
+    def __init__(
+        self,
+        prompt_template: PromptTemplate,
+        llm: SimpleLLM,
+        model_name: Optional[str] = None,
+        cache: bool = True,
+        batcher: Optional[MicroBatcher] = None,
+    ):
+        self.prompt_template = prompt_template
+        self.llm = llm
+        self.model_name = model_name
+        self.cache = cache
+        self.batcher = batcher
+
+    def _format(self, prompt_args: Dict[str, Any]) -> str:
+        """Fill in the prompt template."""
+        with trace_span("prompt_format"):
+            return self.prompt_template.format(**prompt_args)
+
+    def _cache_key(self, formatted_prompt: str) -> Optional[str]:
+        """Return the completion cache key for a prompt, or None if caching is off."""
+        if not self.cache:
+            return None
+        return completion_cache_key(formatted_prompt, self.model_name, self.llm.temperature)
+
+    async def _alookup(self, key: Optional[str]) -> Optional[str]:
+        """Look up a completion without blocking the event loop on the SQLite tier."""
+        if key is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _lookup_completion, key)
+
+    async def _astore(self, key: Optional[str], text: str) -> None:
+        """Store a completion without blocking the event loop on the SQLite tier."""
+        if key is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _store_completion, key, text)
 
+    def _generate(self, formatted_prompt: str) -> str:
+        """Run one prompt through the model, via the micro-batcher when there is one."""
+        if self.batcher is not None:
+            return self.batcher.submit(formatted_prompt)
+        return self.llm.invoke(formatted_prompt)
 
-def create_completion_chain(prompt_template: PromptTemplate, model_name: Optional[str] = None, temperature: float = 0.1):
+    async def _agenerate(self, formatted_prompt: str) -> str:
+        """Asynchronously run one prompt through the model, via the micro-batcher when there is one."""
+        if self.batcher is not None:
+            return await self.batcher.asubmit(formatted_prompt)
+        return await self.llm.ainvoke(formatted_prompt)
+
+    def invoke(self, prompt_args: Dict[str, Any]) -> str:
+        """Format the prompt and run it through the LLM."""
+        formatted_prompt = self._format(prompt_args)
+        key = self._cache_key(formatted_prompt)
+        cached = _lookup_completion(key) if key is not None else None
+        if cached is not None:
+            return cached
+        text = self._generate(formatted_prompt)
+        if key is not None:
+            _store_completion(key, text)
+        return text
+
+    async def ainvoke(self, prompt_args: Dict[str, Any]) -> str:
+        """Asynchronously format the prompt and run it through the LLM."""
+        formatted_prompt = self._format(prompt_args)
+        key = self._cache_key(formatted_prompt)
+        cached = await self._alookup(key)
+        if cached is not None:
+            return cached
+        text = await self._agenerate(formatted_prompt)
+        await self._astore(key, text)
+        return text
+
+    def _batch_plan(
+        self, prompt_args_list: List[Dict[str, Any]]
+    ) -> Tuple[List[str], List[Optional[str]], List[Optional[str]], List[str]]:
+        """Format a batch of prompts and split them into cached results and prompts to run.
+
+        Returns:
+            (formatted prompts, cache keys, results with cached completions filled in,
+            distinct prompts still to run)
+        """
+        prompts = [self._format(prompt_args) for prompt_args in prompt_args_list]
+        keys = [self._cache_key(prompt) for prompt in prompts]
+        results: List[Optional[str]] = [
+            _lookup_completion(key) if key is not None else None for key in keys
+        ]
+        # Identical prompts in one batch only need one completion
+        to_run = list(dict.fromkeys(prompt for prompt, result in zip(prompts, results) if result is None))
+        return prompts, keys, results, to_run
+
+    def _fill_batch(
+        self,
+        prompts: List[str],
+        keys: List[Optional[str]],
+        results: List[Optional[str]],
+        to_run: List[str],
+        completions: List[str],
+    ) -> List[str]:
+        """Merge fresh completions into a batch's results and cache them."""
+        generated = dict(zip(to_run, completions))
+        for index, prompt in enumerate(prompts):
+            if results[index] is None:
+                results[index] = generated[prompt]
+                if keys[index] is not None:
+                    _store_completion(keys[index], results[index])
+        return results
+
+    def batch(self, prompt_args_list: List[Dict[str, Any]]) -> List[str]:
+        """Format several prompts and run those not in the cache through the LLM in one batch.
+
+        Args:
+            prompt_args_list: Template variables for each prompt
+
+        Returns:
+            One completion per entry, in order
+        """
+        prompts, keys, results, to_run = self._batch_plan(prompt_args_list)
+        completions = self.llm.batch(to_run) if to_run else []
+        return self._fill_batch(prompts, keys, results, to_run, completions)
+
+    async def abatch(self, prompt_args_list: List[Dict[str, Any]]) -> List[str]:
+        """Asynchronously format several prompts and run them through the LLM in one batch."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        prompts, keys, results, to_run = await loop.run_in_executor(
+            None, context.run, self._batch_plan, prompt_args_list
+        )
+        completions = await self.llm.abatch(to_run) if to_run else []
+        return await loop.run_in_executor(
+            None, self._fill_batch, prompts, keys, results, to_run, completions
+        )
+
+    def stream(self, prompt_args: Dict[str, Any]) -> Iterator[str]:
+        """Format the prompt and yield the completion in chunks."""
+        formatted_prompt = self._format(prompt_args)
+        key = self._cache_key(formatted_prompt)
+        cached = _lookup_completion(key) if key is not None else None
+        if cached is not None:
+            yield from _chunks(cached)
+            return
+        chunks = []
+        for chunk in self.llm.stream(formatted_prompt):
+            chunks.append(chunk)
+            yield chunk
+        # Only a completion streamed to the end is worth reusing
+        if key is not None:
+            _store_completion(key, "".join(chunks))
+
+    async def astream(self, prompt_args: Dict[str, Any]) -> AsyncIterator[str]:
+        """Asynchronously format the prompt and yield the completion in chunks."""
+        formatted_prompt = self._format(prompt_args)
+        key = self._cache_key(formatted_prompt)
+        cached = await self._alookup(key)
+        if cached is not None:
+            for chunk in _chunks(cached):
+                yield chunk
+            return
+        chunks = []
+        async for chunk in self.llm.astream(formatted_prompt):
+            chunks.append(chunk)
+            yield chunk
+        await self._astore(key, "".join(chunks))
+
+    __call__ = invoke
+
+
+def create_completion_chain(
+    prompt_template: PromptTemplate,
+    model_name: Optional[str] = None,
+    temperature: float = 0.1,
+    cache: Optional[bool] = None,
+) -> CompletionChain:
     """Create a completion chain using a prompt and the simple LLM.
     
+    Chains (and the model behind them) are built once per prompt, model and
+    temperature and reused by later calls. Concurrent calls on chains sharing
+    a model are micro-batched (see get_batcher).
+    
     Args:
         prompt_template: The prompt template
         model_name: Not used in this simple implementation
         temperature: Controls randomness (not actually used in simple implementation)
+        cache: Reuse completions of identical prompts; defaults to COMPLETION_CACHE_ENABLED.
+            Turn it off when every call should sample a fresh completion.
         
     Returns:
         A chain that processes the prompt
     """
-    llm = SimpleLLM(temperature=temperature)
-    
-    def process_with_simple_llm(prompt_args):
-        formatted_prompt = prompt_template.format(**prompt_args)
-        return llm.invoke(formatted_prompt)
-    
-    return process_with_simple_llm 
\ No newline at end of file
+    if cache is None:
+        cache = COMPLETION_CACHE_ENABLED
+    key = ("chain", prompt_template.template, model_name, temperature, cache)
+    return get_or_create(key, lambda: CompletionChain(
+        prompt_template,
+        get_llm(model_name, temperature),
+        model_name=model_name,
+        cache=cache,
+        batcher=get_batcher(model_name, temperature),
+    ))
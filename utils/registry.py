@@ -0,0 +1,77 @@
+"""Process-wide registry of expensive, reusable objects.
+
+Compiled graphs, prompt templates, models and chains are built once per key and
+shared by every query, thread and async task in the process.
+"""
+from typing import Any, Callable, Dict, Hashable, List, TypeVar
+import threading
+
+
+T = TypeVar("T")
+
+
+class Registry:
+    """A thread-safe get-or-create store.
+
+    Each key has its own build lock, so a slow construction (e.g. loading a
+    model) blocks only callers waiting for that same key, and the factory runs
+    exactly once even when many threads ask for the key at the same time.
+    """
+
+    def __init__(self):
+        self._items: Dict[Hashable, Any] = {}
+        self._build_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """Return the object stored under a key, building it with ``factory`` on first use.
+
+        Args:
+            key: Hashable identity of the object, e.g. ``("llm", model_name, temperature)``
+            factory: Builds the object; called at most once per key
+
+        Returns:
+            The shared object
+        """
+        try:
+            return self._items[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            if key not in self._items:
+                value = factory()
+                with self._lock:
+                    self._items[key] = value
+        return self._items[key]
+
+    def remove(self, key: Hashable) -> None:
+        """Forget one object so the next request rebuilds it."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget every object."""
+        with self._lock:
+            self._items.clear()
+
+    def keys(self) -> List[Hashable]:
+        """The keys of the objects built so far."""
+        with self._lock:
+            return list(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+REGISTRY = Registry()
+
+
+def get_or_create(key: Hashable, factory: Callable[[], T]) -> T:
+    """Return the shared object for a key from the process-wide registry."""
+    return REGISTRY.get_or_create(key, factory)
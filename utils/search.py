@@ -1,51 +1,625 @@
 """Free search utility functions using DuckDuckGo."""
-from typing import List, Dict, Any
-from duckduckgo_search import DDGS
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sqlite3
+import threading
 import time
 
-from utils.config import MAX_SEARCH_RESULTS, SEARCH_TIMEOUT
+from utils.config import (
+    MAX_SEARCH_RESULTS,
+    SEARCH_TIMEOUT,
+    FETCH_MAX_WORKERS,
+    FETCH_PER_HOST_LIMIT,
+    CACHE_DIR,
+    PAGE_CACHE_ENABLED,
+    PAGE_CACHE_TTL,
+    PAGE_CACHE_MAX_BYTES,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_PERSIST,
+    SEARCH_CACHE_MAX_BYTES,
+    FETCH_MAX_BYTES,
+    PAGE_MAX_CHARS,
+    DEDUP_ENABLED,
+    DEDUP_BACKFILL,
+)
+from utils.cache import LRUCache, SQLiteCache
+from utils.deadline import deadline_expired, record_skip, remaining_time, stage_timeout
+from utils.dedup import Deduplicator, deduplicate_results
+from utils.extract import HtmlTextExtractor, extract_text_in_pool, get_extract_pool
+from utils.health import get_health_tracker, host_of
+from utils.http import HostUnavailable, get_http_client, normalize_url
+from utils.tracing import METRICS, get_tracer, trace_span
 
 
-def search_web(query: str, max_results: int = MAX_SEARCH_RESULTS) -> List[Dict[str, Any]]:
+# Media types worth downloading and parsing for page text
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# Downloads stop this many seconds before the deadline, so the text read so far
+# reaches the caller before it stops waiting for the page
+PARTIAL_FETCH_MARGIN = 0.25
+
+
+# Shared worker pool for page fetches, created on first use and reused across queries
+_fetch_executor: Optional[ThreadPoolExecutor] = None
+_fetch_executor_lock = threading.Lock()
+
+# Per-host semaphores that cap how many fetches hit the same host at once
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+# Extracted page text, keyed by normalized URL
+_page_cache: Optional[SQLiteCache] = None
+_page_cache_failed = False
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[SQLiteCache]:
+    """Return the on-disk page cache, or None if it is disabled.
+
+    If the cache cannot be opened (an unwritable CACHE_DIR, a locked or
+    corrupt database), the problem is reported once and pages are fetched
+    uncached for the rest of the process.
+    """
+    global _page_cache, _page_cache_failed
+    if not PAGE_CACHE_ENABLED or _page_cache_failed:
+        return None
+    if _page_cache is None:
+        with _page_cache_lock:
+            if _page_cache is None and not _page_cache_failed:
+                try:
+                    cache = SQLiteCache(
+                        os.path.join(CACHE_DIR, "pages.sqlite3"),
+                        ttl=PAGE_CACHE_TTL,
+                        max_bytes=PAGE_CACHE_MAX_BYTES,
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Page cache unavailable, fetching uncached: {str(e)}")
+                    _page_cache_failed = True
+                    return None
+                METRICS.register_source("page_cache", cache.stats)
+                _page_cache = cache
+    return _page_cache
+
+
+# Raw search hits keyed by normalized query: an in-memory LRU in front of an
+# optional SQLite store shared with other processes
+_search_cache = LRUCache(SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+METRICS.register_source("search_cache", _search_cache.stats)
+_search_store: Optional[SQLiteCache] = None
+_search_store_failed = False
+_search_store_lock = threading.Lock()
+
+
+def get_search_store() -> Optional[SQLiteCache]:
+    """Return the durable search-hit store, or None if persistence is disabled.
+
+    As with the page cache, a store that cannot be opened is reported once
+    and left off for the rest of the process.
+    """
+    global _search_store, _search_store_failed
+    if not SEARCH_CACHE_PERSIST or _search_store_failed:
+        return None
+    if _search_store is None:
+        with _search_store_lock:
+            if _search_store is None and not _search_store_failed:
+                try:
+                    store = SQLiteCache(
+                        os.path.join(CACHE_DIR, "searches.sqlite3"),
+                        ttl=SEARCH_CACHE_TTL,
+                        max_bytes=SEARCH_CACHE_MAX_BYTES,
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Search store unavailable, continuing without it: {str(e)}")
+                    _search_store_failed = True
+                    return None
+                METRICS.register_source("search_store", store.stats)
+                _search_store = store
+    return _search_store
+
+
+def get_search_cache() -> LRUCache:
+    """Return the in-memory search-hit cache."""
+    return _search_cache
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry.
+
+    Lowercases, drops punctuation and collapses whitespace.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def _ddgs_search(query: str, max_results: int) -> List[Dict[str, str]]:
+    """Run a DuckDuckGo text search and return title/url/snippet hits."""
+    # Imported on first search: it is slow to load and unused on cache hits
+    from duckduckgo_search import DDGS
+
+    with DDGS() as ddgs:
+        return [
+            {
+                "title": result.get("title", ""),
+                "url": result.get("href", ""),
+                "content": result.get("body", ""),
+            }
+            for result in ddgs.text(query, max_results=max_results)
+        ]
+
+
+# Function that performs the actual web search; replaceable so benchmarks and
+# offline runs can stand in for DuckDuckGo
+_search_backend: Callable[[str, int], List[Dict[str, str]]] = _ddgs_search
+
+
+def set_search_backend(backend: Optional[Callable[[str, int], List[Dict[str, str]]]]) -> None:
+    """Replace the search backend (pass None to restore DuckDuckGo).
+
+    Args:
+        backend: Called with (query, max_results); returns title/url/content hits
+    """
+    global _search_backend
+    _search_backend = backend if backend is not None else _ddgs_search
+
+
+def _cached_search(query: str, max_results: int) -> List[Dict[str, str]]:
+    """Return search hits for a query, consulting the search caches first."""
+    if not SEARCH_CACHE_ENABLED:
+        with trace_span("search", query=query):
+            return _search_backend(query, max_results)
+
+    key = f"{normalize_query(query)}|{max_results}"
+    hits = _search_cache.get(key)
+    if hits is None:
+        store = get_search_store()
+        stored = store.get(key) if store is not None else None
+        if stored is not None:
+            hits = json.loads(stored)
+            _search_cache.set(key, hits)
+    if hits is None:
+        with trace_span("search", query=query):
+            hits = _search_backend(query, max_results)
+        # Empty results are usually transient (rate limiting), so don't keep them
+        if hits:
+            _search_cache.set(key, hits)
+            store = get_search_store()
+            if store is not None:
+                store.set(key, json.dumps(hits))
+
+    # Callers add fetched content to the hits, so hand out copies
+    return [dict(hit) for hit in hits]
+
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    """Return the shared page-fetch worker pool."""
+    global _fetch_executor
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                _fetch_executor = ThreadPoolExecutor(
+                    max_workers=max(1, FETCH_MAX_WORKERS),
+                    thread_name_prefix="fetch",
+                )
+    return _fetch_executor
+
+
+def _get_host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Return the concurrency-limiting semaphore for the host of a URL."""
+    host = host_of(url)
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(1, FETCH_PER_HOST_LIMIT))
+            _host_semaphores[host] = semaphore
+    return semaphore
+
+
+def _fetch_with_host_limit(url: str) -> str:
+    """Fetch a page while holding its host's concurrency slot.
+
+    Under a deadline, a fetch still waiting for its slot when the deadline
+    passes is skipped.
+    """
+    semaphore = _get_host_semaphore(url)
+    if not semaphore.acquire(timeout=remaining_time()):
+        record_skip("fetch", url=url)
+        return ""
+    try:
+        return fetch_webpage_content(url)
+    finally:
+        semaphore.release()
+
+
+def _fetch_order(urls: List[str]) -> List[int]:
+    """Indices of ``urls`` in the order to start fetching them, healthiest host first."""
+    tracker = get_health_tracker()
+    if tracker is None:
+        return list(range(len(urls)))
+    return tracker.fetch_order(urls)
+
+
+def _prefer_healthy(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Move hits on hosts whose circuit is open behind the others, keeping rank order otherwise.
+
+    Held-back backfill hits then take the place of results that would only
+    be refused.
+    """
+    tracker = get_health_tracker()
+    if tracker is None:
+        return hits
+    return sorted(hits, key=lambda hit: not tracker.available(host_of(hit["url"])))
+
+
+def fetch_all_webpages(urls: List[str], on_fetched: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """Fetch several webpages concurrently.
+
+    Fetches start in health order, so pages on fast, reliable hosts are
+    requested first.
+
+    Args:
+        urls: The URLs to fetch
+        on_fetched: Called with (index, content) as each page finishes, in
+            completion order, from the calling thread
+
+    Returns:
+        Extracted text for each URL, in the same order as ``urls``; pages
+        still loading when the active deadline passes are left empty
+    """
+    if not urls:
+        return []
+
+    executor = _get_fetch_executor()
+    # Each fetch runs in a copy of the caller's context so it reports to the
+    # caller's tracer and respects the caller's deadline
+    futures = {
+        executor.submit(contextvars.copy_context().run, _fetch_with_host_limit, urls[index]): index
+        for index in _fetch_order(urls)
+    }
+
+    # Store by index so the original ranking is preserved
+    contents = [""] * len(urls)
+    try:
+        for future in as_completed(futures, timeout=remaining_time()):
+            index = futures[future]
+            try:
+                contents[index] = future.result()
+            except Exception as e:
+                print(f"Error fetching {urls[index]}: {str(e)}")
+            if on_fetched is not None:
+                on_fetched(index, contents[index])
+    except FuturesTimeoutError:
+        # Out of time: move on with the pages in hand
+        for future, index in futures.items():
+            if not future.done():
+                future.cancel()
+                record_skip("fetch", url=urls[index])
+    return contents
+
+
+async def afetch_all_webpages(urls: List[str], on_fetched: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """Asynchronously fetch several webpages concurrently.
+
+    Fetches run on the same shared worker pool and per-host limits as
+    fetch_all_webpages, so many in-flight queries on one event loop share them,
+    and start in the same health order.
+
+    Args:
+        urls: The URLs to fetch
+        on_fetched: Called with (index, content) as each page finishes
+
+    Returns:
+        Extracted text for each URL, in the same order as ``urls``; pages
+        still loading when the active deadline passes are left empty
+    """
+    if not urls:
+        return []
+
+    loop = asyncio.get_running_loop()
+    executor = _get_fetch_executor()
+
+    async def fetch(index: int, url: str) -> str:
+        try:
+            context = contextvars.copy_context()
+            content = await loop.run_in_executor(executor, context.run, _fetch_with_host_limit, url)
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            content = ""
+        if on_fetched is not None:
+            on_fetched(index, content)
+        return content
+
+    # Tasks reach the worker pool in the order they are created
+    tasks: List[asyncio.Future] = [None] * len(urls)
+    for index in _fetch_order(urls):
+        tasks[index] = asyncio.ensure_future(fetch(index, urls[index]))
+    done, _ = await asyncio.wait(tasks, timeout=remaining_time())
+    contents = []
+    for task, url in zip(tasks, urls):
+        if task in done:
+            contents.append(task.result())
+        else:
+            # Out of time: move on with the pages in hand
+            task.cancel()
+            record_skip("fetch", url=url)
+            contents.append("")
+    return contents
+
+
+def _attach_content(results: List[Dict[str, Any]], on_source: Optional[Callable[[Dict[str, Any]], None]]) -> Callable[[int, str], None]:
+    """Build an on_fetched callback that stores page content on its search result."""
+    def attach(index: int, content: str) -> None:
+        if content:
+            results[index]["raw_content"] = content
+        if on_source is not None:
+            on_source(results[index])
+    return attach
+
+
+def _deduplicate(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop near-duplicate results, recording how many were dropped."""
+    with trace_span("dedup", results=len(results)) as span:
+        kept = deduplicate_results(results)
+        span["dropped"] = len(results) - len(kept)
+    return kept
+
+
+def _fetch_results(results: List[Dict[str, Any]], concurrent: bool, on_source: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """Fetch the pages of search results, storing their text on the results."""
+    attach = _attach_content(results, on_source)
+    if concurrent:
+        fetch_all_webpages([result["url"] for result in results], on_fetched=attach)
+    else:
+        for index, result in enumerate(results):
+            attach(index, fetch_webpage_content(result["url"]))
+
+
+def _search_hits(query: str, count: int) -> List[Dict[str, Any]]:
+    """Search for up to ``count`` hits, returning none if the search fails or the deadline has passed."""
+    if deadline_expired():
+        record_skip("search", query=query)
+        return []
+    try:
+        return _cached_search(query, count)
+    except Exception as e:
+        print(f"DuckDuckGo search error: {str(e)}")
+        return []
+
+
+def _ranked_hits(query: str, max_results: int, dedupe: bool, backfill: int) -> List[Dict[str, Any]]:
+    """Search hits for the streaming variants, each tagged with its position under ``rank``."""
+    hits = _search_hits(query, max_results + (backfill if dedupe else 0))
+    for rank, hit in enumerate(hits):
+        hit["rank"] = rank
+    return _prefer_healthy(hits)
+
+
+def iter_search_web(
+    query: str,
+    max_results: int = MAX_SEARCH_RESULTS,
+    dedupe: bool = DEDUP_ENABLED,
+    backfill: int = DEDUP_BACKFILL,
+) -> Iterator[Dict[str, Any]]:
+    """Search the web and yield each result as soon as its page has been fetched.
+    
+    Results arrive in completion order rather than rank order; each carries
+    its search rank under ``rank``. With ``dedupe``, a result whose page copies
+    one already yielded is dropped and a held-back hit is fetched in its
+    place. Hits on hosts with an open circuit are held back behind the rest,
+    and fetches start with the healthiest hosts. Stopping the iteration early
+    cancels the fetches not yet started, and so does the active deadline
+    passing, which ends the iteration.
+    
+    Args:
+        query: The search query
+        max_results: Maximum number of results to yield
+        dedupe: Drop results whose page nearly duplicates an earlier one
+        backfill: Extra search hits held back to replace dropped duplicates
+        
+    Yields:
+        Search results with title, link, snippet and (when fetched) ``raw_content``
+    """
+    hits = _ranked_hits(query, max_results, dedupe, backfill)
+    results, spare = hits[:max_results], hits[max_results:]
+    deduplicator = Deduplicator() if dedupe else None
+    executor = _get_fetch_executor()
+    pending: Dict[Future, Dict[str, Any]] = {}
+    
+    def submit(result: Dict[str, Any]) -> None:
+        future = executor.submit(contextvars.copy_context().run, _fetch_with_host_limit, result["url"])
+        pending[future] = result
+    
+    for index in _fetch_order([result["url"] for result in results]):
+        submit(results[index])
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=remaining_time(), return_when=FIRST_COMPLETED)
+            if not done:
+                # Out of time: abandon the slow fetches
+                for result in pending.values():
+                    record_skip("fetch", url=result["url"])
+                break
+            for future in done:
+                result = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    print(f"Error fetching {result['url']}: {str(e)}")
+                    content = ""
+                if content:
+                    result["raw_content"] = content
+                if deduplicator is not None and deduplicator.add(result) is not None:
+                    if spare and not deadline_expired():
+                        submit(spare.pop(0))
+                    continue
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def aiter_search_web(
+    query: str,
+    max_results: int = MAX_SEARCH_RESULTS,
+    dedupe: bool = DEDUP_ENABLED,
+    backfill: int = DEDUP_BACKFILL,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Asynchronously search the web and yield each result as soon as its page has been fetched.
+    
+    Behaves like iter_search_web. Callers that stop early should ``aclose()``
+    the iterator so the remaining fetches are cancelled straight away.
+    
+    Args:
+        query: The search query
+        max_results: Maximum number of results to yield
+        dedupe: Drop results whose page nearly duplicates an earlier one
+        backfill: Extra search hits held back to replace dropped duplicates
+        
+    Yields:
+        Search results with title, link, snippet and (when fetched) ``raw_content``
+    """
+    loop = asyncio.get_running_loop()
+    hits = await loop.run_in_executor(
+        None, contextvars.copy_context().run, _ranked_hits, query, max_results, dedupe, backfill
+    )
+    results, spare = hits[:max_results], hits[max_results:]
+    deduplicator = Deduplicator() if dedupe else None
+    executor = _get_fetch_executor()
+    pending: Dict[asyncio.Future, Dict[str, Any]] = {}
+    
+    def submit(result: Dict[str, Any]) -> None:
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(executor, context.run, _fetch_with_host_limit, result["url"])
+        pending[future] = result
+    
+    for index in _fetch_order([result["url"] for result in results]):
+        submit(results[index])
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=remaining_time(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                for result in pending.values():
+                    record_skip("fetch", url=result["url"])
+                break
+            for future in done:
+                result = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    print(f"Error fetching {result['url']}: {str(e)}")
+                    content = ""
+                if content:
+                    result["raw_content"] = content
+                # Fingerprinting the page is CPU work; keep it off the event loop
+                if deduplicator is not None and await loop.run_in_executor(None, deduplicator.add, result) is not None:
+                    if spare and not deadline_expired():
+                        submit(spare.pop(0))
+                    continue
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def search_web(
+    query: str,
+    max_results: int = MAX_SEARCH_RESULTS,
+    concurrent: bool = True,
+    on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+    dedupe: bool = DEDUP_ENABLED,
+    backfill: int = DEDUP_BACKFILL,
+) -> List[Dict[str, Any]]:
     """Search the web using DuckDuckGo (no API key required).
     
     Args:
         query: The search query
         max_results: Maximum number of results to return
+        concurrent: Fetch result pages in parallel instead of one after another
+        on_source: Called with each search result as soon as its page has been fetched
+        dedupe: Drop results whose page nearly duplicates a higher-ranked one
+        backfill: Extra search hits held back to replace dropped duplicates
         
     Returns:
         List of search results with title, link, and snippet
     """
-    results = []
-    try:
-        with DDGS() as ddgs:
-            search_results = list(ddgs.text(query, max_results=max_results))
-            
-            for result in search_results:
-                results.append({
-                    "title": result.get("title", ""),
-                    "url": result.get("href", ""),
-                    "content": result.get("body", ""),
-                })
-    except Exception as e:
-        print(f"DuckDuckGo search error: {str(e)}")
-        # If DDG fails, return an empty list but don't crash
-        pass
+    # If the search fails there are no hits, but no crash either
+    hits = _prefer_healthy(_search_hits(query, max_results + (backfill if dedupe else 0)))
+    results, spare = hits[:max_results], hits[max_results:]
     
     # Fetch webpage content for each result to get more context
-    for result in results:
-        content = fetch_webpage_content(result["url"])
-        if content:
-            result["raw_content"] = content
+    _fetch_results(results, concurrent, on_source)
     
+    if dedupe:
+        results = _deduplicate(results)
+        # Replace dropped copies with held-back hits, which may be copies themselves
+        while len(results) < max_results and spare and not deadline_expired():
+            missing = max_results - len(results)
+            extra, spare = spare[:missing], spare[missing:]
+            _fetch_results(extra, concurrent, on_source)
+            results = _deduplicate(results + extra)
+    
+    return results
+
+
+async def asearch_web(
+    query: str,
+    max_results: int = MAX_SEARCH_RESULTS,
+    on_source: Optional[Callable[[Dict[str, Any]], None]] = None,
+    dedupe: bool = DEDUP_ENABLED,
+    backfill: int = DEDUP_BACKFILL,
+) -> List[Dict[str, Any]]:
+    """Asynchronously search the web using DuckDuckGo and fetch the result pages.
+
+    Args:
+        query: The search query
+        max_results: Maximum number of results to return
+        on_source: Called with each search result as soon as its page has been fetched
+        dedupe: Drop results whose page nearly duplicates a higher-ranked one
+        backfill: Extra search hits held back to replace dropped duplicates
+
+    Returns:
+        List of search results with title, link, and snippet
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    hits = await loop.run_in_executor(
+        None, context.run, _search_hits, query, max_results + (backfill if dedupe else 0)
+    )
+    hits = _prefer_healthy(hits)
+    results, spare = hits[:max_results], hits[max_results:]
+
+    await afetch_all_webpages(
+        [result["url"] for result in results],
+        on_fetched=_attach_content(results, on_source),
+    )
+
+    if dedupe:
+        results = await loop.run_in_executor(None, contextvars.copy_context().run, _deduplicate, results)
+        while len(results) < max_results and spare and not deadline_expired():
+            missing = max_results - len(results)
+            extra, spare = spare[:missing], spare[missing:]
+            await afetch_all_webpages(
+                [result["url"] for result in extra],
+                on_fetched=_attach_content(extra, on_source),
+            )
+            results = await loop.run_in_executor(
+                None, contextvars.copy_context().run, _deduplicate, results + extra
+            )
     return results
 
 
 def fetch_webpage_content(url: str, timeout: int = SEARCH_TIMEOUT) -> str:
     """Fetch and extract text content from a webpage.
     
+    Under a deadline the timeout is capped to the remaining budget, and a
+    download still running when the deadline passes keeps the text read so far.
+    
     Args:
         url: The URL to fetch
         timeout: Request timeout in seconds
@@ -53,30 +627,85 @@ def fetch_webpage_content(url: str, timeout: int = SEARCH_TIMEOUT) -> str:
     Returns:
         Extracted text content or empty string on failure
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-    
+    with trace_span("fetch", url=url) as span:
+        text = _fetch_webpage_content(url, timeout, span)
+        span["chars"] = len(text)
+        return text
+
+
+def _fetch_webpage_content(url: str, timeout: float, span: Dict[str, Any]) -> str:
+    """Fetch and extract a webpage, recording cache use and extraction time on ``span``."""
+    cache = get_page_cache()
+    cache_key = normalize_url(url)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            span["cached"] = True
+            return cached
+
+    timeout = stage_timeout(timeout)
+    if timeout <= 0:
+        record_skip("fetch", url=url)
+        return ""
+
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-        
-        # Get text
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Clean up text (remove excessive whitespace)
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        # Limit text length to avoid overly large results
-        return text[:10000]
+        html = None
+        partial = False
+        # Reject non-HTML responses before downloading their bodies
+        with get_http_client().open(url, timeout=timeout, content_types=HTML_CONTENT_TYPES) as response:
+            response.raise_for_status()
+
+            if get_extract_pool() is None:
+                # Parse while downloading; script/style are skipped as they stream
+                # past and the download stops once enough text has been collected
+                extractor = HtmlTextExtractor(max_chars=PAGE_MAX_CHARS, encoding=response.encoding)
+                extract_started = time.perf_counter()
+                extract_time = 0.0
+                for chunk in response.iter_bytes(max_bytes=FETCH_MAX_BYTES):
+                    chunk_started = time.perf_counter()
+                    done = extractor.feed_bytes(chunk)
+                    extract_time += time.perf_counter() - chunk_started
+                    if done:
+                        break
+                    remaining = remaining_time()
+                    if remaining is not None and remaining < PARTIAL_FETCH_MARGIN:
+                        partial = True
+                        break
+                chunk_started = time.perf_counter()
+                text = extractor.get_text()
+                extract_time += time.perf_counter() - chunk_started
+                # Parsing is interleaved with the download, so record the time
+                # actually spent parsing rather than the wall-clock window
+                tracer = get_tracer()
+                if tracer is not None:
+                    tracer.record("extract", extract_started, extract_time, url=url)
+            else:
+                html = response.read(max_bytes=FETCH_MAX_BYTES)
+                encoding = response.encoding
+
+        # Parse on the process pool after the connection has been released,
+        # so extraction doesn't hold this process's GIL
+        if html is not None:
+            with trace_span("extract", url=url, pool=True):
+                try:
+                    text = extract_text_in_pool(html, max_chars=PAGE_MAX_CHARS, encoding=encoding)
+                except TimeoutError:
+                    # Out of time before the page was parsed: skip the source
+                    record_skip("extract", url=url)
+                    span["skipped"] = True
+                    return ""
+
+        if partial:
+            # Cut short by the deadline: use what arrived, but don't cache it as the page
+            record_skip("fetch", url=url, partial=True)
+            span["partial"] = True
+        elif cache is not None and text:
+            cache.set(cache_key, text)
+        return text
+    except HostUnavailable:
+        # The host has been failing; skip it until its circuit is probed again
+        span["circuit_open"] = True
+        return ""
     except Exception as e:
         print(f"Error fetching {url}: {str(e)}")
-        return "" 
\ No newline at end of file
+        return "" 
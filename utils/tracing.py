@@ -0,0 +1,201 @@
+"""Lightweight per-stage timing for the research pipeline.
+
+A Tracer collects spans for one query. The active tracer lives in a context
+variable, so instrumented code calls ``trace_span`` without passing it around;
+when no tracer is active the spans cost next to nothing.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import json
+import threading
+import time
+
+
+class Tracer:
+    """Collects timing spans for a single query."""
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spans(cls, spans: List[Dict[str, Any]]) -> "Tracer":
+        """Rebuild a tracer from exported spans, e.g. those attached to a final graph state."""
+        tracer = cls()
+        for span in spans:
+            tracer.record(
+                span["name"], tracer._origin + span["start"], span["duration"], **span.get("attributes", {})
+            )
+        return tracer
+
+    def record(self, name: str, start: float, duration: float, **attributes: Any) -> None:
+        """Record a finished span.
+
+        Args:
+            name: Stage name, e.g. ``fetch`` or ``summarize``
+            start: perf_counter() value when the span began
+            duration: Span length in seconds
+            attributes: Extra details such as the URL fetched
+        """
+        span = {
+            "name": name,
+            "start": round(start - self._origin, 6),
+            "duration": round(duration, 6),
+        }
+        if attributes:
+            span["attributes"] = attributes
+        with self._lock:
+            self._spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block. The yielded dict can be filled with attributes known only at the end."""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.record(name, start, time.perf_counter() - start, **attributes)
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        """The recorded spans, in start order."""
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span["start"])
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate spans per stage into count, total, mean and max seconds."""
+        summary: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            stage = summary.setdefault(span["name"], {"count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += span["duration"]
+            stage["max"] = max(stage["max"], span["duration"])
+        for stage in summary.values():
+            stage["mean"] = stage["total"] / stage["count"]
+        return summary
+
+    def to_json(self) -> str:
+        """Export the spans and per-stage summary as JSON."""
+        return json.dumps({"spans": self.spans, "stages": self.stage_summary()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Export the per-stage summary in Prometheus text format."""
+        return format_prometheus(self.stage_summary())
+
+
+_current_tracer: ContextVar[Optional[Tracer]] = ContextVar("tracer", default=None)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the tracer active in the current context, if any."""
+    return _current_tracer.get()
+
+
+@contextmanager
+def use_tracer(tracer: Tracer, observe: bool = True) -> Iterator[Tracer]:
+    """Make a tracer the active one for a block, then add its spans to METRICS.
+
+    Args:
+        tracer: The tracer to activate
+        observe: Add the spans to METRICS when the block ends; pass False when
+            the tracer is activated repeatedly for one query, and observe it
+            once at the end
+    """
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+        if observe:
+            METRICS.observe(tracer)
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block on the active tracer; does nothing when no tracer is active."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield attributes
+        return
+    with tracer.span(name, **attributes) as span_attributes:
+        yield span_attributes
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    """Render a Prometheus label set, escaping values."""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_prometheus(
+    stages: Dict[str, Dict[str, float]],
+    counters: Optional[Dict[str, Dict[str, float]]] = None,
+) -> str:
+    """Render stage timings (and optional counter groups) in Prometheus text format.
+
+    Args:
+        stages: Per-stage ``count`` and ``total`` seconds, as from Tracer.stage_summary
+        counters: Metric name -> {label value: number}; each becomes a gauge keyed by ``name`` label
+
+    Returns:
+        The exposition text
+    """
+    lines = [
+        "# HELP researchbot_stage_duration_seconds Time spent in each pipeline stage.",
+        "# TYPE researchbot_stage_duration_seconds summary",
+    ]
+    for stage, summary in sorted(stages.items()):
+        labels = _format_labels({"stage": stage})
+        lines.append(f"researchbot_stage_duration_seconds_sum{labels} {summary['total']:.6f}")
+        lines.append(f"researchbot_stage_duration_seconds_count{labels} {int(summary['count'])}")
+    for metric, values in sorted((counters or {}).items()):
+        lines.append(f"# TYPE researchbot_{metric} gauge")
+        for name, value in sorted(values.items()):
+            lines.append(f"researchbot_{metric}{_format_labels({'name': name})} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """Process-wide metrics: stage timings of every traced query plus registered counter sources."""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, tracer: Tracer) -> None:
+        """Add a finished query's spans to the running totals."""
+        summary = tracer.stage_summary()
+        with self._lock:
+            for name, stage in summary.items():
+                total = self._stages.setdefault(name, {"count": 0, "total": 0.0})
+                total["count"] += stage["count"]
+                total["total"] += stage["total"]
+
+    def register_source(self, metric: str, source: Callable[[], Dict[str, float]]) -> None:
+        """Register a callable whose numbers are exported as gauges under ``metric``."""
+        with self._lock:
+            self._sources[metric] = source
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in Prometheus text format."""
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            sources = dict(self._sources)
+        counters = {}
+        for metric, source in sources.items():
+            try:
+                counters[metric] = source()
+            except Exception as e:
+                print(f"Error collecting metric {metric}: {str(e)}")
+        return format_prometheus(stages, counters)
+
+
+METRICS = MetricsRegistry()